@@ -0,0 +1,114 @@
+# admission.py
+# Kiểm soát tải trước upload(): mỗi request giữ một "vé" gồm số byte của body (Content-Length,
+# hoặc mức tối đa khi client không khai báo) và một job, tới khi parse xong / file được giải phóng.
+# Vượt ngân sách byte hoặc job thì trả 429 ngay từ header, trước khi đọc body; Retry-After tính
+# từ tốc độ giải phóng (byte / job mỗi giây) đo trong cửa sổ gần nhất.
+import collections
+import math
+import threading
+import time
+
+from fastapi import HTTPException
+
+
+class Ticket:
+    """Bytes and jobs held by one admitted request; release() is idempotent."""
+
+    __slots__ = ("controller", "nbytes", "jobs", "released")
+
+    def __init__(self, controller, nbytes: int, jobs: int):
+        self.controller = controller
+        self.nbytes = nbytes
+        self.jobs = jobs
+        self.released = False
+
+    def resize(self, nbytes: int = None, jobs: int = None):
+        """Adjust the reservation once the real size / file count is known (never rejects)."""
+        self.controller._adjust(self, self.nbytes if nbytes is None else nbytes, self.jobs if jobs is None else jobs)
+
+    def release(self):
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Budgets for bytes and jobs held by admitted requests (0 = unlimited). A request is always
+    admitted when nothing else is in flight, so one upload larger than the byte budget still works.
+    """
+
+    def __init__(self, max_bytes: int, max_jobs: int, window_seconds: float = 60,
+                 min_retry_after: int = 1, max_retry_after: int = 60):
+        self.max_bytes = max_bytes
+        self.max_jobs = max_jobs
+        self.window = window_seconds
+        self.min_retry_after = min_retry_after
+        self.max_retry_after = max_retry_after
+        self.bytes = 0
+        self.jobs = 0
+        self.rejected = collections.Counter()  # reason -> count
+        self._drained = collections.deque()  # (monotonic, bytes, jobs) của các vé đã giải phóng
+        self._lock = threading.Lock()
+
+    def admit(self, nbytes: int, jobs: int = 1) -> Ticket:
+        """Reserve `nbytes` and `jobs`, or raise HTTPException(429) with a Retry-After header."""
+        with self._lock:
+            reason = None
+            if self.jobs or self.bytes:
+                if self.max_bytes and self.bytes + nbytes > self.max_bytes:
+                    reason = "bytes"
+                elif self.max_jobs and self.jobs + jobs > self.max_jobs:
+                    reason = "jobs"
+            if reason is None:
+                self.bytes += nbytes
+                self.jobs += jobs
+                return Ticket(self, nbytes, jobs)
+            self.rejected[reason] += 1
+            retry_after = self._retry_after(reason, nbytes, jobs)
+        raise self.rejection(reason, retry_after)
+
+    def rejection(self, reason: str, retry_after: int = None) -> HTTPException:
+        if retry_after is None:
+            with self._lock:
+                retry_after = self._retry_after(reason, 0, 1)
+        detail = "Too many uploads in flight" if reason == "bytes" else "Too many jobs queued"
+        return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+
+    def drain_rate(self) -> tuple:
+        """(bytes/s, jobs/s) released over the last window."""
+        with self._lock:
+            return self._rates()
+
+    def _rates(self) -> tuple:
+        now = time.monotonic()
+        while self._drained and now - self._drained[0][0] > self.window:
+            self._drained.popleft()
+        if not self._drained:
+            return 0.0, 0.0
+        # cửa sổ ngắn hơn khi service mới chạy: không chia cho cả window
+        span = max(now - self._drained[0][0], 1.0)
+        return sum(d[1] for d in self._drained) / span, sum(d[2] for d in self._drained) / span
+
+    def _retry_after(self, reason: str, nbytes: int, jobs: int) -> int:
+        byte_rate, job_rate = self._rates()
+        if reason == "bytes":
+            excess, rate = self.bytes + nbytes - self.max_bytes, byte_rate
+        else:
+            excess, rate = self.jobs + jobs - self.max_jobs, job_rate
+        seconds = excess / rate if rate > 0 else self.max_retry_after
+        return int(min(self.max_retry_after, max(self.min_retry_after, math.ceil(seconds))))
+
+    def _adjust(self, ticket: Ticket, nbytes: int, jobs: int):
+        with self._lock:
+            if not ticket.released:
+                self.bytes += nbytes - ticket.nbytes
+                self.jobs += jobs - ticket.jobs
+            ticket.nbytes, ticket.jobs = nbytes, jobs
+
+    def _release(self, ticket: Ticket):
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            self.bytes -= ticket.nbytes
+            self.jobs -= ticket.jobs
+            self._drained.append((time.monotonic(), ticket.nbytes, ticket.jobs))
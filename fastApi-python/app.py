@@ -109,42 +109,452 @@
 # app.py (sửa: tạo executor trong startup, dùng spawn context, shutdown đúng lúc)
 import os
 import uuid
-import json
+import hashlib
 import asyncio
+import threading
+import time
 import traceback
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 import multiprocessing
 
-from parser import parse_resume
+import config
+from parser import (
+    DEFAULT_SCHEMA, MODES, bump_version, extract_fields_async, extract_incremental_async, extraction_summary,
+    llm_stage, merge_incremental, normalize_field, parse_source, plan_previous, section_texts, source_ext,
+    source_page_count, stream_fields_async, validate_and_normalize, warm_up,
+)
+import llm
+import parser
+from extraction import extract_pdf_parallel, ocr_pages_parallel
+from cache import ResultCache, SingleFlight
+from jobs import (
+    QueueFull, collect_garbage, import_legacy_results, make_job_queue, read_etag, read_etags, read_many,
+    read_many_raw, read_previous, read_raw, read_status, save_sections, write_status,
+)
+from ingest import BATCH_OPENAPI, UPLOAD_OPENAPI, DiskSink, declared_length, expand_zip, ingest_files, ingest_upload
+from handoff import SharedMemorySink, release_source
+from pipeline import Pipeline
+from deadline import ClientDisconnected, Deadline, DeadlineExceeded, request_deadline, unless_disconnected
+from admission import AdmissionController
+from matching import JobIndex, cv_terms, job_terms, matched_terms, top_k, vectorize, vectorize_many
+from responses import CompressionMiddleware, ORJSONResponse, RawJSONResponse, dumps, etag_matches
+from pool import WorkerPool
+from skills import fill_skills, get_scanner
+from metrics import (
+    INFLIGHT_JOBS, REGISTRY, Counter, Gauge, merge_timings, observe_timings, pool_timings, server_timing, timed,
+)
 
 UPLOAD_DIR = "data/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-app = FastAPI(title="JobConnect Resume Parser (no-file-status)")
+# orjson cho mọi endpoint trả dict; body lớn được nén gzip / brotli theo Accept-Encoding
+app = FastAPI(title="JobConnect Resume Parser (no-file-status)", default_response_class=ORJSONResponse)
+app.add_middleware(CompressionMiddleware, min_size=config.COMPRESS_MIN_BYTES, gzip_level=config.GZIP_LEVEL,
+                   brotli_quality=config.BROTLI_QUALITY)
+
+# cache kết quả theo hash nội dung file: upload lại cùng CV không gọi Gemini lần nữa
+result_cache = ResultCache(
+    config.CACHE_DIR,
+    max_items=config.CACHE_MEMORY_ITEMS,
+    disk_max_bytes=config.CACHE_DISK_MAX_BYTES,
+    ttl_seconds=config.CACHE_TTL_SECONDS,
+)
+# các upload giống hệt nhau đến cùng lúc sẽ chờ chung một lần parse
+parse_flight = SingleFlight()
+# ngân sách byte + job cho các upload đang nhận / chờ parse: vượt thì 429 trước khi đọc body
+admission = AdmissionController(
+    config.ADMISSION_MAX_BYTES, config.ADMISSION_MAX_JOBS, window_seconds=config.ADMISSION_WINDOW_SECONDS,
+    max_retry_after=config.ADMISSION_MAX_RETRY_AFTER,
+)
+
+# index job cho /match: nạp (mmap) lần đầu được dùng, ghi lại định kỳ khi có thay đổi
+_match_lock = threading.Lock()
+
+def get_match_index() -> JobIndex:
+    index = getattr(app.state, "match_index", None)
+    if index is None:
+        with _match_lock:
+            index = getattr(app.state, "match_index", None)
+            if index is None:
+                index = JobIndex.load(config.MATCH_INDEX_DIR, config.MATCH_DIM)
+                app.state.match_index = index
+    return index
+
+def pool_stat(name: str) -> float:
+    # không tạo pool chỉ vì /metrics được scrape
+    executor = getattr(app.state, "executor", None)
+    if executor is None:
+        return 0
+    value = getattr(executor, name)
+    return value() if callable(value) else value
+
+def pool_events() -> dict:
+    executor = getattr(app.state, "executor", None)
+    return {(k,): v for k, v in executor.stats.items()} if executor is not None else {}
+
+def job_queue_depth() -> int:
+    jobs = getattr(app.state, "jobs", None)
+    return jobs.depth() if jobs is not None else 0
+
+REGISTRY.register(Gauge("cv_pool_workers", "Live pool workers", lambda: pool_stat("live_workers")))
+REGISTRY.register(Gauge("cv_pool_max_workers", "Pool size limit", lambda: pool_stat("max_workers")))
+REGISTRY.register(Gauge("cv_pool_busy_workers", "Pool workers running a task", lambda: pool_stat("busy")))
+REGISTRY.register(Gauge("cv_pool_queue_depth", "Pool tasks waiting for a free worker", lambda: pool_stat("queue_depth")))
+REGISTRY.register(Gauge("cv_pool_utilization", "Busy workers / live workers", lambda: pool_stat("utilization")))
+REGISTRY.register(Counter("cv_pool_worker_events_total",
+                          "Worker lifecycle events (started, recycled, crashed, scaled_down, failed_tasks)",
+                          ("event",), fn=pool_events))
+REGISTRY.register(Gauge("cv_job_queue_depth", "Background jobs waiting (/upload?wait=false)", job_queue_depth))
+REGISTRY.register(Gauge("cv_admission_bytes", "Upload bytes held by admitted requests", lambda: admission.bytes))
+REGISTRY.register(Gauge("cv_admission_jobs", "Jobs held by admitted requests", lambda: admission.jobs))
+REGISTRY.register(Gauge("cv_match_jobs", "Jobs in the /match index",
+                        lambda: len(getattr(app.state, "match_index", None) or ())))
+REGISTRY.register(Counter("cv_admission_rejected_total", "Requests rejected with 429 (bytes / jobs budget)",
+                          ("reason",), fn=lambda: {(k,): v for k, v in admission.rejected.items()}))
+for _field, _help in (("active", "Documents inside a pipeline stage"), ("waiting", "Documents queued for a pipeline stage"),
+                      ("limit", "Concurrency limit of a pipeline stage"),
+                      ("expected", "Moving average of seconds a pipeline stage slot is held")):
+    REGISTRY.register(Gauge(f"cv_pipeline_{_field}", _help,
+                            lambda field=_field: get_pipeline().stats(field), labelnames=("stage",)))
+DEADLINE_EXCEEDED = REGISTRY.register(Counter(
+    "cv_deadline_exceeded_total", "Parses stopped because the request deadline passed or could not be met", ("stage",),
+))
+CLIENT_DISCONNECTS = REGISTRY.register(Counter(
+    "cv_client_disconnects_total", "Synchronous uploads cancelled because the client disconnected",
+))
+
+if config.SERVER_TIMING:
+    @app.middleware("http")
+    async def server_timing_header(request: Request, call_next):
+        # endpoint ghi thời gian từng bước vào request.state.timings
+        started = time.perf_counter()
+        response = await call_next(request)
+        timings = dict(getattr(request.state, "timings", None) or {})
+        timings["total"] = time.perf_counter() - started
+        response.headers["Server-Timing"] = server_timing(timings)
+        return response
 
 # --- Không tạo executor ở module import time! ---
 # executor = ProcessPoolExecutor(...)  <-- tránh tạo ở đây
 
-def save_upload(contents: bytes, filename: str) -> str:
-    path = os.path.join(UPLOAD_DIR, filename)
-    with open(path, "wb") as f:
-        f.write(contents)
-    return path
+_executor_lock = threading.Lock()
+
+def make_pool() -> WorkerPool:
+    # spawn (không fork) để tránh rò rỉ liên quan tới fork (Linux).
+    # pool chỉ làm extraction/OCR (CPU); LLM chạy trên event loop với giới hạn riêng (pipeline.py).
+    # initializer: mỗi worker nạp PyMuPDF / Pillow / model OCR ngay khi spawn, không đợi job đầu tiên
+    return WorkerPool(
+        min_workers=config.POOL_MIN_WORKERS, max_workers=config.EXTRACT_WORKERS,
+        max_tasks=config.POOL_MAX_TASKS, max_rss_mb=config.POOL_MAX_RSS_MB,
+        idle_seconds=config.POOL_IDLE_SECONDS, min_free_mb=config.POOL_MIN_FREE_MB,
+        initializer=warm_up, mp_context=multiprocessing.get_context("spawn"),
+    )
+
+def get_executor() -> WorkerPool:
+    # một pool dùng chung cho cả process; tạo ở startup, hoặc ở lần dùng đầu nếu startup chưa chạy
+    executor = getattr(app.state, "executor", None)
+    if executor is None:
+        with _executor_lock:
+            executor = getattr(app.state, "executor", None)
+            if executor is None:
+                executor = app.state.executor = make_pool()
+    return executor
+
+def get_pipeline() -> Pipeline:
+    pipeline = getattr(app.state, "pipeline", None)
+    if pipeline is None:
+        pipeline = app.state.pipeline = Pipeline(config.EXTRACT_CONCURRENCY, config.LLM_CONCURRENCY)
+    return pipeline
+
+def llm_slot(mode: str, timings: dict, deadline: Deadline = None):
+    # mode "fast" chỉ chạy rule (vài ms), không chiếm slot LLM
+    return nullcontext() if mode == "fast" else get_pipeline().llm.slot(timings, deadline)
+
+def deadline_of(request: Request, wait: bool = True) -> Deadline:
+    # job nền / batch: không có response nào đang bị chờ, chỉ có deadline khi client gửi header
+    return request_deadline(request.headers, config.DEADLINE_HEADER,
+                            config.REQUEST_DEADLINE_SECONDS if wait else 0, config.REQUEST_DEADLINE_MAX_SECONDS)
+
+def timeout_body(cv_id: str, e: DeadlineExceeded) -> dict:
+    DEADLINE_EXCEEDED.inc(1, e.stage)
+    return {"cv_id": cv_id, "status": "timeout", "stage": e.stage, "error": str(e)}
+
+def admit(request: Request, max_bytes: int):
+    # chỉ dựa vào header: chưa đọc byte nào của body. Không có Content-Length (chunked) thì giữ mức tối đa
+    return admission.admit(declared_length(request) or max_bytes)
+
+async def ingest_admitted(ticket, ingest):
+    """Run the body ingestion under `ticket`; released on failure, resized to the real size after."""
+    try:
+        uploaded = await ingest
+    except BaseException:
+        ticket.release()
+        raise
+    ticket.resize(nbytes=uploaded["size"])
+    return uploaded
+
+def make_sink(cv_id: str, request: Request, wait: bool):
+    # HANDOFF_MODE=shm: bytes sang worker qua shared memory, không ghi data/uploads.
+    # Cần Content-Length để cấp phát segment; job celery chạy ở process/máy khác nên luôn dùng đĩa.
+    length = declared_length(request)
+    if (config.HANDOFF_MODE == "shm" and 0 < length <= config.SHM_MAX_BYTES
+            and (wait or config.JOB_BACKEND != "celery")):
+        return SharedMemorySink(length)
+    return DiskSink(UPLOAD_DIR, cv_id)
+
+def result_cache_key(sha256: str, mode: str) -> str:
+    # mode "full" giữ nguyên key cũ để cache đã có vẫn dùng được
+    if mode == "full":
+        return f"{config.CACHE_NAMESPACE}-{sha256}"
+    return f"{config.CACHE_NAMESPACE}-{mode}-{sha256}"
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+async def extract_source_report(source: dict, deadline_at: float = None) -> dict:
+    """
+    Extraction stage on the pool (page ranges, OCR of scanned pages); always releases `source`.
+    Workers check `deadline_at` (time.monotonic()) between pages and stop with DeadlineExceeded.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    try:
+        page_count = 0
+        if source_ext(source) == ".pdf":
+            page_count = await asyncio.to_thread(source_page_count, source)
+        if page_count >= config.PDF_PARALLEL_MIN_PAGES * 2:
+            # PDF dài: chia dải trang cho nhiều worker
+            report = await extract_pdf_parallel(
+                executor, source, page_count, config.PDF_PARALLEL_WORKERS, config.PDF_PARALLEL_MIN_PAGES, deadline_at
+            )
+        else:
+            t0 = time.perf_counter()
+            outcome = await loop.run_in_executor(executor, partial(parse_source, source, False, deadline=deadline_at))
+            report = outcome["report"]
+            # thời gian worker tự đo; phần còn lại của wall time là chờ worker rảnh + IPC
+            report["timings"] = pool_timings(time.perf_counter() - t0, report.get("timings"))
+        # trang scan: OCR song song từng trang trên pool
+        report = await ocr_pages_parallel(executor, source, report, deadline=deadline_at)
+    finally:
+        # xóa file tạm / giải phóng shared memory
+        release_source(source)
+    return report
+
+async def extract_llm_fields(text: str, mode: str, timings: dict, deadline: Deadline = None) -> dict:
+    # gọi Gemini ngay trên event loop (client async dùng chung, có rate limit), không chiếm worker;
+    # mode "fast" chỉ chạy rule (vài ms), "hybrid" rule + prompt LLM rút gọn.
+    # deadline của request thay LLM_DEADLINE_SECONDS: chờ token rate limit / retry không vượt quá nó
+    async with llm_slot(mode, timings, deadline):
+        with timed(timings, llm_stage(mode)):
+            llm_data = await extract_fields_async(text, mode, deadline.at if deadline is not None else None)
+    with timed(timings, "normalize"):
+        return validate_and_normalize(llm_data, text)
+
+async def extract_stage_report(source: dict, timings: dict, deadline: Deadline) -> dict:
+    """Extraction under an `extract` slot; past the deadline the queued pool tasks are cancelled."""
+    async with get_pipeline().extract.slot(timings, deadline):
+        return await deadline.run(extract_source_report(source, deadline.at), "extract")
+
+def store_sections(content_hash: str, text: str):
+    # văn bản từng mục, cho lần upload sau (bản sửa) với ?previous=cv_id
+    save_sections(content_hash, section_texts(text))
+
+async def run_parse_source(source: dict, cache_key: str, mode: str = "full", content_hash: str = None,
+                           deadline: Deadline = None) -> dict:
+    """
+    Parse one document through the pipeline stages; returns {"result", "extraction", "timings"}
+    and caches the result (plus its section texts under content_hash, when given).
+    Raises DeadlineExceeded when `deadline` passes, or cannot be met, at a stage boundary.
+    """
+    deadline = deadline or Deadline()
+    timings = {}
+    INFLIGHT_JOBS.inc()
+    try:
+        report = await extract_stage_report(source, timings, deadline)
+        merge_timings(timings, report.get("timings"))
+        result = await extract_llm_fields(report["text"], mode, timings, deadline)
+        outcome = {"result": result, "extraction": extraction_summary(report), "timings": timings}
+        await asyncio.to_thread(result_cache.set, cache_key, outcome["result"])
+        if content_hash:
+            await asyncio.to_thread(store_sections, content_hash, report["text"])
+    finally:
+        INFLIGHT_JOBS.dec()
+    observe_timings(timings)
+    return outcome
+
+async def run_incremental_parse(source: dict, content_hash: str, mode: str, previous: dict,
+                                deadline: Deadline = None) -> dict:
+    """
+    Re-parse an edited resume against `previous` (jobs.read_previous): only the fields of the
+    changed sections go to the LLM, the rest is kept from the previous result, and "version" is
+    bumped when the text changed. Not cached (the result depends on `previous`); releases `source`.
+    """
+    deadline = deadline or Deadline()
+    timings = {}
+    INFLIGHT_JOBS.inc()
+    try:
+        report = await extract_stage_report(source, timings, deadline)
+        merge_timings(timings, report.get("timings"))
+        text = report["text"]
+        sections = section_texts(text)
+        plan = plan_previous(previous, sections, mode)
+        if plan["fields"] is None:
+            result = await extract_llm_fields(text, mode, timings, deadline)
+        else:
+            fields = {}
+            if plan["fields"]:
+                async with llm_slot(mode, timings, deadline):
+                    with timed(timings, llm_stage(mode)):
+                        fields = await extract_incremental_async(text, sections, plan, mode, deadline.at)
+            with timed(timings, "normalize"):
+                result = merge_incremental(previous["result"], fields, text)
+        bump_version(result, previous["result"], plan)
+        await asyncio.to_thread(save_sections, content_hash, sections)
+    finally:
+        INFLIGHT_JOBS.dec()
+        release_source(source)
+    observe_timings(timings)
+    return {"result": result, "extraction": extraction_summary(report), "timings": timings, "incremental": plan}
+
+def shared_parse(source: dict, cache_key: str, mode: str, content_hash: str, deadline: Deadline):
+    """
+    Single-flight parse awaited until `deadline`: a caller that gives up leaves the shared parse to the
+    other callers waiting on it (their deadlines extend it); it is cancelled when none is left.
+    """
+    deadline = deadline or Deadline()
+    return deadline.run(parse_flight.do(
+        cache_key, lambda: run_parse_source(source, cache_key, mode, content_hash, deadline), deadline,
+    ), "parse")
+
+async def parse_with_cache(source: dict, cache_key: str, mode: str = "full", content_hash: str = None,
+                           deadline: Deadline = None) -> dict:
+    """Cache lookup, then single-flight parse. Always releases `source`; adds "cached": True on a hit."""
+    try:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return {"result": cached, "cached": True}
+        return await shared_parse(source, cache_key, mode, content_hash, deadline)
+    finally:
+        release_source(source)
+
+def warm_llm() -> str:
+    if parser.MOCK_GEMINI:
+        return "mock"
+    try:
+        llm.get_client().warm()
+        return "ok"
+    except llm.LLMError as e:
+        return f"error: {e}"
+
+async def warm_up_service():
+    """
+    Background warm-up started by startup_event: the API process's own extraction imports, then
+    the pool's minimum workers (each runs parser.warm_up as its initializer), then the Gemini client.
+    /ready reports ready only after this finished; /health answers from the start.
+    """
+    t0 = time.perf_counter()
+    try:
+        # PyMuPDF (đếm trang PDF trong process API) nạp ở đây, sau khi server đã nhận request
+        status = {"api": await asyncio.to_thread(warm_up)}
+        executor = get_executor()
+        # không chờ vô hạn: pool không spawn được worker (thiếu fd / RAM) thì /ready trả lỗi của nó
+        while not await asyncio.to_thread(executor.wait_ready, None, config.POOL_READY_TIMEOUT_SECONDS):
+            app.state.warmup = {"error": "Pool workers not ready", "pool_error": executor.last_error,
+                                "workers": executor.workers_info()}
+            await asyncio.sleep(1)
+        app.state.warmup = {}
+        status["workers"] = executor.workers_info()
+        status["llm"] = warm_llm()
+        # automaton skill (taxonomy lớn mất vài giây) dựng trong process API, nơi chạy normalize
+        scanner = await asyncio.to_thread(get_scanner)
+        status["skills"] = len(scanner) if scanner is not None else 0
+    except Exception as e:
+        traceback.print_exc()
+        app.state.warmup = {"error": str(e)}
+        return
+    status["seconds"] = round(time.perf_counter() - t0, 3)
+    app.state.warmup = status
+    app.state.ready = True
+
+async def retention_loop():
+    """Import the legacy JSON results once, then drop expired results / orphaned uploads periodically."""
+    try:
+        imported = await asyncio.to_thread(import_legacy_results)
+        if imported:
+            print(f"[store] imported legacy results: {imported}")
+    except Exception:
+        traceback.print_exc()
+    while True:
+        try:
+            removed = await asyncio.to_thread(collect_garbage, UPLOAD_DIR)
+            if removed["results"] or removed["uploads"]:
+                print(f"[store] retention: {removed}")
+        except Exception:
+            traceback.print_exc()
+        await asyncio.sleep(config.RETENTION_INTERVAL_SECONDS)
+
+async def match_save_loop():
+    """Persist the /match index every MATCH_SAVE_INTERVAL_SECONDS when it changed."""
+    while True:
+        await asyncio.sleep(config.MATCH_SAVE_INTERVAL_SECONDS)
+        index = getattr(app.state, "match_index", None)
+        try:
+            if index is not None:
+                await asyncio.to_thread(index.save)
+        except Exception:
+            traceback.print_exc()
+
+async def handle_job(job: dict) -> dict:
+    # job nền (JOB_BACKEND=inprocess): vẫn đi qua cache + single-flight như /upload đồng bộ
+    mode = job.get("mode", "full")
+    deadline = job.get("deadline")
+    try:
+        # job hết deadline khi còn trong hàng đợi dừng ngay ở stage đầu tiên, không chiếm worker / lời gọi LLM
+        if job.get("previous") is not None:
+            outcome = await run_incremental_parse(job["source"], job["sha256"], mode, job["previous"], deadline)
+        else:
+            outcome = await parse_with_cache(job["source"], job["cache_key"], mode, job.get("sha256"), deadline)
+    except DeadlineExceeded as e:
+        DEADLINE_EXCEEDED.inc(1, e.stage)
+        raise
+    finally:
+        job["admission"].release()
+    return outcome["result"]
 
 @app.on_event("startup")
 async def startup_event():
-    # tạo mp context 'spawn' để tránh rò rỉ liên quan tới fork (Linux).
-    # Số worker bạn điều chỉnh theo cpu_count() hoặc config.
-    mp_ctx = multiprocessing.get_context("spawn")
-    max_workers = os.cpu_count() or 2
-    # Lưu executor vào app.state để chia sẻ trong app
-    app.state.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_ctx)
+    # Lưu executor vào app.state để chia sẻ trong app (cấu hình pool: make_pool)
+    get_executor()
     app.state._executor_owner = True  # marker (nếu cần kiểm tra)
+    app.state.pipeline = Pipeline(config.EXTRACT_CONCURRENCY, config.LLM_CONCURRENCY)
+    app.state.jobs = make_job_queue(handle_job)
+    await app.state.jobs.start()
+    # warm-up chạy nền: startup trả về ngay để /health có thể trả lời
+    app.state.ready = False
+    app.state.warmup = {}
+    app.state.warmup_task = asyncio.create_task(warm_up_service())
+    app.state.retention_task = asyncio.create_task(retention_loop())
+    app.state.match_task = asyncio.create_task(match_save_loop())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for name in ("warmup_task", "retention_task", "match_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    jobs = getattr(app.state, "jobs", None)
+    if jobs is not None:
+        await jobs.stop()
+        app.state.jobs = None
+    await llm.close_client()
+    index = getattr(app.state, "match_index", None)
+    if index is not None:
+        await asyncio.to_thread(index.save)
     # dọn executor, chặn tới khi các task kết thúc (hoặc wait=False nếu muốn terminate nhanh)
     exe = getattr(app.state, "executor", None)
     if exe is not None:
@@ -156,55 +566,416 @@ async def shutdown_event():
         finally:
             app.state.executor = None
 
-@app.post("/upload")
-async def upload(file: UploadFile = File(...)):
-    if not file:
-        raise HTTPException(status_code=400, detail="No file uploaded")
-    contents = await file.read()
-
-    if len(contents) > 100 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large")
-
-    _, ext = os.path.splitext(file.filename or "")
-    ext = ext.lower()
-    allowed = {".pdf", ".png", ".jpg", ".jpeg"}
-    if ext not in allowed:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
-
+@app.post("/upload", openapi_extra=UPLOAD_OPENAPI)
+async def upload(
+    request: Request,
+    wait: bool = Query(True, description="false: trả cv_id ngay, lấy kết quả qua /status, /result"),
+    mode: Literal[MODES] = Query("full", description="fast: chỉ rule (xem trước tức thì), hybrid: rule + LLM, full: LLM"),
+    previous: Optional[str] = Query(None, description="cv_id của bản trước của CV này: chỉ gửi các mục đã sửa cho LLM"),
+):
+    previous_data = None
+    if previous:
+        previous_data = await asyncio.to_thread(read_previous, previous)
+        if previous_data is None:
+            raise HTTPException(status_code=404, detail="Previous result not found")
+    # sync: response đang được chờ, mặc định REQUEST_DEADLINE_SECONDS; job nền chỉ theo header
+    deadline = deadline_of(request, wait)
+    if deadline.remaining() <= 0:
+        DEADLINE_EXCEEDED.inc(1, "upload")
+        raise HTTPException(status_code=504, detail="Request deadline already passed")
+    ticket = admit(request, config.MAX_UPLOAD_BYTES)
     cv_id = str(uuid.uuid4())
-    filename = f"{cv_id}_{file.filename}"
-    save_path = save_upload(contents, filename)
-
-    # lấy executor từ app.state
-    executor = getattr(app.state, "executor", None)
-    if executor is None:
-        # fallback: tạo tạm executor (không khuyến nghị lâu dài)
-        mp_ctx = multiprocessing.get_context("spawn")
-        executor = ProcessPoolExecutor(max_workers=1, mp_context=mp_ctx)
+    timings = request.state.timings = {}
+    # stream thẳng xuống đĩa / shared memory (hash + giới hạn kích thước + magic bytes trong lúc đọc)
+    with timed(timings, "upload"):
+        uploaded = await ingest_admitted(ticket, ingest_upload(
+            request, make_sink(cv_id, request, wait), config.MAX_UPLOAD_BYTES, chunk_size=config.UPLOAD_CHUNK_BYTES,
+        ))
+    observe_timings(timings)
+    source = uploaded["source"]
+    save_path = source.get("path", "")
+    cache_key = result_cache_key(uploaded["sha256"], mode)
+
+    # bản sửa (previous): kết quả phụ thuộc bản trước nên không dùng cache theo hash file
+    cached = result_cache.get(cache_key) if previous_data is None else None
+    if cached is not None:
+        release_source(source)
+        ticket.release()
+        # lưu lại để cv_id này làm được `previous` cho lần upload sau
+        await asyncio.to_thread(write_status, cv_id, {"cv_id": cv_id, "status": "done", "result": cached},
+                                uploaded["sha256"])
+        if not wait:
+            return {"cv_id": cv_id, "status": "done"}
+        return ORJSONResponse({
+            "cv_id": cv_id,
+            "status": "done",
+            "mode": mode,
+            "cached": True,
+            "result": cached
+        })
 
-    loop = asyncio.get_running_loop()
-    try:
-        parsed = await loop.run_in_executor(executor, parse_resume, save_path)
-        # xóa file tạm
+    if not wait:
+        await asyncio.to_thread(write_status, cv_id, {"cv_id": cv_id, "status": "pending", "file_path": save_path},
+                                uploaded["sha256"])
         try:
-            os.remove(save_path)
-        except Exception:
-            pass
+            await app.state.jobs.submit({
+                "cv_id": cv_id, "source": source, "file_path": save_path, "cache_key": cache_key, "mode": mode,
+                "sha256": uploaded["sha256"], "previous": previous_data, "previous_id": previous, "admission": ticket,
+                "deadline": deadline,
+            })
+        except QueueFull as e:
+            release_source(source)
+            ticket.release()
+            await asyncio.to_thread(write_status, cv_id, {"cv_id": cv_id, "status": "rejected", "error": str(e)})
+            raise admission.rejection("jobs")
+        if config.JOB_BACKEND != "inprocess":
+            # celery: job nằm trong broker, parse ở process khác (giới hạn bởi JOB_QUEUE_MAX)
+            ticket.release()
+        return {"cv_id": cv_id, "status": "pending"}
 
-        return JSONResponse({
+    try:
+        if previous_data is not None:
+            parse = deadline.run(run_incremental_parse(source, uploaded["sha256"], mode, previous_data, deadline),
+                                 "parse")
+        else:
+            parse = shared_parse(source, cache_key, mode, uploaded["sha256"], deadline)
+        # client ngắt kết nối: huỷ parse (trả slot, bỏ task chưa chạy trên pool) thay vì làm việc không ai nhận
+        outcome = await unless_disconnected(request, parse)
+        merge_timings(timings, outcome.get("timings"))
+        await asyncio.to_thread(write_status, cv_id, {"cv_id": cv_id, "status": "done", "result": outcome["result"]},
+                                uploaded["sha256"])
+        body = {
             "cv_id": cv_id,
             "status": "done",
-            "result": parsed
-        })
+            "mode": mode,
+            "result": outcome["result"],
+            "extraction": outcome["extraction"]
+        }
+        if "incremental" in outcome:
+            body["incremental"] = outcome["incremental"]
+        return ORJSONResponse(body)
+    except ClientDisconnected:
+        CLIENT_DISCONNECTS.inc()
+        # 499 (nginx): không ai đọc response này, chỉ để log / access metrics
+        return Response(status_code=499)
+    except DeadlineExceeded as e:
+        return ORJSONResponse(timeout_body(cv_id, e), status_code=504)
     except Exception as e:
         tb = traceback.format_exc()
-        try:
-            os.remove(save_path)
-        except Exception:
-            pass
-        return JSONResponse({
+        return ORJSONResponse({
             "cv_id": cv_id,
             "status": "error",
             "error": str(e),
             "traceback": tb
         }, status_code=500)
+    finally:
+        # upload trùng đang chờ chung kết quả: file của request này không được parse
+        release_source(source)
+        ticket.release()
+
+@app.post("/upload/stream", openapi_extra=UPLOAD_OPENAPI)
+async def upload_stream(
+    request: Request,
+    mode: Literal[MODES] = Query("full", description="fast: chỉ rule, hybrid: rule + LLM, full: LLM"),
+):
+    """
+    Server-Sent Events: `meta`, `extraction`, rồi một event `field` ({"key", "value"}) cho mỗi mục
+    của Cv ngay khi LLM stream xong và đã normalize, cuối cùng `done` (kết quả đầy đủ) hoặc `error`.
+    Hết deadline: event `error` với status "timeout" và stage đang chạy.
+    """
+    deadline = deadline_of(request)
+    if deadline.remaining() <= 0:
+        DEADLINE_EXCEEDED.inc(1, "upload")
+        raise HTTPException(status_code=504, detail="Request deadline already passed")
+    ticket = admit(request, config.MAX_UPLOAD_BYTES)
+    cv_id = str(uuid.uuid4())
+    timings = request.state.timings = {}
+    with timed(timings, "upload"):
+        uploaded = await ingest_admitted(ticket, ingest_upload(
+            request, make_sink(cv_id, request, True), config.MAX_UPLOAD_BYTES, chunk_size=config.UPLOAD_CHUNK_BYTES,
+        ))
+    observe_timings(timings)
+    source = uploaded["source"]
+    cache_key = result_cache_key(uploaded["sha256"], mode)
+
+    async def events():
+        yield sse_event("meta", {"cv_id": cv_id, "mode": mode})
+        try:
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                release_source(source)
+                for key, value in cached.items():
+                    yield sse_event("field", {"key": key, "value": value})
+                # như /upload: lưu trước "done" để cv_id dùng được cho /result, /status và `previous`
+                await asyncio.to_thread(write_status, cv_id, {"cv_id": cv_id, "status": "done", "result": cached},
+                                        uploaded["sha256"])
+                yield sse_event("done", {"cv_id": cv_id, "status": "done", "cached": True, "result": cached})
+                return
+            stage_timings = {}
+            report = await extract_stage_report(source, stage_timings, deadline)
+            merge_timings(stage_timings, report.get("timings"))
+            yield sse_event("extraction", extraction_summary(report))
+            fields = {}
+            # giữ slot LLM và tính cả thời gian client đọc event (stream chỉ chạy tiếp khi event trước đã gửi)
+            async with llm_slot(mode, stage_timings, deadline):
+                with timed(stage_timings, llm_stage(mode)):
+                    async for key, value in stream_fields_async(report["text"], mode, deadline.at):
+                        fields[key] = value
+                        yield sse_event("field", {"key": key, "value": value})
+            observe_timings(stage_timings)
+            # mục LLM không trả về nhận giá trị mặc định, giống validate_and_normalize
+            result = {k: fields[k] if k in fields else normalize_field(k, None) for k in DEFAULT_SCHEMA}
+            streamed = {"skills": result["skills"], "projects": [dict(p) for p in result["projects"]]}
+            fill_skills(result, report["text"])
+            # skill tìm thấy trong văn bản mà LLM bỏ sót: gửi lại mục đã bổ sung trước "done"
+            for key, value in streamed.items():
+                if result[key] != value:
+                    yield sse_event("field", {"key": key, "value": result[key]})
+            # stream có mục JSON hỏng đã báo lỗi (LLMOutputError) ở trên: tới đây kết quả đủ mục, cache được
+            await asyncio.to_thread(result_cache.set, cache_key, result)
+            await asyncio.to_thread(write_status, cv_id, {"cv_id": cv_id, "status": "done", "result": result},
+                                    uploaded["sha256"])
+            yield sse_event("done", {"cv_id": cv_id, "status": "done", "result": result})
+        except DeadlineExceeded as e:
+            yield sse_event("error", timeout_body(cv_id, e))
+        except Exception as e:
+            yield sse_event("error", {"cv_id": cv_id, "status": "error", "error": str(e)})
+        finally:
+            release_source(source)
+            ticket.release()
+
+    # X-Accel-Buffering: nginx không gom response, event tới client ngay.
+    # background: vé vẫn được trả khi client ngắt trước khi generator kịp chạy
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                             background=BackgroundTask(ticket.release))
+
+@app.post("/upload/batch", openapi_extra=BATCH_OPENAPI)
+async def upload_batch(
+    request: Request,
+    mode: Literal[MODES] = Query("full", description="fast: chỉ rule, hybrid: rule + LLM, full: LLM"),
+):
+    """
+    Nhiều file (field `files`) hoặc file ZIP chứa CV. Tất cả được đưa lên pool cùng lúc,
+    kết quả trả về dạng NDJSON theo thứ tự hoàn thành; lỗi của từng file nằm trong stream.
+    Deadline chỉ theo header (áp cho cả batch): file chưa xong khi hết hạn có status "timeout".
+    """
+    deadline = deadline_of(request, wait=False)
+    ticket = admit(request, config.BATCH_MAX_BYTES)
+    batch_id = str(uuid.uuid4())
+    # Content-Length là tổng cả batch nên không dùng để cấp shm cho từng file: batch luôn đi qua đĩa
+    try:
+        ingested = await ingest_files(
+            request, lambda i: DiskSink(UPLOAD_DIR, f"{batch_id}-{i}"), config.MAX_UPLOAD_BYTES,
+            fields=("files", "file"), max_files=config.BATCH_MAX_FILES, max_total=config.BATCH_MAX_BYTES,
+            item_errors=True, allow_zip=True, chunk_size=config.UPLOAD_CHUNK_BYTES,
+        )
+        items = []
+        for n, entry in enumerate(ingested["files"]):
+            if entry.get("ext") == ".zip":
+                try:
+                    members = await asyncio.to_thread(
+                        expand_zip, entry["source"]["path"], UPLOAD_DIR, f"{batch_id}-z{n}",
+                        config.BATCH_MAX_FILES, config.MAX_UPLOAD_BYTES, config.UPLOAD_CHUNK_BYTES,
+                    )
+                finally:
+                    release_source(entry["source"])
+                items.extend(dict(m, filename=f"{entry['filename']}/{m['filename']}") for m in members)
+            else:
+                items.append(entry)
+        for entry in items[config.BATCH_MAX_FILES:]:
+            release_source(entry.get("source"))
+            entry.pop("source", None)
+            entry["error"] = f"Too many files (max {config.BATCH_MAX_FILES})"
+        # đã nhận xong body: giữ đúng số byte / số file thật (không từ chối nữa)
+        ticket.resize(nbytes=sum(e.get("size", 0) for e in items), jobs=max(1, sum("error" not in e for e in items)))
+    except BaseException:
+        ticket.release()
+        raise
+
+    async def run_item(index: int, entry: dict) -> dict:
+        line = {"index": index, "filename": entry["filename"], "cv_id": str(uuid.uuid4())}
+        if "error" in entry:
+            return dict(line, status="error", error=entry["error"])
+        try:
+            outcome = await parse_with_cache(entry["source"], result_cache_key(entry["sha256"], mode), mode,
+                                             entry["sha256"], deadline)
+        except DeadlineExceeded as e:
+            return dict(line, **timeout_body(line["cv_id"], e))
+        except Exception as e:
+            return dict(line, status="error", error=str(e))
+        return dict(line, status="done", **{k: v for k, v in outcome.items() if k != "timings"})
+
+    async def stream():
+        tasks = [asyncio.create_task(run_item(i, e)) for i, e in enumerate(items)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                line = await fut
+                yield dumps(line) + b"\n"
+        finally:
+            # client ngắt kết nối: huỷ các file chưa chạy, dọn file/shm còn lại
+            for t in tasks:
+                t.cancel()
+            for e in items:
+                release_source(e.get("source"))
+            ticket.release()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", background=BackgroundTask(ticket.release))
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 until every pool worker has finished warming up."""
+    if not getattr(app.state, "ready", False):
+        return ORJSONResponse({"status": "warming", **getattr(app.state, "warmup", {})}, status_code=503)
+    return {"status": "ready", **app.state.warmup}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format: stage histograms, pool / job queue gauges."""
+    # gauge của hàng đợi celery hỏi Redis: không chạy trên event loop
+    body = await asyncio.to_thread(REGISTRY.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/status/{cv_id}")
+async def status(cv_id: str):
+    # /status chỉ báo trạng thái (không đọc / giải nén kết quả), kết quả đầy đủ lấy qua /result
+    data = await asyncio.to_thread(read_status, cv_id, False)
+    if data is None:
+        return ORJSONResponse({"cv_id": cv_id, "status": "not_found"}, status_code=404)
+    return data
+
+@app.get("/result/{cv_id}")
+async def get_result(cv_id: str, request: Request):
+    # lần fetch lặp lại (If-None-Match) chỉ đọc cột etag: 304, không đọc / mã hóa gì thêm
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etag = await asyncio.to_thread(read_etag, cv_id)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+    raw = await asyncio.to_thread(read_raw, cv_id)
+    if raw is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    status, body, etag = raw
+    if status != "done":
+        return ORJSONResponse({"cv_id": cv_id, "status": status})
+    return RawJSONResponse(body, headers={"ETag": etag})
+
+def results_etag(cv_ids: list, etags: dict, include_result: bool) -> str:
+    digest = hashlib.blake2b(b"1" if include_result else b"0", digest_size=16)
+    for key in cv_ids:
+        digest.update(f"{key}:{etags.get(key, '-')}|".encode("utf-8"))
+    return f'"{digest.hexdigest()}"'
+
+@app.get("/results")
+async def get_results(
+    request: Request,
+    cv_id: List[str] = Query(..., description="lặp lại tham số: ?cv_id=a&cv_id=b"),
+    include_result: bool = Query(True, description="false: chỉ trạng thái, như /status"),
+):
+    """Bulk /result: one store query for up to RESULTS_MAX_IDS ids; unknown ids come back as not_found."""
+    if len(cv_id) > config.RESULTS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {config.RESULTS_MAX_IDS} cv_id per request")
+    cv_ids = list(dict.fromkeys(cv_id))
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etag = results_etag(cv_ids, await asyncio.to_thread(read_etags, cv_ids), include_result)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+    found = await asyncio.to_thread(read_many_raw, cv_ids, include_result)
+    parts = [found[key][1] if key in found else dumps({"cv_id": key, "status": "not_found"}) for key in cv_ids]
+    etag = results_etag(cv_ids, {key: row[2] for key, row in found.items()}, include_result)
+    return RawJSONResponse(b'{"results":[' + b",".join(parts) + b"]}", headers={"ETag": etag})
+
+# ---------- /match: CV <-> job (matching.py) ----------
+def job_id_of(job: dict):
+    for key in ("id", "_id", "job_id"):
+        if job.get(key):
+            return str(job[key])
+    return None
+
+def read_cvs(cv_ids: list) -> dict:
+    """Normalized results of the done cv_ids (others are missing from the dict)."""
+    if len(cv_ids) > config.RESULTS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {config.RESULTS_MAX_IDS} cv_id per request")
+    found = read_many(cv_ids)
+    return {key: row["result"] for key, row in found.items() if row.get("status") == "done" and row.get("result")}
+
+def match_jobs(index: JobIndex, payload: dict, k: int) -> dict:
+    if isinstance(payload.get("cv"), dict):
+        terms = cv_terms(payload["cv"])
+        return {"matches": index.search(vectorize(terms, index.dim)[None, :], [terms], k)[0]}
+    if payload.get("cv_id"):
+        cv_ids = [str(payload["cv_id"])]
+    elif isinstance(payload.get("cv_ids"), list):
+        cv_ids = list(dict.fromkeys(str(c) for c in payload["cv_ids"]))
+    else:
+        raise HTTPException(status_code=400, detail="Body needs cv, cv_id or cv_ids")
+    cvs = read_cvs(cv_ids)
+    found = [key for key in cv_ids if key in cvs]
+    terms = [cv_terms(cvs[key]) for key in found]
+    # mọi CV của request chấm với mọi job trong cùng một phép nhân ma trận
+    hits = dict(zip(found, index.search(vectorize_many(terms, index.dim), terms, k)))
+    if "cv_ids" not in payload:
+        if not found:
+            raise HTTPException(status_code=404, detail="Result not found")
+        return {"cv_id": cv_ids[0], "matches": hits[cv_ids[0]]}
+    return {"results": [{"cv_id": key, "matches": hits[key]} if key in hits else {"cv_id": key, "status": "not_found"}
+                        for key in cv_ids]}
+
+def match_cvs(index: JobIndex, payload: dict, k: int) -> dict:
+    if isinstance(payload.get("job"), dict):
+        job_id, terms = job_id_of(payload["job"]), job_terms(payload["job"])
+        vec = vectorize(terms, index.dim)
+    else:
+        job_id = str(payload.get("job_id"))
+        indexed = index.get(job_id)
+        if indexed is None:
+            raise HTTPException(status_code=404, detail="Job not in match index")
+        vec, terms = indexed
+    if not isinstance(payload.get("cv_ids"), list):
+        raise HTTPException(status_code=400, detail="Body needs cv_ids to rank against the job")
+    cv_ids = list(dict.fromkeys(str(c) for c in payload["cv_ids"]))
+    cvs = read_cvs(cv_ids)
+    found = [key for key in cv_ids if key in cvs]
+    cv_term_list = [cv_terms(cvs[key]) for key in found]
+    scores = vectorize_many(cv_term_list, index.dim) @ vec
+    matches = [{"cv_id": found[row], "score": round(score, 4), "matched": matched_terms(terms, cv_term_list[row])}
+               for row, score in top_k(scores, k)[0]]
+    return {"job_id": job_id, "matches": matches, "not_found": [key for key in cv_ids if key not in cvs]}
+
+@app.put("/match/jobs")
+async def put_match_jobs(payload: dict):
+    """Add or replace jobs in the match index: {"jobs": [{"id", "skills", "niceToHave", "tags"}, ...]}."""
+    jobs = payload.get("jobs")
+    if not isinstance(jobs, list) or not all(isinstance(job, dict) for job in jobs):
+        raise HTTPException(status_code=400, detail="Body must be {\"jobs\": [...]}")
+    items = [(job_id_of(job), job) for job in jobs]
+    if any(job_id is None for job_id, _ in items):
+        raise HTTPException(status_code=400, detail="Every job needs an id")
+    index = get_match_index()
+    counts = await asyncio.to_thread(index.upsert, items)
+    return {**counts, "count": len(index)}
+
+@app.delete("/match/jobs/{job_id}")
+async def delete_match_job(job_id: str):
+    index = get_match_index()
+    if not await asyncio.to_thread(index.remove, [job_id]):
+        raise HTTPException(status_code=404, detail="Job not in match index")
+    return {"removed": job_id, "count": len(index)}
+
+@app.post("/match")
+async def match(payload: dict, k: int = Query(config.MATCH_TOP_K, ge=1, le=1000)):
+    """
+    Top-k by cosine of hashed skill vectors, one matrix product per request.
+    CV -> jobs in the index: {"cv": {...}} | {"cv_id": ...} | {"cv_ids": [...]} (stored results).
+    Job -> CVs: {"job": {...}} | {"job_id": ...} (indexed) with {"cv_ids": [...]}.
+    """
+    index = get_match_index()
+    if "job" in payload or "job_id" in payload:
+        return await asyncio.to_thread(match_cvs, index, payload, k)
+    return await asyncio.to_thread(match_jobs, index, payload, k)
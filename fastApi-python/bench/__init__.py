@@ -0,0 +1,7 @@
+# bench/
+# Benchmark từng bước của pipeline trên dữ liệu thật trong bench/fixtures/uploads (PDF) và
+# data/results (JSON đã parse), lưu baseline JSON và báo lỗi khi một bước chậm đi quá ngưỡng:
+#   python -m bench --save-baseline        (trên nhánh chính)
+#   python -m bench --threshold 0.2        (trên nhánh cần kiểm tra, exit 1 nếu chậm hơn 20%)
+# Load test end-to-end (app + server Gemini giả lập, nhiều upload đồng thời): python -m bench.load, xem bench/load.py.
+from bench.suite import compare, load_fixtures, run_suite
@@ -0,0 +1,77 @@
+# python -m bench [--save-baseline] [--threshold 0.2] [--fake-latency-ms 0] [--stage NAME ...]
+# Chạy từ thư mục fastApi-python. Exit code: 0 ổn, 1 có bước lỗi, bước chạy được ở baseline nay không chạy,
+# hoặc bước chậm hơn baseline quá ngưỡng.
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from bench.suite import compare, load_fixtures, run_suite
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def print_report(result: dict, rows: list):
+    print(f"{'stage':<24}{'median ms':>12}{'p95 ms':>12}{'baseline':>12}{'ratio':>8}  status")
+    by_stage = {r["stage"]: r for r in rows}
+    for name, stats in result["stages"].items():
+        row = by_stage.get(name, {})
+        if stats["status"] != "ok":
+            status = row.get("status", "failed" if stats["status"] == "error" else "skipped")
+            print(f"{name:<24}{'-':>12}{'-':>12}{'-':>12}{'-':>8}  {status} ({stats['reason']})")
+            continue
+        base = row.get("baseline_ms")
+        ratio = row.get("ratio")
+        print(f"{name:<24}{stats['median_ms']:>12.4f}{stats['p95_ms']:>12.4f}"
+              f"{base if base is not None else '-':>12}{ratio if ratio is not None else '-':>8}"
+              f"  {row.get('status', 'ok')}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench", description="Per-stage CV pipeline benchmark")
+    ap.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON path")
+    ap.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    ap.add_argument("--output", help="also write this run's results to this JSON file")
+    ap.add_argument("--threshold", type=float, default=0.2,
+                    help="allowed slowdown of the median vs baseline (0.2 = 20%%)")
+    ap.add_argument("--fake-latency-ms", type=float,
+                    default=float(os.environ.get("MOCK_GEMINI_LATENCY_MS", "0")),
+                    help="simulated Gemini latency per call for parse_resume:full")
+    ap.add_argument("--repeat", type=int, default=7, help="samples per stage")
+    ap.add_argument("--min-sample-ms", type=float, default=50, help="minimum duration of one sample")
+    ap.add_argument("--stage", action="append", help="only run this stage (repeatable)")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="cv-bench-") as workdir:
+        fixtures = load_fixtures(workdir)
+        result = run_suite(fixtures, args.fake_latency_ms, args.repeat,
+                           args.min_sample_ms / 1000, args.stage)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    rows = compare(result, baseline, args.threshold) if baseline else []
+    print_report(result, rows)
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"wrote {path}")
+
+    if baseline is None and not args.save_baseline:
+        print(f"no baseline at {args.baseline}; run with --save-baseline first")
+    # không có baseline vẫn fail khi một bước bị lỗi
+    failed = [r["stage"] for r in rows if r["status"] == "failed"] if baseline else \
+        [name for name, stats in result["stages"].items() if stats["status"] == "error"]
+    if failed:
+        print(f"FAILED (stage errored or no longer runs): {', '.join(failed)}")
+    regressed = [r["stage"] for r in rows if r["status"] == "regressed"]
+    if regressed:
+        print(f"REGRESSION (> {args.threshold:.0%} slower): {', '.join(regressed)}")
+    return 1 if failed or regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
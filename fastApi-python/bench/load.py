@@ -0,0 +1,417 @@
+# bench/load.py
+# Load test end-to-end không cần Gemini thật: chạy llm_stub.py (độ trễ / lỗi / đợt 429 giả lập) và
+# uvicorn app:app trong thư mục tạm (uploads, results.db, cache riêng, không đụng data/ của repo), rồi
+# phát lại các PDF trong bench/fixtures/uploads vào POST /upload ở từng mức đồng thời:
+#   python -m bench.load --concurrency 10 50 200 --rate 20 --duration 30 --output load.json
+#   python -m bench.load --baseline load.json --threshold 0.2   (exit 1 nếu throughput / p99 tệ hơn 20%)
+# Mỗi mức báo throughput, phân vị độ trễ, mã trạng thái, mức bận của pool worker (từ /metrics) và
+# đỉnh RSS của process API + worker (đọc /proc), cùng cấu trúc JSON để so sánh giữa hai bản build.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from bench.suite import FIXTURE_DIR, _percentile
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# metric của /metrics được lấy mẫu trong lúc chạy (gauge) hoặc lấy hiệu trước / sau mỗi mức (counter)
+SAMPLED_GAUGES = ("cv_pool_workers", "cv_pool_busy_workers", "cv_pool_queue_depth", "cv_inflight_jobs")
+_METRIC_RE = re.compile(r"^([a-zA-Z_:][\w:]*)(\{[^}]*\})?\s+(\S+)$")
+# so với baseline: chỉ số nào "tệ hơn" khi tăng / khi giảm
+HIGHER_IS_WORSE = ("p50_ms", "p99_ms", "error_rate")
+LOWER_IS_WORSE = ("throughput_rps",)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_metrics(text: str) -> dict:
+    """Prometheus text -> {"name{labels}": value} (labels kept verbatim)."""
+    out = {}
+    for line in text.splitlines():
+        match = _METRIC_RE.match(line)
+        if match and not line.startswith("#"):
+            try:
+                out[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+            except ValueError:
+                pass
+    return out
+
+
+def _proc_status(pid: int) -> dict:
+    out = {}
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii", errors="replace") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("PPid", "VmRSS", "VmHWM"):
+                    out[key] = int(value.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return out
+
+
+def process_tree_rss(root: int) -> dict:
+    """{"api": kB, "workers": kB, "api_hwm": kB} for `root` and its descendants (Linux /proc); {} elsewhere."""
+    if not os.path.isdir("/proc"):
+        return {}
+    parents = {}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            parents.setdefault(_proc_status(int(name)).get("PPid"), []).append(int(name))
+    root_status = _proc_status(root)
+    workers, stack = 0, list(parents.get(root, ()))
+    while stack:
+        pid = stack.pop()
+        workers += _proc_status(pid).get("VmRSS", 0)
+        stack.extend(parents.get(pid, ()))
+    return {"api": root_status.get("VmRSS", 0), "workers": workers, "api_hwm": root_status.get("VmHWM", 0)}
+
+
+class Server:
+    """A uvicorn subprocess (`module:app`) in `cwd`, logging to a file, stopped on exit."""
+
+    def __init__(self, target: str, cwd: str, env: dict, name: str):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.log_path = os.path.join(cwd, f"{name}.log")
+        self._log = open(self.log_path, "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", target, "--app-dir", SERVICE_DIR, "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning", "--no-access-log"],
+            cwd=cwd, env=env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+
+    async def wait(self, path: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(base_url=self.url, timeout=5) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    break
+                try:
+                    if (await client.get(path)).status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.25)
+        raise RuntimeError(f"{self.url}{path} not ready after {timeout:.0f}s, log:\n{self.tail()}")
+
+    def tail(self, lines: int = 30) -> str:
+        self._log.flush()
+        with open(self.log_path, encoding="utf-8", errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self._log.close()
+
+
+def load_payloads(upload_dir: str = FIXTURE_DIR) -> list:
+    """(name, bytes) of every PDF in upload_dir (not deduplicated: replay what was uploaded)."""
+    out = []
+    if os.path.isdir(upload_dir):
+        for name in sorted(os.listdir(upload_dir)):
+            path = os.path.join(upload_dir, name)
+            if name.lower().endswith(".pdf") and os.path.isfile(path):
+                with open(path, "rb") as f:
+                    out.append((name, f.read()))
+    return out
+
+
+class Sampler:
+    """Polls /metrics and the API process tree's RSS every `interval` seconds while a level runs."""
+
+    def __init__(self, client: httpx.AsyncClient, pid: int, interval: float):
+        self.client, self.pid, self.interval = client, pid, interval
+        self.gauges = {name: [] for name in SAMPLED_GAUGES}
+        self.rss_peak = {"api": 0, "workers": 0, "total": 0}
+
+    async def sample(self) -> dict:
+        metrics = parse_metrics((await self.client.get("/metrics")).text)
+        for name in SAMPLED_GAUGES:
+            if name in metrics:
+                self.gauges[name].append(metrics[name])
+        rss = await asyncio.to_thread(process_tree_rss, self.pid)
+        if rss:
+            self.rss_peak["api"] = max(self.rss_peak["api"], rss["api"], rss["api_hwm"])
+            self.rss_peak["workers"] = max(self.rss_peak["workers"], rss["workers"])
+            self.rss_peak["total"] = max(self.rss_peak["total"], rss["api"] + rss["workers"])
+        return metrics
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            try:
+                await self.sample()
+            except httpx.HTTPError:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+def _delta(after: dict, before: dict, prefix: str) -> dict:
+    return {k: after[k] - before.get(k, 0.0) for k in after if k.startswith(prefix)}
+
+
+def stage_means(after: dict, before: dict) -> dict:
+    """Mean server-side ms per pipeline stage during the level (cv_stage_seconds sum / count)."""
+    sums, counts = _delta(after, before, "cv_stage_seconds_sum"), _delta(after, before, "cv_stage_seconds_count")
+    out = {}
+    for key, total in sums.items():
+        stage = re.search(r'stage="([^"]*)"', key)
+        count = counts.get(key.replace("_sum", "_count", 1), 0)
+        if stage and count:
+            out[stage.group(1)] = round(total / count * 1000, 2)
+    return out
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    latencies = sorted(r["ms"] for r in results if r["status"] == 200)
+    statuses = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    out = {
+        "requests": len(results),
+        "ok": len(latencies),
+        "statuses": dict(sorted(statuses.items())),
+        "error_rate": round(1 - len(latencies) / len(results), 4) if results else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed > 0 else 0.0,
+    }
+    if latencies:
+        out.update({f"p{int(q * 100)}_ms": round(_percentile(latencies, q), 1) for q in (0.5, 0.9, 0.95, 0.99)})
+        out.update({"mean_ms": round(statistics.fmean(latencies), 1), "max_ms": round(latencies[-1], 1)})
+    lags = [r["lag_ms"] for r in results]
+    if lags:
+        # request phải chờ chỗ trống (đã đủ `concurrency` request đang chạy) thì trễ so với lịch gửi
+        out["schedule_lag_p99_ms"] = round(_percentile(sorted(lags), 0.99), 1)
+    return out
+
+
+async def run_level(client: httpx.AsyncClient, payloads: list, concurrency: int, rate: float,
+                    duration: float, requests: int, mode: str, unique: bool, sequence: list) -> list:
+    """
+    Upload payloads round-robin with at most `concurrency` in flight: at `rate` per second (open loop;
+    0 = as fast as the slots free up) for `duration` seconds or `requests` uploads, whichever ends first.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    results, tasks = [], []
+    start = time.monotonic()
+
+    async def one(n: int, scheduled: float):
+        try:
+            name, data = payloads[n % len(payloads)]
+            if unique:
+                # thêm comment sau %%EOF: nội dung (hash) khác nhau nên không trúng cache kết quả,
+                # văn bản trích xuất giữ nguyên
+                data = data + b"\n%load-" + str(sequence[0] + n).encode() + b"\n"
+            sent = time.monotonic()
+            try:
+                response = await client.post(f"/upload?mode={mode}", files={"file": (name, data, "application/pdf")})
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            results.append({"status": status, "ms": (time.monotonic() - sent) * 1000,
+                            "lag_ms": max(0.0, sent - scheduled) * 1000})
+        finally:
+            slots.release()
+
+    n = 0
+    while (not requests or n < requests) and time.monotonic() - start < duration:
+        scheduled = start + n / rate if rate > 0 else time.monotonic()
+        if scheduled > time.monotonic():
+            await asyncio.sleep(scheduled - time.monotonic())
+        await slots.acquire()
+        tasks.append(asyncio.create_task(one(n, scheduled)))
+        n += 1
+    await asyncio.gather(*tasks)
+    sequence[0] += n
+    return results
+
+
+async def run_load(args, workdir: str) -> dict:
+    payloads = load_payloads(args.upload_dir)
+    if not payloads:
+        raise SystemExit(f"no PDF in {args.upload_dir}")
+    stub_env = dict(os.environ, STUB_LATENCY_MS=str(args.stub_latency_ms), STUB_JITTER_MS=str(args.stub_jitter_ms),
+                    STUB_LATENCY_DIST=args.stub_latency_dist, STUB_ERROR_RATE=str(args.stub_error_rate),
+                    STUB_429_RATE=str(args.stub_429_rate), STUB_429_BURST_EVERY=str(args.stub_429_burst_every),
+                    STUB_429_BURST_SECONDS=str(args.stub_429_burst_seconds))
+    stub = Server("llm_stub:app", workdir, stub_env, "stub")
+    app = None
+    try:
+        await stub.wait("/stats", args.startup_timeout)
+        overrides = dict(item.split("=", 1) for item in args.env)
+        # cwd = thư mục tạm: data/uploads, data/results.db, data/cache... của app nằm trong đó;
+        # taxonomy trỏ về file của repo vì đường dẫn mặc định là tương đối
+        app_env = dict(os.environ, GEMINI_BASE_URL=stub.url, GEMINI_API_KEY="stub", MOCK_GEMINI="0",
+                       SKILL_TAXONOMY=os.path.join(SERVICE_DIR, "data", "skills.json"),
+                       PYTHONPATH=os.pathsep.join(filter(None, [SERVICE_DIR, os.environ.get("PYTHONPATH")])))
+        app_env.update(overrides)
+        app = Server("app:app", workdir, app_env, "app")
+        await app.wait("/ready", args.startup_timeout)
+
+        levels = {}
+        sequence = [0]
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=app.url, timeout=args.request_timeout, limits=limits) as client, \
+                httpx.AsyncClient(base_url=app.url, timeout=10) as probe:
+            for concurrency in args.concurrency:
+                sampler = Sampler(probe, app.process.pid, args.sample_interval)
+                before = await sampler.sample()
+                stub_before = (await probe.get(f"{stub.url}/stats")).json()
+                stop = asyncio.Event()
+                sampling = asyncio.create_task(sampler.run(stop))
+                t0 = time.monotonic()
+                results = await run_level(client, payloads, concurrency, args.rate, args.duration,
+                                          args.requests, args.mode, not args.allow_cache, sequence)
+                elapsed = time.monotonic() - t0
+                stop.set()
+                await sampling
+                after = await sampler.sample()
+                stub_after = (await probe.get(f"{stub.url}/stats")).json()
+
+                level = summarize(results, elapsed)
+                workers = sampler.gauges["cv_pool_workers"]
+                busy_seconds = after.get("cv_pool_busy_seconds_total", 0.0) - before.get("cv_pool_busy_seconds_total", 0.0)
+                mean_workers = statistics.fmean(workers) if workers else 0.0
+                level["workers"] = {
+                    # thời gian worker báo bận / (thời gian chạy * số worker trung bình)
+                    "utilization": round(busy_seconds / (elapsed * mean_workers), 3) if mean_workers and elapsed else None,
+                    "mean_live": round(mean_workers, 2),
+                    "max_busy": max(sampler.gauges["cv_pool_busy_workers"], default=0),
+                    "max_queue_depth": max(sampler.gauges["cv_pool_queue_depth"], default=0),
+                    "max_inflight": max(sampler.gauges["cv_inflight_jobs"], default=0),
+                }
+                level["memory_mb"] = {k: round(v / 1024, 1) for k, v in sampler.rss_peak.items()} if sampler.rss_peak["api"] else None
+                level["stage_mean_ms"] = stage_means(after, before)
+                level["llm_calls"] = {
+                    status: count - stub_before["statuses"].get(status, 0)
+                    for status, count in stub_after["statuses"].items()
+                    if count - stub_before["statuses"].get(status, 0)
+                }
+                levels[str(concurrency)] = level
+                print(f"concurrency {concurrency}: {level['throughput_rps']} rps, "
+                      f"p99 {level.get('p99_ms', '-')} ms, statuses {level['statuses']}", flush=True)
+        return {
+            "meta": {
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "payloads": len(payloads),
+            },
+            # params phải khớp thì mới so sánh với baseline
+            "params": {
+                "rate": args.rate, "duration": args.duration, "requests": args.requests, "mode": args.mode,
+                "unique": not args.allow_cache, "env": overrides,
+                "stub": {k: v for k, v in stub_env.items() if k.startswith("STUB_")},
+            },
+            "levels": levels,
+        }
+    finally:
+        for server in (app, stub):
+            if server is not None:
+                server.stop()
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> list:
+    """Per level and metric: ratio to the baseline and "regressed" / "improved" / "ok" beyond `threshold`."""
+    rows = []
+    comparable = current.get("params") == baseline.get("params")
+    for level, cur in current["levels"].items():
+        base = baseline.get("levels", {}).get(level)
+        for metric in LOWER_IS_WORSE + HIGHER_IS_WORSE:
+            row = {"level": level, "metric": metric, "current": cur.get(metric),
+                   "baseline": base.get(metric) if base else None, "ratio": None}
+            if not comparable:
+                row["status"] = "incomparable"
+            elif row["current"] is None or row["baseline"] is None:
+                row["status"] = "new"
+            else:
+                worse = row["current"] - row["baseline"] if metric in HIGHER_IS_WORSE else row["baseline"] - row["current"]
+                row["ratio"] = round(row["current"] / row["baseline"], 3) if row["baseline"] else None
+                # tỉ lệ lỗi so theo chênh lệch tuyệt đối (threshold / 10: 0.2 -> 2 điểm %), chỉ số khác theo tỉ lệ
+                limit = threshold / 10 if metric == "error_rate" else threshold * (abs(row["baseline"]) or 1.0)
+                row["status"] = "regressed" if worse > limit else "improved" if -worse > limit else "ok"
+            rows.append(row)
+    return rows
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench.load", description="End-to-end load test against a Gemini stub")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200], help="max uploads in flight, one run each")
+    ap.add_argument("--rate", type=float, default=0, help="target uploads per second (0 = closed loop)")
+    ap.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    ap.add_argument("--requests", type=int, default=0, help="stop a level after this many uploads (0 = duration only)")
+    ap.add_argument("--mode", default="full", choices=("full", "fast", "hybrid"))
+    ap.add_argument("--allow-cache", action="store_true", help="replay the exact bytes (repeated PDFs hit the result cache)")
+    ap.add_argument("--upload-dir", default=FIXTURE_DIR)
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                    help="extra environment for the app, e.g. LLM_RATE_PER_SECOND=50 (repeatable)")
+    ap.add_argument("--stub-latency-ms", type=float, default=800)
+    ap.add_argument("--stub-jitter-ms", type=float, default=300)
+    ap.add_argument("--stub-latency-dist", default="lognormal",
+                    choices=("normal", "uniform", "exponential", "lognormal", "fixed"))
+    ap.add_argument("--stub-error-rate", type=float, default=0.0, help="fraction of LLM calls answered 503")
+    ap.add_argument("--stub-429-rate", type=float, default=0.0, help="fraction of LLM calls answered 429")
+    ap.add_argument("--stub-429-burst-every", type=float, default=0.0, help="seconds between 429 bursts (0 = none)")
+    ap.add_argument("--stub-429-burst-seconds", type=float, default=0.0, help="length of each 429 burst")
+    ap.add_argument("--request-timeout", type=float, default=300)
+    ap.add_argument("--startup-timeout", type=float, default=120)
+    ap.add_argument("--sample-interval", type=float, default=0.5, help="seconds between /metrics and RSS samples")
+    ap.add_argument("--output", help="write the JSON report here")
+    ap.add_argument("--baseline", help="compare with this earlier report")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed change vs baseline (0.2 = 20%%)")
+    args = ap.parse_args(argv)
+    if any(c <= 0 for c in args.concurrency) or any("=" not in e for e in args.env):
+        ap.error("--concurrency must be positive and --env takes KEY=VALUE")
+
+    with tempfile.TemporaryDirectory(prefix="cv-load-") as workdir:
+        report = asyncio.run(run_load(args, workdir))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"wrote {args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        rows = compare(report, json.load(f), args.threshold)
+    print(f"{'level':>6} {'metric':<16}{'current':>12}{'baseline':>12}{'ratio':>8}  status")
+    for row in rows:
+        print(f"{row['level']:>6} {row['metric']:<16}{str(row['current']):>12}{str(row['baseline']):>12}"
+              f"{str(row['ratio'] if row['ratio'] is not None else '-'):>8}  {row['status']}")
+    regressed = [f"{r['level']}:{r['metric']}" for r in rows if r["status"] == "regressed"]
+    if regressed:
+        print(f"REGRESSION (> {args.threshold:.0%}): {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+# bench/suite.py
+# Fixture + đo thời gian từng bước. Mỗi bước chạy lặp trên toàn bộ fixture; số vòng mỗi mẫu
+# được tự chỉnh để một mẫu đủ dài (bước rất nhanh như normalize vẫn đo được), thời gian báo cáo
+# là ms cho một lần gọi (median / p95 / min / mean qua các mẫu).
+import hashlib
+import math
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+import ocr
+import parser
+import rules
+from store import RESULT_DIR, FileStore
+
+# PDF fixture nằm ngoài data/uploads: retention (store.collect_garbage) dọn file cũ không được tham chiếu ở đó
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "uploads")
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+# chênh lệch tuyệt đối nhỏ hơn mức này (ms) coi là nhiễu, không tính là chậm đi
+MIN_DELTA_MS = 0.005
+
+
+def _unique_files(directory: str, exts: tuple) -> list:
+    """Files in `directory` with one of `exts`, deduplicated by content (uploads are often re-sent)."""
+    if not os.path.isdir(directory):
+        return []
+    seen = set()
+    out = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.lower().endswith(exts) or not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if digest not in seen:
+            seen.add(digest)
+            out.append(path)
+    return out
+
+
+def _render_first_pages(pdfs: list, workdir: str) -> list:
+    """PNG of each PDF's first page at OCR_DPI: image fixtures for the OCR stage."""
+    if parser.fitz is None:
+        return []
+    out = []
+    for i, path in enumerate(pdfs):
+        doc = parser.fitz.open(path)
+        try:
+            if doc.page_count == 0:
+                continue
+            pix = doc[0].get_pixmap(dpi=parser.OCR_DPI)
+            png = os.path.join(workdir, f"page-{i}.png")
+            pix.save(png)
+            out.append(png)
+        finally:
+            doc.close()
+    return out
+
+
+def load_fixtures(workdir: str, upload_dir: str = FIXTURE_DIR, result_dir: str = RESULT_DIR) -> dict:
+    """PDFs / images from upload_dir, stored Cv results from result_dir, extracted texts for rules."""
+    pdfs = _unique_files(upload_dir, (".pdf",))
+    images = _unique_files(upload_dir, IMAGE_EXTS) + _render_first_pages(pdfs, workdir)
+    # fixture là các file JSON trong repo, đọc trực tiếp (không qua RESULT_STORE của service)
+    results = []
+    if os.path.isdir(result_dir):
+        for batch in FileStore(result_dir).iter_payloads(status="done"):
+            results.extend(p["result"] for _, p in batch if isinstance(p.get("result"), dict))
+    texts = [parser.extract_text_from_pdf(p) for p in pdfs]
+    return {"pdfs": pdfs, "images": images, "results": results, "texts": texts}
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def time_stage(fn, inputs: list, repeat: int = 7, min_sample_seconds: float = 0.05) -> dict:
+    """Per-call timings (ms) of fn over `inputs`; raises whatever fn raises on the warm-up pass."""
+    t0 = time.perf_counter()
+    for x in inputs:
+        fn(x)
+    one_pass = max(time.perf_counter() - t0, 1e-9)
+    number = max(1, math.ceil(min_sample_seconds / one_pass))
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            for x in inputs:
+                fn(x)
+        samples.append((time.perf_counter() - t0) * 1000 / (number * len(inputs)))
+    return {
+        "status": "ok",
+        "calls": number * len(inputs) * repeat,
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(_percentile(samples, 0.95), 4),
+        "min_ms": round(min(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+    }
+
+
+def missing_dependency(e: BaseException) -> bool:
+    """Errors meaning an optional dependency is absent on this machine (not a broken stage)."""
+    # TesseractNotFoundError so theo tên: không import pytesseract chỉ để kiểm tra kiểu lỗi
+    return isinstance(e, ImportError) or type(e).__name__ == "TesseractNotFoundError"
+
+
+def _pdf_unavailable():
+    return None if parser.fitz is not None else "pymupdf (fitz) not installed"
+
+
+def _ocr_unavailable():
+    if not ocr.engine_available():
+        return "Pillow and pytesseract (or tesserocr) not installed"
+    try:
+        # binary tesseract / traineddata: pytesseract báo TesseractNotFoundError, tesserocr RuntimeError
+        ocr.get_engine().warm()
+    except (ImportError, OSError, RuntimeError) as e:
+        return f"OCR engine unavailable: {type(e).__name__}: {e}"
+    return None
+
+
+# bước -> hàm trả lý do thiếu dependency (None: đủ); bước không có trong bảng không cần gì thêm
+STAGE_REQUIRES = {
+    "extract_text_from_pdf": _pdf_unavailable,
+    "extract_text_from_img": _ocr_unavailable,
+    "parse_resume:fast": _pdf_unavailable,
+    "parse_resume:full": _pdf_unavailable,
+}
+
+
+def _parse_resume(mode: str):
+    return lambda path: parser.parse_resume(path, mode)
+
+
+def stage_table(fixtures: dict) -> list:
+    """(name, fn, inputs, params) for every stage; params must match for a baseline comparison."""
+    return [
+        ("extract_text_from_pdf", parser.extract_text_from_pdf, fixtures["pdfs"], {}),
+        ("extract_text_from_img", parser.extract_text_from_img, fixtures["images"],
+         {"dpi": parser.OCR_DPI}),
+        ("validate_and_normalize", parser.validate_and_normalize, fixtures["results"], {}),
+        ("normalize_many", parser.normalize_many,
+         [fixtures["results"]] if fixtures["results"] else [], {"batch": len(fixtures["results"])}),
+        ("extract_rules", rules.extract_rules, fixtures["texts"], {}),
+        ("parse_resume:fast", _parse_resume("fast"), fixtures["pdfs"], {}),
+        ("parse_resume:full", _parse_resume("full"), fixtures["pdfs"],
+         {"fake_latency_ms": parser.MOCK_GEMINI_LATENCY_MS}),
+    ]
+
+
+def run_suite(fixtures: dict, fake_latency_ms: float = 0, repeat: int = 7,
+              min_sample_seconds: float = 0.05, only: list = None) -> dict:
+    """
+    Time every stage (parse_resume runs under MOCK_GEMINI with `fake_latency_ms` per LLM call).
+    A stage without fixtures or whose optional dependencies are missing (e.g. no tesseract) is
+    reported as skipped with the reason; any other exception is reported as status "error".
+    """
+    parser.MOCK_GEMINI = True
+    parser.MOCK_GEMINI_LATENCY_MS = float(fake_latency_ms)
+    stages = {}
+    for name, fn, inputs, params in stage_table(fixtures):
+        if only and name not in only:
+            continue
+        if not inputs:
+            stages[name] = {"status": "skipped", "reason": "no fixtures", "params": params}
+            continue
+        missing = STAGE_REQUIRES.get(name, lambda: None)()
+        if missing:
+            stages[name] = {"status": "skipped", "reason": missing, "params": params}
+            continue
+        try:
+            stats = time_stage(fn, inputs, repeat, min_sample_seconds)
+        except Exception as e:
+            # bước bị hỏng (không phải thiếu dependency) phải làm gate fail, không được coi là bỏ qua
+            status = "skipped" if missing_dependency(e) else "error"
+            stages[name] = {"status": status, "reason": f"{type(e).__name__}: {e}", "params": params}
+            continue
+        stats["inputs"] = len(inputs)
+        stats["params"] = params
+        stages[name] = stats
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "fixtures": {k: len(v) for k, v in fixtures.items()},
+        },
+        "stages": stages,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> list:
+    """
+    Per-stage comparison of median_ms against the baseline. A stage "regressed" when it is
+    more than `threshold` (0.2 = 20%) slower and the absolute difference exceeds MIN_DELTA_MS.
+    A stage that raised, or was "ok" in the baseline but is not "ok" now, is "failed".
+    """
+    rows = []
+    base_stages = baseline.get("stages", {})
+    for name, cur in current["stages"].items():
+        base = base_stages.get(name)
+        row = {"stage": name, "current_ms": cur.get("median_ms"),
+               "baseline_ms": base.get("median_ms") if base else None, "ratio": None}
+        if cur["status"] == "error" or (cur["status"] != "ok" and base and base.get("status") == "ok"):
+            row["status"] = "failed"
+        elif cur["status"] != "ok":
+            row["status"] = "skipped"
+        elif not base or base.get("status") != "ok":
+            row["status"] = "new"
+        elif base.get("params", {}) != cur.get("params", {}):
+            row["status"] = "incomparable"
+        else:
+            row["ratio"] = round(cur["median_ms"] / base["median_ms"], 3) if base["median_ms"] else None
+            slower = cur["median_ms"] - base["median_ms"]
+            if slower > MIN_DELTA_MS and cur["median_ms"] > base["median_ms"] * (1 + threshold):
+                row["status"] = "regressed"
+            elif -slower > MIN_DELTA_MS and base["median_ms"] > cur["median_ms"] * (1 + threshold):
+                row["status"] = "improved"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
@@ -0,0 +1,171 @@
+# cache.py
+# Content-addressed cache cho kết quả parse: LRU trong RAM + tầng đĩa có TTL/size eviction,
+# kèm single-flight để các upload giống hệt nhau chỉ parse một lần.
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache keyed by content hash.
+    Memory tier: bounded LRU. Disk tier: one JSON file per key, evicted by TTL
+    and by total size (oldest first).
+    """
+
+    def __init__(self, cache_dir: str, max_items: int = 256,
+                 disk_max_bytes: int = 512 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._mem = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                stored_at, value = item
+                if not self._expired(stored_at):
+                    self._mem.move_to_end(key)
+                    return value
+                del self._mem[key]
+
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+        except OSError:
+            return None
+        if self._expired(stored_at):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except Exception:
+            return None
+        self._remember(key, stored_at, value)
+        return value
+
+    def set(self, key: str, value) -> None:
+        now = time.time()
+        self._remember(key, now, value)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        # quét thư mục tốn I/O: chỉ evict định kỳ thay vì sau mỗi lần ghi
+        if now - self._last_evict > 60:
+            self.evict_disk()
+
+    def _remember(self, key: str, stored_at: float, value) -> None:
+        with self._lock:
+            self._mem[key] = (stored_at, value)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+
+    def evict_disk(self) -> None:
+        """Drop expired entries, then the oldest ones until the tier fits in disk_max_bytes."""
+        self._last_evict = time.time()
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if self._expired(st.st_mtime):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total <= self.disk_max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class SingleFlight:
+    """
+    Dedupe concurrent work by key: the first caller starts the coroutine as a task,
+    later callers with the same key await the same result. The task is cancelled once
+    every caller has gone (client disconnected / deadline passed), not when the first one does.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def _finished(self, key: str, entry: dict, task: asyncio.Task):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        # tránh warning "exception was never retrieved" khi không có ai chờ
+        task.cancelled() or task.exception()
+
+    async def do(self, key: str, fn, deadline=None):
+        """
+        `deadline` (deadline.Deadline) of the caller that starts the work is the one `fn` uses;
+        a later caller extends it to its own, so the shared parse runs as long as someone still waits.
+        """
+        entry = self._inflight.get(key)
+        if entry is None:
+            entry = {"task": asyncio.ensure_future(fn()), "waiters": 0, "deadline": deadline}
+            self._inflight[key] = entry
+            entry["task"].add_done_callback(lambda task: self._finished(key, entry, task))
+        elif entry["deadline"] is not None:
+            entry["deadline"].extend(deadline)
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"])
+        finally:
+            entry["waiters"] -= 1
+            if not entry["waiters"] and not entry["task"].done():
+                entry["task"].cancel()
@@ -1 +1,144 @@
-GEMINI_API_KEY = ""
+import os
+
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+
+# ---------- Gemini client (llm.py) ----------
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+# trỏ sang server giả lập khi test: GEMINI_BASE_URL=http://127.0.0.1:8090 (uvicorn llm_stub:app --port 8090)
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+# token bucket cho mỗi process: trung bình LLM_RATE_PER_SECOND request/s, burst tối đa LLM_BURST
+LLM_RATE_PER_SECOND = float(os.environ.get("LLM_RATE_PER_SECOND", "5"))
+LLM_BURST = int(os.environ.get("LLM_BURST", "10"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+# timeout mỗi lần gọi; deadline tính cả chờ rate limit + retry + backoff
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "60"))
+LLM_DEADLINE_SECONDS = float(os.environ.get("LLM_DEADLINE_SECONDS", "120"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "20"))
+
+# ---------- parse result cache (content-addressed) ----------
+CACHE_DIR = os.environ.get("CACHE_DIR", "data/cache")
+# bump when the prompt / normalizer changes so old entries stop matching
+CACHE_NAMESPACE = os.environ.get("CACHE_NAMESPACE", "v2")
+CACHE_MEMORY_ITEMS = int(os.environ.get("CACHE_MEMORY_ITEMS", "256"))
+CACHE_DISK_MAX_BYTES = int(os.environ.get("CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# ---------- staged pipeline (app.py: extraction / LLM / normalize) ----------
+# extraction + OCR (CPU): số worker tối đa của process pool (pool.py)
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+# số tài liệu đang trích xuất cùng lúc; gấp đôi số worker để worker không rảnh giữa hai task
+EXTRACT_CONCURRENCY = int(os.environ.get("EXTRACT_CONCURRENCY", str(EXTRACT_WORKERS * 2)))
+# số lời gọi LLM đồng thời trong process API (I/O, vẫn bị LLM_RATE_PER_SECOND giới hạn tốc độ)
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "32"))
+
+# ---------- worker pool (pool.py) ----------
+# co giãn giữa POOL_MIN_WORKERS và EXTRACT_WORKERS theo số task đang chờ
+POOL_MIN_WORKERS = int(os.environ.get("POOL_MIN_WORKERS", str(max(1, EXTRACT_WORKERS // 2))))
+# worker rảnh quá lâu (trên mức tối thiểu) thì dừng
+POOL_IDLE_SECONDS = float(os.environ.get("POOL_IDLE_SECONDS", "60"))
+# thay worker sau số task này / khi RSS vượt ngưỡng (MB); 0 = không giới hạn
+POOL_MAX_TASKS = int(os.environ.get("POOL_MAX_TASKS", "500"))
+POOL_MAX_RSS_MB = float(os.environ.get("POOL_MAX_RSS_MB", "1024"))
+# không mở thêm worker khi RAM trống của máy (MemAvailable) dưới mức này
+POOL_MIN_FREE_MB = float(os.environ.get("POOL_MIN_FREE_MB", "512"))
+# warm-up chờ worker tối thiểu sẵn sàng tối đa chừng này giây mỗi lần; quá hạn thì /ready báo lỗi (vẫn chờ tiếp)
+POOL_READY_TIMEOUT_SECONDS = float(os.environ.get("POOL_READY_TIMEOUT_SECONDS", "120"))
+
+# ---------- incremental re-parse (/upload?previous=cv_id) ----------
+# các mục phải gửi lại chiếm quá tỉ lệ này của văn bản thì parse toàn bộ
+INCREMENTAL_MAX_RATIO = float(os.environ.get("INCREMENTAL_MAX_RATIO", "0.6"))
+
+# ---------- async job mode (/upload?wait=false, /status, /result) ----------
+# "sqlite": một file SQLite (WAL) cho trạng thái + kết quả; "files": mỗi cv_id một file JSON trong
+# RESULT_DIR (cách cũ, dùng khi worker Celery chạy ở máy khác)
+RESULT_STORE = os.environ.get("RESULT_STORE", "sqlite")
+RESULT_DB = os.environ.get("RESULT_DB", "data/results.db")
+# thư mục JSON cũ: RESULT_STORE=files, và nguồn import một lần khi RESULT_DB còn trống
+RESULT_DIR = os.environ.get("RESULT_DIR", "data/results")
+# số cv_id tối đa của một request GET /results
+RESULTS_MAX_IDS = int(os.environ.get("RESULTS_MAX_IDS", "500"))
+# "inprocess": hàng đợi asyncio trong API; "celery": worker riêng (celery -A tasks worker)
+JOB_BACKEND = os.environ.get("JOB_BACKEND", "inprocess")
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "100"))
+# số job nền chạy cùng lúc: mỗi stage đã tự giới hạn nên chỉ cần đủ để lấp đầy cả hai stage
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", str(EXTRACT_CONCURRENCY + LLM_CONCURRENCY)))
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# ---------- upload ingestion ----------
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# "disk": ghi data/uploads rồi truyền path cho worker; "shm": truyền bytes qua multiprocessing.shared_memory
+HANDOFF_MODE = os.environ.get("HANDOFF_MODE", "disk")
+# upload lớn hơn ngưỡng này vẫn đi qua đĩa (Docker mặc định chỉ cấp 64MB cho /dev/shm)
+SHM_MAX_BYTES = int(os.environ.get("SHM_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# ---------- admission control (admission.py) ----------
+# tổng byte của các upload đang nhận / chờ parse và số job đang giữ; vượt thì 429 + Retry-After (0 = không giới hạn)
+ADMISSION_MAX_BYTES = int(os.environ.get("ADMISSION_MAX_BYTES", str(512 * 1024 * 1024)))
+ADMISSION_MAX_JOBS = int(os.environ.get("ADMISSION_MAX_JOBS", str(JOB_CONCURRENCY + JOB_QUEUE_MAX)))
+# Retry-After = phần vượt / tốc độ giải phóng đo trong cửa sổ này, kẹp trong [1, ADMISSION_MAX_RETRY_AFTER]
+ADMISSION_WINDOW_SECONDS = float(os.environ.get("ADMISSION_WINDOW_SECONDS", "60"))
+ADMISSION_MAX_RETRY_AFTER = int(os.environ.get("ADMISSION_MAX_RETRY_AFTER", "60"))
+
+# ---------- request deadlines (deadline.py) ----------
+# header client gửi thời gian nó còn chờ kết quả: "30", "2.5s", "1500ms"
+DEADLINE_HEADER = os.environ.get("DEADLINE_HEADER", "X-Request-Timeout")
+# mặc định cho upload đồng bộ / stream khi không có header (0 = không giới hạn); job nền và batch chỉ theo header
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "120"))
+REQUEST_DEADLINE_MAX_SECONDS = float(os.environ.get("REQUEST_DEADLINE_MAX_SECONDS", "600"))  # trần cho giá trị header
+
+# ---------- PDF extraction ----------
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "50"))
+PDF_MAX_CHARS = int(os.environ.get("PDF_MAX_CHARS", "200000"))
+PDF_MAX_SECONDS = float(os.environ.get("PDF_MAX_SECONDS", "30"))
+# PDF có >= 2 * PDF_PARALLEL_MIN_PAGES trang được chia dải trang cho nhiều worker
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "8"))
+PDF_PARALLEL_WORKERS = int(os.environ.get("PDF_PARALLEL_WORKERS", str(os.cpu_count() or 2)))
+
+# ---------- OCR (ảnh + trang PDF scan) ----------
+# mặc định như tesseract (eng): máy không có vie.traineddata vẫn OCR được; image Docker bật vie+eng
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+OCR_DPI = int(os.environ.get("OCR_DPI", "200"))
+OCR_MIN_CHARS = int(os.environ.get("OCR_MIN_CHARS", "20"))
+# "auto": tesserocr (C API, engine giữ sẵn trong worker) nếu đã cài, không thì pytesseract
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "auto")
+OCR_MAX_SIDE = int(os.environ.get("OCR_MAX_SIDE", "2400"))
+TESSDATA_PREFIX = os.environ.get("TESSDATA_PREFIX", "")
+
+# ---------- /upload/batch ----------
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "500"))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# ---------- skill taxonomy (skills.py) ----------
+# JSON {"skills": [{"name", "category", "aliases", "exact"}]} hoặc CSV / TSV (name, category, aliases, exact);
+# automaton dựng một lần mỗi process; rỗng = không quét skill
+SKILL_TAXONOMY = os.environ.get("SKILL_TAXONOMY", "data/skills.json")
+
+# ---------- CV <-> job matching (matching.py, /match) ----------
+# index job (ma trận vector băm) lưu ở đây: nạp lại bằng mmap khi khởi động
+MATCH_INDEX_DIR = os.environ.get("MATCH_INDEX_DIR", "data/match")
+# số chiều vector băm; đổi giá trị thì index được băm lại từ term đã lưu
+MATCH_DIM = int(os.environ.get("MATCH_DIM", "4096"))
+MATCH_TOP_K = int(os.environ.get("MATCH_TOP_K", "10"))
+# index có thay đổi thì ghi ra đĩa sau mỗi khoảng này (và khi shutdown)
+MATCH_SAVE_INTERVAL_SECONDS = float(os.environ.get("MATCH_SAVE_INTERVAL_SECONDS", "30"))
+
+# ---------- response encoding (responses.py) ----------
+# nén gzip / brotli (nếu đã cài brotli) theo Accept-Encoding cho body từ mức này trở lên
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+
+# ---------- metrics (/metrics, Server-Timing) ----------
+# thêm header Server-Timing (upload, pool_wait, pdf, ocr, llm, normalize, total) vào response
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+# ---------- retention (store.collect_garbage) ----------
+# kết quả không cập nhật quá lâu thì xóa (0 = giữ mãi); job pending/processing không bị xóa
+RESULT_TTL_SECONDS = float(os.environ.get("RESULT_TTL_SECONDS", str(30 * 24 * 3600)))
+# file trong data/uploads cũ hơn ngưỡng này mà không kết quả nào trong store trỏ tới thì xóa (0 = không dọn)
+# data/uploads chỉ chứa file upload: fixture benchmark nằm ở bench/fixtures/uploads
+UPLOAD_ORPHAN_SECONDS = float(os.environ.get("UPLOAD_ORPHAN_SECONDS", str(24 * 3600)))
+RETENTION_INTERVAL_SECONDS = float(os.environ.get("RETENTION_INTERVAL_SECONDS", "3600"))
@@ -0,0 +1,123 @@
+# deadline.py
+# Deadline cho mỗi request: client (NestJS) gửi thời gian nó còn chờ qua header DEADLINE_HEADER ("30", "2.5s",
+# "1500ms"), không có header thì dùng REQUEST_DEADLINE_SECONDS. Deadline là thời điểm time.monotonic() tuyệt đối,
+# giống deadline của llm.py, nên được truyền qua mọi stage: chờ slot (pipeline.py), task trên pool (worker kiểm tra
+# giữa các trang / bước, CLOCK_MONOTONIC dùng chung trong một máy), lời gọi Gemini (rate limit + retry).
+# Stage thấy deadline đã qua, hoặc không còn đủ thời gian cho chính nó, dừng bằng DeadlineExceeded thay vì làm
+# việc không ai nhận; slot và token rate limit dành cho request còn kịp xong.
+import asyncio
+import re
+import time
+
+_TIMEOUT_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(ms|s)?\s*$", re.IGNORECASE)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed (or too little time was left) before `stage`."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded before {stage}")
+        self.stage = stage
+
+    def __reduce__(self):
+        # lỗi trả về từ worker của pool đi qua pickle: dựng lại từ stage, không từ message
+        return type(self), (self.stage,)
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection while its upload was still being parsed."""
+
+
+def check_deadline(at: float, stage: str, needed: float = 0.0):
+    """Raise DeadlineExceeded unless more than `needed` seconds remain until `at` (None = no deadline)."""
+    if at is not None and at - time.monotonic() <= needed:
+        raise DeadlineExceeded(stage)
+
+
+class Deadline:
+    """
+    Absolute time.monotonic() by which a request's result is needed; `at` None means no limit.
+    Mutable: a duplicate upload joining an in-flight parse (cache.SingleFlight) extends the
+    shared deadline to the later of the two.
+    """
+
+    __slots__ = ("at",)
+
+    def __init__(self, at: float = None):
+        self.at = at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds if seconds else None)
+
+    def remaining(self) -> float:
+        return float("inf") if self.at is None else self.at - time.monotonic()
+
+    def check(self, stage: str, needed: float = 0.0):
+        check_deadline(self.at, stage, needed)
+
+    def extend(self, other: "Deadline"):
+        if self.at is not None:
+            self.at = None if other is None or other.at is None else max(self.at, other.at)
+
+    async def run(self, aw, stage: str):
+        """Await `aw`, cancelling it with DeadlineExceeded(stage) when the deadline passes first."""
+        if self.at is None:
+            return await aw
+        # loop.time() không nhất thiết là time.monotonic() (uvloop): quy đổi theo thời gian còn lại
+        timeout = asyncio.timeout_at(asyncio.get_running_loop().time() + self.remaining())
+        try:
+            async with timeout:
+                return await aw
+        except TimeoutError:
+            if timeout.expired():
+                raise DeadlineExceeded(stage) from None
+            raise
+
+
+def parse_timeout(value: str):
+    """Seconds from a header value such as "30", "2.5s" or "1500ms"; None when malformed."""
+    match = _TIMEOUT_RE.match(value or "")
+    if not match:
+        return None
+    seconds = float(match.group(1))
+    return seconds / 1000 if (match.group(2) or "").lower() == "ms" else seconds
+
+
+def request_deadline(headers, header: str, default_seconds: float = 0, max_seconds: float = 0) -> Deadline:
+    """Deadline from `header` (clamped to max_seconds), else `default_seconds` from now (0 = none)."""
+    seconds = parse_timeout(headers.get(header)) if header and headers.get(header) else None
+    if seconds is None:
+        return Deadline.after(default_seconds)
+    if max_seconds:
+        seconds = min(seconds, max_seconds)
+    # "0": client đã hết thời gian chờ, request dừng ngay ở stage đầu tiên
+    return Deadline(time.monotonic() + seconds)
+
+
+async def wait_for_disconnect(request):
+    """Return once the client closed the connection; call after the request body was read."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def unless_disconnected(request, aw):
+    """
+    Await `aw`; when the client disconnects first, cancel it (releasing its stage slot / queued pool
+    task) and raise ClientDisconnected.
+    """
+    work = asyncio.ensure_future(aw)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait((work, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+            # chờ task dọn dẹp xong (trả slot, xoá file tạm) trước khi handler trả lời
+            await asyncio.gather(work, return_exceptions=True)
+    if work.cancelled():
+        raise ClientDisconnected("Client disconnected before the parse finished")
+    return work.result()
@@ -0,0 +1,104 @@
+# extraction.py
+# Trích xuất PDF dài song song theo dải trang trên process pool, ghép kết quả một lần.
+# Chạy ở process API: mỗi dải trang là một task extract_source_pages trong worker.
+import asyncio
+import time
+
+import parser
+from metrics import merge_timings, pool_timings
+
+
+def plan_page_ranges(page_count: int, workers: int, min_pages: int) -> list:
+    """Split [0, page_count) into at most `workers` contiguous ranges of >= min_pages pages."""
+    if page_count <= 0:
+        return []
+    n = max(1, min(workers, page_count // max(min_pages, 1)))
+    size, extra = divmod(page_count, n)
+    ranges = []
+    start = 0
+    for i in range(n):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def join_page_parts(parts: list, page_count: int, max_chars: int = None) -> dict:
+    """Merge per-range reports (in page order) into one extraction report."""
+    max_chars = parser.PDF_MAX_CHARS if max_chars is None else max_chars
+    truncated = any(p["truncated"] for p in parts)
+    pages = [pg for p in parts for pg in p["pages"]]
+    ocr_pages = [i for p in parts for i in p.get("ocr_pages", [])]
+    report = {"page_count": page_count, "pages": pages}
+    if ocr_pages:
+        # giữ text từng trang để ghép kết quả OCR vào đúng vị trí
+        report["texts"] = [t for p in parts for t in p["texts"]]
+        report["ocr_pages"] = ocr_pages
+        report["text"] = ""
+    else:
+        text = "".join(p["text"] for p in parts)
+        if max_chars and len(text) > max_chars:
+            text = text[:max_chars]
+            truncated = True
+        report["text"] = text
+    report["truncated"] = truncated
+    return report
+
+
+async def extract_pdf_parallel(executor, source: dict, page_count: int, workers: int, min_pages: int,
+                               deadline: float = None) -> dict:
+    limit = min(page_count, parser.PDF_MAX_PAGES) if parser.PDF_MAX_PAGES else page_count
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(executor, parser.extract_source_pages, source, start, stop, deadline)
+        for start, stop in plan_page_ranges(limit, workers, min_pages)
+    ]
+    t0 = time.perf_counter()
+    parts = await asyncio.gather(*futures)
+    wall = time.perf_counter() - t0
+    report = join_page_parts(parts, page_count)
+    report["truncated"] = report["truncated"] or limit < page_count
+    report["ranges"] = len(parts)
+    # các dải chạy song song: thời gian "pdf" là dải chậm nhất
+    slowest = max((p.get("timings", {}).get("pdf", 0.0) for p in parts), default=0.0)
+    report["timings"] = pool_timings(wall, {"pdf": slowest})
+    return report
+
+
+async def ocr_pages_parallel(executor, source: dict, report: dict, max_chars: int = None,
+                             deadline: float = None) -> dict:
+    """
+    OCR the pages listed in report["ocr_pages"] concurrently on the pool (one task per page),
+    splice the text into page order and rebuild report["text"]. Text-layer pages are untouched.
+    """
+    indices = report.get("ocr_pages") or []
+    if not indices:
+        return report
+    max_chars = parser.PDF_MAX_CHARS if max_chars is None else max_chars
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(executor, parser.ocr_source_page, source, i, deadline) for i in indices
+    ))
+    wall = time.perf_counter() - t0
+
+    texts = list(report["texts"])
+    position = {pg["page"] - 1: k for k, pg in enumerate(report["pages"])}
+    for r in results:
+        k = position[r["index"]]
+        texts[k] = r["text"]
+        info = report["pages"][k]
+        info["ocr"] = True
+        info["ocr_ms"] = r["ms"]
+        info["chars"] = len(r["text"])
+        if r["error"]:
+            info["ocr_error"] = r["error"]
+
+    text, cut = parser.join_page_texts(texts, max_chars)
+    out = {k: v for k, v in report.items() if k not in ("texts", "ocr_pages")}
+    out["text"] = text
+    out["truncated"] = report["truncated"] or cut
+    out["ocr_page_count"] = len(indices)
+    slowest = max(r["ms"] for r in results) / 1000
+    out["timings"] = merge_timings(dict(report.get("timings") or {}), pool_timings(wall, {"ocr": slowest}))
+    return out
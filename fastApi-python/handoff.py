@@ -0,0 +1,81 @@
+# handoff.py
+# Chuyển bytes của file upload sang worker parse.
+# "source" là dict mô tả tài liệu, pickle được sang ProcessPoolExecutor:
+#   {"path": "...", "ext": ".pdf"}                        -> file trên đĩa (mặc định)
+#   {"shm": "<name>", "size": 1234, "ext": ".pdf"}        -> multiprocessing.shared_memory (HANDOFF_MODE=shm)
+# Với shm, worker đọc thẳng từ vùng nhớ chung (fitz.open(stream=...)), không ghi/đọc lại đĩa.
+import os
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+
+# segment do process API tạo ra, giữ tham chiếu tới lúc release_source
+_owned = {}
+
+
+class SharedMemorySink:
+    """
+    Upload sink writing into a shared memory segment sized from Content-Length.
+    Pages of /dev/shm are only allocated when touched, so over-sizing is cheap.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(int(capacity), 1)
+        self.size = 0
+        self.ext = None
+        self._shm = None
+
+    async def open(self, filename: str, ext: str):
+        self.ext = ext
+        self._shm = SharedMemory(create=True, size=self.capacity)
+        _owned[self._shm.name] = self._shm
+
+    async def write(self, data: bytes):
+        n = len(data)
+        self._shm.buf[self.size:self.size + n] = data
+        self.size += n
+
+    async def close(self):
+        pass
+
+    def discard(self):
+        if self._shm is not None:
+            release_source(self.source())
+
+    def source(self) -> dict:
+        return {"shm": self._shm.name, "size": self.size, "ext": self.ext}
+
+
+def release_source(source: dict):
+    """Parent side: drop the document once nobody needs it (unlink shm / delete file)."""
+    if not source:
+        return
+    if "shm" in source:
+        shm = _owned.pop(source["shm"], None)
+        if shm is None:
+            return
+        try:
+            shm.close()
+            shm.unlink()
+        except Exception:
+            pass
+    elif source.get("path"):
+        try:
+            os.remove(source["path"])
+        except Exception:
+            pass
+
+
+@contextmanager
+def open_shared(name: str, size: int):
+    """
+    Worker side: yield a read-only memoryview over the segment.
+    Callers must drop every object built on the view (fitz docs, images) before exit.
+    """
+    # worker spawn dùng chung resource tracker với process cha nên attach không gây unlink nhầm
+    shm = SharedMemory(name=name)
+    view = shm.buf[:size].toreadonly()
+    try:
+        yield view
+    finally:
+        view.release()
+        shm.close()
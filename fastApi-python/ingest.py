@@ -0,0 +1,394 @@
+# ingest.py
+# Đọc upload multipart theo luồng thẳng từ socket xuống đĩa: vừa ghi vừa hash + kiểm tra kích thước,
+# dừng ngay khi vượt giới hạn, xác định loại file bằng magic bytes thay vì tin đuôi file.
+# RAM mỗi request chỉ cỡ một chunk, không phụ thuộc kích thước file.
+import os
+import hashlib
+import zipfile
+
+import aiofiles
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# magic bytes -> đuôi file dùng cho parse_resume
+MAGIC_TYPES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"PK\x03\x04", ".zip"),  # chỉ /upload/batch chấp nhận
+]
+# header %PDF- được phép nằm trong 1024 byte đầu (vd. file TopCV bắt đầu bằng "\n%PDF-")
+PDF_MAGIC = b"%PDF-"
+SNIFF_BYTES = 1024
+SAME_EXT = {".jpeg": ".jpg"}
+
+# cho phép vượt max_bytes một chút ở Content-Length vì còn boundary/header của multipart
+MULTIPART_OVERHEAD = 64 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+
+# OpenAPI cho endpoint đọc body thủ công (không dùng File(...) để Starlette không buffer cả form)
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+def sniff_type(head: bytes):
+    # magic dạng tiền tố kiểm tra trước: ZIP chứa PDF không nén cũng có "%PDF-" trong 1024 byte đầu
+    for magic, ext in MAGIC_TYPES:
+        if head.startswith(magic):
+            return ext
+    if PDF_MAGIC in head[:SNIFF_BYTES]:
+        return ".pdf"
+    return None
+
+
+def upload_filename(prefix: str, filename: str, ext: str) -> str:
+    # chỉ lấy basename để tránh path traversal; thêm đuôi thật nếu tên file khai sai
+    name = os.path.basename((filename or "").replace("\\", "/")) or "upload"
+    own_ext = os.path.splitext(name)[1].lower()
+    if SAME_EXT.get(own_ext, own_ext) != ext:
+        name += ext
+    return f"{prefix}_{name}"
+
+
+class _PartCollector:
+    """Sync parser callbacks -> list of events, drained by the async writer after each chunk."""
+
+    def __init__(self):
+        self.events = []
+        self._field = b""
+        self._value = b""
+        self._headers = {}
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = b""
+        self._value = b""
+
+    def _on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = params.get(b"name", b"").decode("utf-8", "replace")
+        filename = params.get(b"filename")
+        if filename is not None:
+            filename = filename.decode("utf-8", "replace")
+        self.events.append(("part", name, filename))
+
+    def _on_part_data(self, data, start, end):
+        self.events.append(("data", bytes(data[start:end])))
+
+    def _on_part_end(self):
+        self.events.append(("end",))
+
+
+class DiskSink:
+    """Upload sink writing to `dest_dir/{prefix}_{filename}` through aiofiles."""
+
+    capacity = None
+
+    def __init__(self, dest_dir: str, prefix: str):
+        self.dest_dir = dest_dir
+        self.prefix = prefix
+        self.path = None
+        self.ext = None
+        self._f = None
+
+    async def open(self, filename: str, ext: str):
+        self.ext = ext
+        self.path = os.path.join(self.dest_dir, upload_filename(self.prefix, filename, ext))
+        self._f = await aiofiles.open(self.path, "wb")
+
+    async def write(self, data: bytes):
+        await self._f.write(data)
+
+    async def close(self):
+        if self._f is not None:
+            await self._f.close()
+            self._f = None
+
+    def discard(self):
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def source(self) -> dict:
+        return {"path": self.path, "ext": self.ext}
+
+
+def declared_length(request: Request) -> int:
+    try:
+        return int(request.headers.get("content-length", "0"))
+    except ValueError:
+        return 0
+
+
+async def ingest_files(request: Request, make_sink, max_bytes: int, fields=("file",), max_files: int = 1,
+                       max_total: int = None, item_errors: bool = False, allow_zip: bool = False,
+                       chunk_size: int = 1024 * 1024) -> dict:
+    """
+    Stream every file part named in `fields` into its own sink (`make_sink(index)`:
+    DiskSink / handoff.SharedMemorySink), hashing and size-checking as bytes arrive.
+    Returns {"files": [entry, ...], "fields": {name: value}} where entry is
+    {"source", "filename", "ext", "size", "sha256"}, or {"filename", "error"} for a rejected
+    part when item_errors=True (otherwise the whole request fails with HTTPException(400)).
+    Sinks are discarded if the request as a whole fails.
+    """
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if ctype != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    # từ chối trước khi đọc body nếu client đã khai báo kích thước quá lớn
+    max_total = max_bytes if max_total is None else max_total
+    if declared_length(request) > max_total + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=400, detail="File too large")
+
+    collector = _PartCollector()
+    parser = MultipartParser(boundary, collector.callbacks())
+    files = []
+    form = {}
+    state = {"entry": None, "field": None, "received": 0}
+
+    async def reject(entry: dict, detail: str):
+        # lỗi của riêng một file: bỏ phần còn lại của part, các file khác vẫn tiếp tục
+        if not item_errors:
+            raise HTTPException(status_code=400, detail=detail)
+        sink = entry.pop("sink", None)
+        if sink is not None:
+            await sink.close()
+            sink.discard()
+        entry["error"] = detail
+
+    async def open_entry(entry: dict):
+        ext = sniff_type(entry["head"])
+        if ext is None or (ext == ".zip" and not allow_zip):
+            await reject(entry, "Unsupported file type")
+            return
+        entry["ext"] = ext
+        entry["sink"] = make_sink(len(files) - 1)
+        await entry["sink"].open(entry["filename"], ext)
+        head, entry["head"] = entry["head"], b""
+        await write_entry(entry, head)
+
+    async def write_entry(entry: dict, data: bytes):
+        entry["size"] += len(data)
+        sink = entry["sink"]
+        if entry["size"] > max_bytes:
+            await reject(entry, "File too large")
+            return
+        if sink.capacity is not None and entry["size"] > sink.capacity:
+            await reject(entry, "Body larger than Content-Length")
+            return
+        entry["sha"].update(data)
+        await sink.write(data)
+
+    async def drain():
+        events = collector.events
+        collector.events = []
+        for ev in events:
+            kind = ev[0]
+            if kind == "part":
+                _, name, filename = ev
+                state["entry"] = state["field"] = None
+                if name in fields and filename is not None:
+                    if len(files) >= max_files:
+                        raise HTTPException(status_code=400, detail=f"Too many files (max {max_files})")
+                    entry = {"filename": filename, "head": b"", "size": 0, "sha": hashlib.sha256(), "sink": None}
+                    files.append(entry)
+                    state["entry"] = entry
+                else:
+                    state["field"] = name
+                    form.setdefault(name, b"")
+            elif kind == "data":
+                data = ev[1]
+                state["received"] += len(data)
+                if state["received"] > max_total:
+                    raise HTTPException(status_code=400, detail="File too large")
+                entry = state["entry"]
+                if entry is not None:
+                    if "error" in entry:
+                        continue
+                    if entry["sink"] is None:
+                        entry["head"] += data
+                        if len(entry["head"]) >= SNIFF_BYTES:
+                            await open_entry(entry)
+                    else:
+                        await write_entry(entry, data)
+                elif state["field"] is not None:
+                    if len(form[state["field"]]) + len(data) > MAX_FIELD_BYTES:
+                        raise HTTPException(status_code=400, detail="Form field too large")
+                    form[state["field"]] += data
+            elif kind == "end":
+                entry = state["entry"]
+                if entry is not None and "error" not in entry:
+                    if entry["sink"] is None:
+                        # file nhỏ hơn vùng sniff
+                        await open_entry(entry)
+                    if "error" not in entry:
+                        await entry["sink"].close()
+                        entry["done"] = True
+                state["entry"] = state["field"] = None
+
+    try:
+        try:
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                # chia nhỏ chunk lớn để hàng đợi event không phình quá chunk_size
+                for i in range(0, len(chunk), chunk_size):
+                    parser.write(chunk[i:i + chunk_size])
+                    await drain()
+            parser.finalize()
+            await drain()
+        except ValueError as e:
+            # lỗi cú pháp multipart của python-multipart (FormParserError là ValueError)
+            raise HTTPException(status_code=400, detail="Malformed multipart body") from e
+        if any("error" not in entry and not entry.get("done") for entry in files):
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+    except BaseException:
+        for entry in files:
+            sink = entry.get("sink")
+            if sink is not None:
+                await sink.close()
+                sink.discard()
+        raise
+
+    out = []
+    for entry in files:
+        if "error" in entry:
+            out.append({"filename": entry["filename"], "error": entry["error"]})
+        else:
+            out.append({
+                "source": entry["sink"].source(),
+                "filename": entry["filename"],
+                "ext": entry["ext"],
+                "size": entry["size"],
+                "sha256": entry["sha"].hexdigest(),
+            })
+    return {"files": out, "fields": {k: v.decode("utf-8", "replace") for k, v in form.items()}}
+
+
+async def ingest_upload(request: Request, sink, max_bytes: int,
+                        field: str = "file", chunk_size: int = 1024 * 1024) -> dict:
+    """
+    Stream the single multipart `field` of the request into `sink` (see ingest_files).
+    Returns {"source", "filename", "ext", "size", "sha256", "fields"}.
+    """
+    ingested = await ingest_files(request, lambda i: sink, max_bytes, fields=(field,), chunk_size=chunk_size)
+    if not ingested["files"]:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    uploaded = ingested["files"][0]
+    uploaded["fields"] = ingested["fields"]
+    return uploaded
+
+
+def expand_zip(path: str, dest_dir: str, prefix: str, max_files: int, max_bytes: int,
+               chunk_size: int = 1024 * 1024) -> list:
+    """
+    Unpack a ZIP of CVs (blocking; run in a thread) into one disk entry per member, with the
+    same per-file checks as ingest_files: magic bytes, size limit on the actual bytes (not the
+    ZIP header), SHA-256. Returns entries in ingest_files format; bad members become error entries.
+    """
+    entries = []
+    try:
+        zf = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        return [{"filename": os.path.basename(path), "error": "Invalid ZIP archive"}]
+    with zf:
+        members = [m for m in zf.infolist() if not m.is_dir() and not m.filename.startswith("__MACOSX/")]
+        for n, info in enumerate(members):
+            name = info.filename
+            if n >= max_files:
+                entries.append({"filename": name, "error": f"Too many files (max {max_files})"})
+                continue
+            if info.file_size > max_bytes:
+                entries.append({"filename": name, "error": "File too large"})
+                continue
+            sha = hashlib.sha256()
+            size = 0
+            out_path = None
+            try:
+                with zf.open(info) as src:
+                    head = src.read(SNIFF_BYTES)
+                    ext = sniff_type(head)
+                    if ext is None or ext == ".zip":
+                        entries.append({"filename": name, "error": "Unsupported file type"})
+                        continue
+                    out_path = os.path.join(dest_dir, upload_filename(f"{prefix}-{n}", name, ext))
+                    with open(out_path, "wb") as f:
+                        data = head
+                        while data:
+                            size += len(data)
+                            # không tin file_size trong header ZIP (zip bomb)
+                            if size > max_bytes:
+                                raise ValueError("File too large")
+                            sha.update(data)
+                            f.write(data)
+                            data = src.read(chunk_size)
+            except Exception as e:
+                if out_path:
+                    try:
+                        os.remove(out_path)
+                    except OSError:
+                        pass
+                entries.append({"filename": name, "error": str(e) or "Invalid ZIP member"})
+                continue
+            entries.append({
+                "source": {"path": out_path, "ext": ext},
+                "filename": name,
+                "ext": ext,
+                "size": size,
+                "sha256": sha.hexdigest(),
+            })
+    return entries
@@ -0,0 +1,228 @@
+# jobs.py
+# Chế độ job bất đồng bộ: /upload trả cv_id ngay, parse chạy nền qua hàng đợi có giới hạn.
+# Backend: "inprocess" (asyncio queue + process pool trong API) hoặc "celery" (worker tách riêng, Redis broker).
+import asyncio
+import threading
+import time
+import traceback
+
+import config
+import store as result_store
+from deadline import DeadlineExceeded
+
+RESULT_DIR = config.RESULT_DIR
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class QueueFull(Exception):
+    pass
+
+
+# ---------- status / result store (store.py: SQLite mặc định, hoặc file JSON) ----------
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = result_store.make_store(config.RESULT_STORE)
+    return _store
+
+
+def write_status(cv_id: str, payload: dict, content_hash: str = None):
+    get_store().put(cv_id, payload, content_hash)
+
+
+def read_status(cv_id: str, with_result: bool = True):
+    return get_store().get(cv_id, with_result)
+
+
+def read_many(cv_ids, with_result: bool = True) -> dict:
+    return get_store().get_many(cv_ids, with_result)
+
+
+# JSON bytes ghép thẳng từ store (không decode / encode lại) + ETag tính lúc ghi
+def read_raw(cv_id: str, with_result: bool = True):
+    return get_store().get_raw(cv_id, with_result)
+
+
+def read_many_raw(cv_ids, with_result: bool = True) -> dict:
+    return get_store().get_many_raw(cv_ids, with_result)
+
+
+def read_etag(cv_id: str):
+    return get_store().etag(cv_id)
+
+
+def read_etags(cv_ids) -> dict:
+    return get_store().etags(cv_ids)
+
+
+def save_sections(content_hash: str, sections: dict):
+    get_store().put_sections(content_hash, sections)
+
+
+def read_previous(cv_id: str):
+    """
+    Finished parse of `cv_id` for an incremental re-parse: {"result", "content_hash", "sections"},
+    or None when it is unknown or not done. "sections" is None when the section texts are no
+    longer stored (the re-parse is then a full one).
+    """
+    store = get_store()
+    payload = store.get(cv_id)
+    if not payload or payload.get("status") != "done" or not isinstance(payload.get("result"), dict):
+        return None
+    content_hash = store.content_hash(cv_id)
+    sections = store.get_sections(content_hash) if content_hash else None
+    return {"result": payload["result"], "content_hash": content_hash, "sections": sections}
+
+
+def import_legacy_results() -> dict:
+    """First start on SQLite: copy the old data/results/*.json files in (kept on disk)."""
+    store = get_store()
+    if not isinstance(store, result_store.SqliteStore) or store.count():
+        return {}
+    return result_store.import_json_results(store, RESULT_DIR)
+
+
+def collect_garbage(upload_dir: str) -> dict:
+    return result_store.collect_garbage(get_store(), upload_dir, config.RESULT_TTL_SECONDS,
+                                        config.UPLOAD_ORPHAN_SECONDS)
+
+
+def error_payload(cv_id: str, e: Exception) -> dict:
+    if isinstance(e, DeadlineExceeded):
+        # hết deadline: không phải lỗi của file, client có thể gửi lại với deadline dài hơn
+        return {"cv_id": cv_id, "status": "timeout", "stage": e.stage, "error": str(e)}
+    return {
+        "cv_id": cv_id,
+        "status": "error",
+        "error": str(e),
+        "traceback": traceback.format_exc()
+    }
+
+
+# ---------- backends ----------
+class InProcessJobQueue:
+    """
+    Bounded asyncio queue consumed by `concurrency` tasks in the API process.
+    `handler(job)` is a coroutine returning the parsed result.
+    """
+
+    def __init__(self, handler, maxsize: int = 100, concurrency: int = 4):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.concurrency = concurrency
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, job: dict):
+        if self._queue is None:
+            raise RuntimeError("Job queue not started")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFull("Job queue is full")
+
+    async def _consume(self):
+        while True:
+            job = await self._queue.get()
+            cv_id = job["cv_id"]
+            try:
+                await asyncio.to_thread(write_status, cv_id, {
+                    "cv_id": cv_id, "status": "processing", "file_path": job["file_path"]
+                })
+                result = await self.handler(job)
+                payload = {"cv_id": cv_id, "status": "done", "file_path": job["file_path"], "result": result}
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                payload = error_payload(cv_id, e)
+            finally:
+                self._queue.task_done()
+            try:
+                await asyncio.to_thread(write_status, cv_id, payload)
+            except Exception:
+                traceback.print_exc()
+
+
+class CeleryJobQueue:
+    """
+    Publish jobs to Celery (Redis broker); parsing runs in `celery -A tasks worker`
+    processes, which may live on other hosts as long as they share data/uploads and the result
+    store (RESULT_STORE=files on a shared directory; the SQLite store needs a single host).
+    `depth_fn` returns the broker backlog and defaults to LLEN on the Redis queue.
+    """
+
+    def __init__(self, celery_app=None, maxsize: int = 100, queue_name: str = "celery", depth_fn=None):
+        if celery_app is None:
+            from tasks import celery_app
+        self.celery_app = celery_app
+        self.maxsize = maxsize
+        self.queue_name = queue_name
+        self._depth_fn = depth_fn
+        if self._depth_fn is None:
+            import redis
+
+            client = redis.Redis.from_url(config.REDIS_URL)
+            self._depth_fn = lambda: client.llen(self.queue_name)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def depth(self) -> int:
+        try:
+            return int(self._depth_fn())
+        except Exception:
+            return 0
+
+    async def submit(self, job: dict):
+        depth = await asyncio.to_thread(self.depth)
+        if depth >= self.maxsize:
+            raise QueueFull("Job queue is full")
+        await asyncio.to_thread(
+            self.celery_app.send_task,
+            "parser.parse_cv",
+            args=[job["cv_id"], job["file_path"], job["cache_key"], job.get("mode", "full")],
+            kwargs=celery_kwargs(job),
+            queue=self.queue_name,
+        )
+
+
+def celery_kwargs(job: dict) -> dict:
+    """Keyword arguments of tasks.parse_cv for `job` (a dict built by app.upload)."""
+    kwargs = {"content_hash": job.get("sha256")}
+    # bản sửa: worker đọc bản trước (result + văn bản các mục) từ store dùng chung theo cv_id
+    if job.get("previous_id"):
+        kwargs["previous"] = job["previous_id"]
+    deadline = job.get("deadline")
+    if deadline is not None and deadline.at is not None:
+        # worker có thể ở máy khác: gửi deadline theo giờ hệ thống (time.time()), không theo monotonic
+        kwargs["deadline_at"] = time.time() + deadline.remaining()
+    return kwargs
+
+
+def make_job_queue(handler):
+    backend = config.JOB_BACKEND
+    if backend == "celery":
+        return CeleryJobQueue(maxsize=config.JOB_QUEUE_MAX)
+    if backend == "inprocess":
+        return InProcessJobQueue(handler, maxsize=config.JOB_QUEUE_MAX, concurrency=config.JOB_CONCURRENCY)
+    raise ValueError(f"Unknown JOB_BACKEND: {backend}")
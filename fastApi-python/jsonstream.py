@@ -0,0 +1,78 @@
+# jsonstream.py
+# Parse dần một JSON object đang được stream từ LLM: mỗi khi một cặp key/value cấp 1
+# (fullname, experiences, skills, ...) đóng lại thì trả về ngay, không chờ hết response.
+# Bỏ qua mọi thứ trước dấu "{" đầu tiên (```json ... code fence).
+import json
+
+
+class ObjectStreamParser:
+    """Incremental parser for a single top-level JSON object; feed() returns completed members."""
+
+    def __init__(self):
+        self.value = {}
+        self.done = False
+        # member không parse được (LLM sinh JSON hỏng ở một mục): không bỏ qua lặng lẽ, người gọi parse lại toàn bộ
+        self.errors = []
+        self._buf = ""
+        self._pos = 0
+        self._start = None  # đầu member hiện tại trong _buf
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> list:
+        """Consume more text; returns [(key, value), ...] for members completed by this chunk."""
+        if self.done:
+            return []
+        self._buf += chunk
+        buf = self._buf
+        out = []
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._start is None:
+                if ch == "{":
+                    self._depth = 1
+                    self._start = i + 1
+            elif self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    out.extend(self._member(buf[self._start:i]))
+                    self.done = True
+                    break
+            elif ch == "," and self._depth == 1:
+                out.extend(self._member(buf[self._start:i]))
+                self._start = i + 1
+            i += 1
+        # giữ lại phần chưa parse xong, bỏ phần đã trả về
+        if self._start is not None and not self.done:
+            self._buf = buf[self._start:]
+            self._pos = i - self._start
+            self._start = 0
+        else:
+            self._buf = ""
+            self._pos = 0
+        return out
+
+    def _member(self, text: str) -> list:
+        text = text.strip()
+        if not text:
+            return []
+        try:
+            member = json.loads("{" + text + "}")
+        except ValueError as e:
+            self.errors.append(f"{e}: {text[:200]}")
+            return []
+        self.value.update(member)
+        return list(member.items())
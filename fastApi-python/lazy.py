@@ -0,0 +1,46 @@
+# lazy.py
+# Import trễ cho các thư viện nặng (PyMuPDF, Pillow, pytesseract, ...): process API khởi động và
+# trả /health ngay, module chỉ thực sự được nạp ở lần dùng đầu tiên (hoặc khi warm-up chạy).
+# Không dùng importlib.util.LazyLoader: trên Python 3.11 nó không an toàn khi nhiều thread
+# (asyncio.to_thread) cùng chạm vào module lần đầu - một thread thấy module mới nạp dở.
+import importlib
+import importlib.util
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for module `name`; the first missing attribute imports it and copies its namespace."""
+
+    def _load(self):
+        # import_module an toàn giữa các thread (import lock theo module)
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name: str):
+    """
+    Lazy stand-in for module `name`; None when it is not installed, so `if module is None`
+    checks keep working. The check only locates the module, it does not execute it.
+    """
+    try:
+        if importlib.util.find_spec(name) is None:
+            return None
+    except (ImportError, ValueError):
+        return None
+    return LazyModule(name)
+
+
+def load(module) -> bool:
+    """Force a lazy module to actually import; False when the import fails."""
+    if module is None:
+        return False
+    try:
+        if isinstance(module, LazyModule):
+            module._load()
+        return True
+    except Exception:
+        return False
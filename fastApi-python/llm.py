@@ -0,0 +1,313 @@
+# llm.py
+# Client Gemini dùng chung cho cả process: một httpx.AsyncClient (giữ kết nối keep-alive),
+# token bucket toàn cục để burst upload không đẩy hàng loạt request vào 429,
+# retry với backoff có jitter, và deadline cho mỗi lần gọi.
+# Gọi REST generateContent trực tiếp nên có thể trỏ GEMINI_BASE_URL sang server giả lập
+# (uvicorn llm_stub:app --port 8090) để test không cần API key thật.
+import asyncio
+import json
+import os
+import queue as _queue
+import random
+import threading
+import time
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+try:
+    import config
+except Exception:
+    config = None
+
+
+def _config_value(name: str, default):
+    if config is not None:
+        return getattr(config, name, default)
+    return os.environ.get(name, default)
+
+
+GEMINI_PUBLIC_URL = "https://generativelanguage.googleapis.com"
+GEMINI_API_KEY = _config_value("GEMINI_API_KEY", "") or ""
+GEMINI_MODEL = _config_value("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_BASE_URL = _config_value("GEMINI_BASE_URL", GEMINI_PUBLIC_URL)
+LLM_RATE_PER_SECOND = float(_config_value("LLM_RATE_PER_SECOND", 5))
+LLM_BURST = int(_config_value("LLM_BURST", 10))
+LLM_MAX_CONNECTIONS = int(_config_value("LLM_MAX_CONNECTIONS", 20))
+LLM_TIMEOUT_SECONDS = float(_config_value("LLM_TIMEOUT_SECONDS", 60))
+LLM_DEADLINE_SECONDS = float(_config_value("LLM_DEADLINE_SECONDS", 120))
+LLM_MAX_RETRIES = int(_config_value("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE = float(_config_value("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(_config_value("LLM_BACKOFF_MAX", 20))
+
+# 429 và lỗi tạm thời phía server: thử lại; 4xx khác (key sai, prompt quá dài) thì không
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class LLMTimeout(LLMError, TimeoutError):
+    pass
+
+
+class TokenBucket:
+    """Async token bucket: `rate` calls per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, deadline: float = None):
+        if self.rate <= 0:
+            return
+        # lock giữ thứ tự FIFO giữa các coroutine đang chờ
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                if deadline is not None and time.monotonic() + wait > deadline:
+                    raise LLMTimeout("LLM deadline exceeded while waiting for rate limit")
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= 1
+
+
+def backoff_delay(attempt: int, base: float = None, cap: float = None) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    base = LLM_BACKOFF_BASE if base is None else base
+    cap = LLM_BACKOFF_MAX if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_after(response) -> float:
+    try:
+        return max(float(response.headers.get("retry-after", "")), 0.0)
+    except ValueError:
+        return None
+
+
+def response_text(payload: dict) -> str:
+    """Concatenate the text parts of the first candidate of a generateContent response."""
+    try:
+        parts = payload["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError):
+        return ""
+    return "".join(p.get("text", "") for p in parts)
+
+
+class GeminiClient:
+    """
+    Async Gemini generateContent client. The HTTP connection pool is created lazily on the
+    event loop that first uses it, so one instance must stay on one loop.
+    """
+
+    def __init__(self, api_key: str = None, model: str = None, base_url: str = None,
+                 rate: float = None, burst: int = None, max_connections: int = None,
+                 timeout: float = None, deadline: float = None, max_retries: int = None):
+        self.api_key = GEMINI_API_KEY if api_key is None else api_key
+        self.model = model or GEMINI_MODEL
+        self.base_url = (base_url or GEMINI_BASE_URL).rstrip("/")
+        self.max_connections = max_connections or LLM_MAX_CONNECTIONS
+        self.timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+        self.deadline = LLM_DEADLINE_SECONDS if deadline is None else deadline
+        self.max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.bucket = TokenBucket(LLM_RATE_PER_SECOND if rate is None else rate,
+                                  LLM_BURST if burst is None else burst)
+        self._http = None
+
+    def _client(self):
+        if self._http is None:
+            if httpx is None:
+                raise LLMError("httpx not installed. pip install httpx")
+            # server giả lập không cần key
+            if not self.api_key and self.base_url == GEMINI_PUBLIC_URL:
+                raise LLMError(
+                    "Google Gemini client not configured. Set GEMINI_API_KEY in config.py or environment variable."
+                )
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._http = httpx.AsyncClient(base_url=self.base_url, limits=limits,
+                                           headers={"x-goog-api-key": self.api_key})
+        return self._http
+
+    def warm(self):
+        """Create the connection pool now; raises LLMError when the client is not configured."""
+        self._client()
+
+    @staticmethod
+    def _body(prompt: str) -> dict:
+        return {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+    async def _acquire(self, deadline: float) -> float:
+        """Wait for a rate-limit token; returns the timeout for this attempt."""
+        await self.bucket.acquire(deadline)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeout("LLM deadline exceeded")
+        return min(self.timeout, remaining)
+
+    async def _backoff(self, attempt: int, error: Exception, retry_after: float, deadline: float):
+        """Sleep before the next attempt, or raise `error` when out of retries or time."""
+        if attempt >= self.max_retries:
+            raise error
+        delay = backoff_delay(attempt) if retry_after is None else retry_after
+        if time.monotonic() + delay >= deadline:
+            raise error
+        await asyncio.sleep(delay)
+
+    async def generate(self, prompt: str, deadline: float = None) -> str:
+        """
+        Return the model's text for `prompt`. `deadline` is an absolute time.monotonic()
+        (default: now + LLM_DEADLINE_SECONDS) covering rate-limit waits, attempts and backoff.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+        http = self._client()
+        url = f"/v1beta/models/{self.model}:generateContent"
+        attempt = 0
+        while True:
+            timeout = await self._acquire(deadline)
+            retry_after = None
+            try:
+                response = await http.post(url, json=self._body(prompt), timeout=timeout)
+            except httpx.TimeoutException as e:
+                error = LLMTimeout(f"LLM request timed out: {e!r}")
+            except httpx.TransportError as e:
+                error = LLMError(f"LLM connection error: {e!r}")
+            else:
+                if response.status_code == 200:
+                    return response_text(response.json())
+                error = LLMError(f"LLM HTTP {response.status_code}: {response.text[:500]}",
+                                 status=response.status_code)
+                if response.status_code not in RETRY_STATUS:
+                    raise error
+                retry_after = _retry_after(response)
+            await self._backoff(attempt, error, retry_after, deadline)
+            attempt += 1
+
+    async def stream(self, prompt: str, deadline: float = None):
+        """
+        Async generator over text chunks from streamGenerateContent (SSE).
+        Retries only happen before the first chunk; a stream cut halfway raises.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.deadline
+        http = self._client()
+        url = f"/v1beta/models/{self.model}:streamGenerateContent"
+        attempt = 0
+        started = False
+        while True:
+            timeout = await self._acquire(deadline)
+            retry_after = None
+            try:
+                async with http.stream("POST", url, params={"alt": "sse"}, json=self._body(prompt),
+                                       timeout=timeout) as response:
+                    if response.status_code == 200:
+                        async for line in response.aiter_lines():
+                            if time.monotonic() > deadline:
+                                raise LLMTimeout("LLM deadline exceeded while streaming")
+                            if not line.startswith("data:"):
+                                continue
+                            text = response_text(json.loads(line[5:]))
+                            if text:
+                                started = True
+                                yield text
+                        return
+                    await response.aread()
+                    error = LLMError(f"LLM HTTP {response.status_code}: {response.text[:500]}",
+                                     status=response.status_code)
+                    if response.status_code not in RETRY_STATUS:
+                        raise error
+                    retry_after = _retry_after(response)
+            except httpx.TimeoutException as e:
+                error = LLMTimeout(f"LLM request timed out: {e!r}")
+            except httpx.TransportError as e:
+                error = LLMError(f"LLM connection error: {e!r}")
+            if started:
+                raise error
+            await self._backoff(attempt, error, retry_after, deadline)
+            attempt += 1
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+_client = None
+# worker process (sync caller): một event loop nền giữ client + kết nối giữa các lần gọi
+_sync_loop = None
+_sync_client = None
+_sync_lock = threading.Lock()
+
+
+def get_client() -> GeminiClient:
+    """Process-wide async client for the caller's event loop (the API process)."""
+    global _client
+    if _client is None:
+        _client = GeminiClient()
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _sync_runner():
+    global _sync_loop, _sync_client
+    with _sync_lock:
+        if _sync_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+            _sync_client = GeminiClient()
+            _sync_loop = loop
+    return _sync_loop, _sync_client
+
+
+def generate_sync(prompt: str, deadline: float = None) -> str:
+    """Blocking generate for worker processes / Celery; reuses one client per process."""
+    loop, client = _sync_runner()
+    return asyncio.run_coroutine_threadsafe(client.generate(prompt, deadline), loop).result()
+
+
+def stream_sync(prompt: str, on_chunk, deadline: float = None) -> str:
+    """Blocking streamed generate: calls on_chunk(text) from the caller's thread, returns the full text."""
+    loop, client = _sync_runner()
+    chunks = []
+
+    async def consume(queue):
+        try:
+            async for text in client.stream(prompt, deadline):
+                queue.put(("chunk", text))
+        except BaseException as e:
+            queue.put(("error", e))
+        else:
+            queue.put(("end", None))
+
+    queue = _queue.SimpleQueue()
+    asyncio.run_coroutine_threadsafe(consume(queue), loop)
+    while True:
+        kind, value = queue.get()
+        if kind == "error":
+            raise value
+        if kind == "end":
+            return "".join(chunks)
+        chunks.append(value)
+        on_chunk(value)
@@ -0,0 +1,121 @@
+# llm_stub.py
+# Server giả lập endpoint generateContent của Gemini để test client llm.py không cần API key:
+#   uvicorn llm_stub:app --port 8090
+#   GEMINI_BASE_URL=http://127.0.0.1:8090 uvicorn app:app
+# Độ trễ / lỗi điều chỉnh qua biến môi trường STUB_LATENCY_MS, STUB_JITTER_MS, STUB_LATENCY_DIST
+# (phân phối độ trễ), STUB_ERROR_RATE (trả 503), STUB_429_RATE (trả 429 kèm Retry-After) và
+# đợt 429 liên tục STUB_429_BURST_SECONDS giây sau mỗi STUB_429_BURST_EVERY giây (giống quota phút của Gemini).
+import asyncio
+import collections
+import json
+import math
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from parser import MOCK_CV
+
+STUB_LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "200"))
+STUB_JITTER_MS = float(os.environ.get("STUB_JITTER_MS", "50"))
+# "normal" (LATENCY ± JITTER), "uniform" (LATENCY ± JITTER), "exponential" (trung bình LATENCY),
+# "lognormal" (trung vị LATENCY, JITTER / LATENCY làm sigma: đuôi dài như API thật), "fixed"
+STUB_LATENCY_DIST = os.environ.get("STUB_LATENCY_DIST", "normal")
+STUB_ERROR_RATE = float(os.environ.get("STUB_ERROR_RATE", "0"))
+STUB_429_RATE = float(os.environ.get("STUB_429_RATE", "0"))
+STUB_RETRY_AFTER = os.environ.get("STUB_RETRY_AFTER", "1")
+# 0 = không có đợt 429
+STUB_429_BURST_EVERY = float(os.environ.get("STUB_429_BURST_EVERY", "0"))
+STUB_429_BURST_SECONDS = float(os.environ.get("STUB_429_BURST_SECONDS", "0"))
+# streamGenerateContent: số ký tự mỗi chunk và độ trễ giữa các chunk
+STUB_CHUNK_CHARS = int(os.environ.get("STUB_CHUNK_CHARS", "40"))
+STUB_CHUNK_MS = float(os.environ.get("STUB_CHUNK_MS", "20"))
+
+app = FastAPI(title="Gemini stub")
+app.state.calls = 0
+app.state.statuses = collections.Counter()
+app.state.started = time.monotonic()
+
+
+def latency_ms() -> float:
+    if STUB_LATENCY_DIST == "fixed":
+        value = STUB_LATENCY_MS
+    elif STUB_LATENCY_DIST == "uniform":
+        value = random.uniform(STUB_LATENCY_MS - STUB_JITTER_MS, STUB_LATENCY_MS + STUB_JITTER_MS)
+    elif STUB_LATENCY_DIST == "exponential":
+        value = random.expovariate(1 / STUB_LATENCY_MS) if STUB_LATENCY_MS > 0 else 0.0
+    elif STUB_LATENCY_DIST == "lognormal":
+        sigma = STUB_JITTER_MS / STUB_LATENCY_MS if STUB_LATENCY_MS > 0 else 0.0
+        value = random.lognormvariate(math.log(STUB_LATENCY_MS), sigma) if STUB_LATENCY_MS > 0 else 0.0
+    else:
+        value = random.gauss(STUB_LATENCY_MS, STUB_JITTER_MS)
+    return max(0.0, value)
+
+
+def in_429_burst() -> bool:
+    if STUB_429_BURST_EVERY <= 0 or STUB_429_BURST_SECONDS <= 0:
+        return False
+    # đợt 429 ở cuối mỗi chu kỳ: chạy ổn định trước rồi mới bị chặn
+    return (time.monotonic() - app.state.started) % STUB_429_BURST_EVERY >= STUB_429_BURST_EVERY - STUB_429_BURST_SECONDS
+
+
+async def simulate(request: Request):
+    """Latency + injected failures shared by both endpoints; returns (prompt, error_response)."""
+    app.state.calls += 1
+    body = await request.json()
+    await asyncio.sleep(latency_ms() / 1000)
+
+    roll = random.random()
+    if in_429_burst() or roll < STUB_429_RATE:
+        app.state.statuses[429] += 1
+        return None, JSONResponse({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                                  status_code=429, headers={"Retry-After": STUB_RETRY_AFTER})
+    if roll < STUB_429_RATE + STUB_ERROR_RATE:
+        app.state.statuses[503] += 1
+        return None, JSONResponse({"error": {"code": 503, "status": "UNAVAILABLE"}}, status_code=503)
+    app.state.statuses[200] += 1
+    return body["contents"][0]["parts"][0]["text"], None
+
+
+def stub_output(prompt: str) -> str:
+    cv = dict(MOCK_CV, summary=f"Stub resume ({len(prompt)} prompt chars)")
+    return json.dumps(cv, ensure_ascii=False, indent=2)
+
+
+def candidate(text: str, model: str, finish: str = None) -> dict:
+    cand = {"content": {"role": "model", "parts": [{"text": text}]}}
+    if finish:
+        cand["finishReason"] = finish
+    return {"candidates": [cand], "modelVersion": model}
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    prompt, error = await simulate(request)
+    if error is not None:
+        return error
+    return candidate(stub_output(prompt), model, "STOP")
+
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def stream_generate_content(model: str, request: Request):
+    prompt, error = await simulate(request)
+    if error is not None:
+        return error
+    text = stub_output(prompt)
+
+    async def chunks():
+        for i in range(0, len(text), STUB_CHUNK_CHARS):
+            last = i + STUB_CHUNK_CHARS >= len(text)
+            part = candidate(text[i:i + STUB_CHUNK_CHARS], model, "STOP" if last else None)
+            yield f"data: {json.dumps(part, ensure_ascii=False)}\r\n\r\n"
+            await asyncio.sleep(STUB_CHUNK_MS / 1000)
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def stats():
+    return {"calls": app.state.calls, "statuses": {str(k): v for k, v in sorted(app.state.statuses.items())}}
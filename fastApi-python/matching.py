@@ -0,0 +1,269 @@
+# matching.py
+# Ghép CV <-> job không cần embedding: skill đã chuẩn hóa (skills, experiences[].tags,
+# projects[].techStack của CV; skills / niceToHave / tags của job) được băm thành vector thưa
+# (hashing trick, có dấu) rồi chuẩn hóa L2, nên tích vô hướng = cosine. Mọi job nằm trong một
+# ma trận NumPy: chấm một CV với hàng nghìn job (hoặc một job với nhiều CV) là một phép nhân ma trận.
+# Index lưu ra đĩa dạng .npy và nạp lại bằng mmap (copy-on-write) nên khởi động lại không phải tính lại.
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+from skills import canonical_name
+
+MATCH_DIM = 4096
+# trọng số theo nguồn của term; một term xuất hiện ở nhiều nguồn lấy trọng số lớn nhất
+CV_WEIGHTS = {"skills": 1.0, "techStack": 0.7, "tags": 0.5}
+JOB_WEIGHTS = {"skills": 1.0, "techStack": 0.7, "tags": 0.5, "niceToHave": 0.5}
+_DROP_RE = re.compile(r"[^\w.+# -]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_term(value) -> str:
+    """Canonical form of a skill / tag: an item may be a string or a {"name": ...} object."""
+    if isinstance(value, dict):
+        value = value.get("name")
+    if not isinstance(value, str):
+        return ""
+    # alias / biến thể tiếng Việt trong taxonomy (skills.py) -> tên chuẩn: "JS", "javascript" cùng một term
+    term = unicodedata.normalize("NFKC", canonical_name(value.strip())).casefold()
+    return _SPACE_RE.sub(" ", _DROP_RE.sub(" ", term)).strip(" .-")
+
+
+def _add_terms(terms: dict, values, weight: float):
+    for value in values or ():
+        term = normalize_term(value)
+        if term and terms.get(term, 0.0) < weight:
+            terms[term] = weight
+
+
+def cv_terms(cv: dict) -> dict:
+    """term -> weight for a normalized Cv."""
+    terms = {}
+    _add_terms(terms, cv.get("skills"), CV_WEIGHTS["skills"])
+    for project in cv.get("projects") or ():
+        if isinstance(project, dict):
+            _add_terms(terms, project.get("techStack"), CV_WEIGHTS["techStack"])
+    for experience in cv.get("experiences") or ():
+        if isinstance(experience, dict):
+            _add_terms(terms, experience.get("tags"), CV_WEIGHTS["tags"])
+    _add_terms(terms, cv.get("tags"), CV_WEIGHTS["tags"])
+    return terms
+
+
+def job_terms(job: dict) -> dict:
+    """term -> weight for a job as the NestJS Job schema stores it (skills: [{name, level}])."""
+    terms = {}
+    for key, weight in JOB_WEIGHTS.items():
+        values = job.get(key)
+        if isinstance(values, str):
+            values = values.split(",")
+        _add_terms(terms, values, weight)
+    return terms
+
+
+def _slot(term: str, dim: int) -> tuple:
+    h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+    # bit cao nhất làm dấu: va chạm băm triệt tiêu nhau thay vì cộng dồn thành điểm giả
+    return (h & 0x7FFFFFFFFFFFFFFF) % dim, (1.0 if h >> 63 else -1.0)
+
+
+def vectorize(terms: dict, dim: int = MATCH_DIM, out: np.ndarray = None) -> np.ndarray:
+    """Unit-length hashed feature vector (all zeros when there is no term)."""
+    vec = np.zeros(dim, dtype=np.float32) if out is None else out
+    if out is not None:
+        vec[:] = 0
+    for term, weight in terms.items():
+        index, sign = _slot(term, dim)
+        vec[index] += sign * weight
+    norm = float(np.linalg.norm(vec))
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+def vectorize_many(term_dicts: list, dim: int = MATCH_DIM) -> np.ndarray:
+    matrix = np.zeros((len(term_dicts), dim), dtype=np.float32)
+    for row, terms in zip(matrix, term_dicts):
+        vectorize(terms, dim, out=row)
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int, min_score: float = 0.0) -> list:
+    """Per query row: [(column, score)] of the k best columns above `min_score`, best first."""
+    if scores.ndim == 1:
+        scores = scores[None, :]
+    n = scores.shape[1]
+    if n == 0 or k <= 0:
+        return [[] for _ in range(scores.shape[0])]
+    k = min(k, n)
+    # argpartition: O(n) mỗi hàng, chỉ sắp xếp k phần tử tốt nhất
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (scores.shape[0], 1))
+    out = []
+    for row, columns in zip(scores, best):
+        # điểm bằng nhau: cột nhỏ hơn (job thêm trước) đứng trước
+        columns = columns[np.lexsort((columns, -row[columns]))]
+        out.append([(int(c), float(row[c])) for c in columns if row[c] > min_score])
+    return out
+
+
+def matched_terms(query: dict, candidate: dict) -> list:
+    """Terms both sides share, heaviest first (explains a score)."""
+    shared = query.keys() & candidate.keys()
+    return sorted(shared, key=lambda t: (-query[t] * candidate[t], t))
+
+
+class JobIndex:
+    """
+    Jobs as rows of a float32 matrix (row = unit hashed vector) plus their terms.
+    upsert/remove are incremental: a removed row is replaced by the last one, so the matrix stays
+    dense and a query is a single matrix product over [:count]. Thread-safe.
+    """
+
+    def __init__(self, dim: int = MATCH_DIM, directory: str = None):
+        self.dim = dim
+        self.directory = directory
+        self.ids = []  # row -> job_id
+        self.rows = {}  # job_id -> row
+        self.terms = []  # row -> {term: weight}
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.version = 0
+        self.saved_version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.saved_version
+
+    def _reserve(self, count: int):
+        if count <= self.matrix.shape[0]:
+            return
+        # tăng gấp đôi: thêm từng job vẫn là O(1) trung bình; ma trận mmap được chép sang RAM ở đây
+        grown = np.zeros((max(64, count, self.matrix.shape[0] * 2), self.dim), dtype=np.float32)
+        grown[: len(self.ids)] = self.matrix[: len(self.ids)]
+        self.matrix = grown
+
+    def upsert(self, jobs: list) -> dict:
+        """Add or replace jobs given as (job_id, job dict); returns {"added", "updated"}."""
+        prepared = [(job_id, terms := job_terms(job), vectorize(terms, self.dim)) for job_id, job in jobs]
+        added = updated = 0
+        with self._lock:
+            self._reserve(len(self.ids) + len(prepared))
+            for job_id, terms, vec in prepared:
+                row = self.rows.get(job_id)
+                if row is None:
+                    row = len(self.ids)
+                    self.rows[job_id] = row
+                    self.ids.append(job_id)
+                    self.terms.append(terms)
+                    added += 1
+                else:
+                    self.terms[row] = terms
+                    updated += 1
+                self.matrix[row] = vec
+            if prepared:
+                self.version += 1
+        return {"added": added, "updated": updated}
+
+    def remove(self, job_ids) -> int:
+        removed = 0
+        with self._lock:
+            for job_id in job_ids:
+                row = self.rows.pop(job_id, None)
+                if row is None:
+                    continue
+                last = len(self.ids) - 1
+                if row != last:
+                    self.matrix[row] = self.matrix[last]
+                    self.ids[row] = self.ids[last]
+                    self.terms[row] = self.terms[last]
+                    self.rows[self.ids[row]] = row
+                self.ids.pop()
+                self.terms.pop()
+                removed += 1
+            if removed:
+                self.version += 1
+        return removed
+
+    def get(self, job_id: str):
+        """(unit vector copy, terms) of an indexed job, or None."""
+        with self._lock:
+            row = self.rows.get(job_id)
+            if row is None:
+                return None
+            return self.matrix[row].copy(), self.terms[row]
+
+    def search(self, queries: np.ndarray, query_terms: list, k: int = 10, min_score: float = 0.0) -> list:
+        """Top-k jobs for each query row: [[{"job_id", "score", "matched"}]] in query order."""
+        with self._lock:
+            count = len(self.ids)
+            scores = queries @ self.matrix[:count].T
+            ranked = top_k(scores, k, min_score)
+            return [
+                [{"job_id": self.ids[row], "score": round(score, 4), "matched": matched_terms(terms, self.terms[row])}
+                 for row, score in hits]
+                for terms, hits in zip(query_terms, ranked)
+            ]
+
+    # ---------- persistence ----------
+    def _paths(self) -> tuple:
+        return os.path.join(self.directory, "jobs.npy"), os.path.join(self.directory, "jobs.json")
+
+    def save(self) -> bool:
+        """Write the index if it changed since the last save (atomic replace of both files)."""
+        if self.directory is None:
+            return False
+        with self._lock:
+            if not self.dirty:
+                return False
+            version = self.version
+            # chụp dưới lock, ghi đĩa ngoài lock: query không bị chặn trong lúc ghi
+            matrix = np.array(self.matrix[: len(self.ids)])
+            meta = {"dim": self.dim, "ids": list(self.ids), "terms": list(self.terms)}
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path, meta_path = self._paths()
+        with open(matrix_path + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(matrix_path + ".tmp", matrix_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        with self._lock:
+            self.saved_version = max(self.saved_version, version)
+        return True
+
+    @classmethod
+    def load(cls, directory: str, dim: int = MATCH_DIM) -> "JobIndex":
+        """Index saved in `directory` (memory-mapped), or an empty one when there is none."""
+        index = cls(dim, directory)
+        matrix_path, meta_path = index._paths()
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return index
+        ids, terms = meta.get("ids") or [], meta.get("terms") or []
+        if len(ids) != len(terms):
+            return index
+        index.ids, index.terms = ids, terms
+        index.rows = {job_id: row for row, job_id in enumerate(ids)}
+        matrix = None
+        if meta.get("dim") == dim:
+            try:
+                # copy-on-write: trang được đọc khi cần, sửa tại chỗ không ghi ngược vào file
+                matrix = np.load(matrix_path, mmap_mode="c")
+            except (OSError, ValueError):
+                matrix = None
+        if matrix is None or matrix.shape != (len(ids), dim):
+            # đổi MATCH_DIM hoặc file .npy hỏng: băm lại từ term đã lưu
+            matrix = vectorize_many(terms, dim)
+            index.version = 1
+        index.matrix = matrix
+        return index
@@ -0,0 +1,194 @@
+# metrics.py
+# Đo thời gian từng bước của pipeline (upload, chờ pool, PDF, OCR, LLM, normalize) và xuất
+# GET /metrics theo định dạng text của Prometheus. Chỉ cần histogram / counter / gauge nên tự viết,
+# không phụ thuộc prometheus_client. Worker đo trong process của nó và trả dict timings
+# {stage: seconds} về process API cùng kết quả (xem parser.parse_source).
+import threading
+import time
+from contextlib import contextmanager
+
+# giây: từ normalize (vài chục µs) tới Gemini + retry (hàng chục giây)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    """Add the wall time of the block to timings[stage] (seconds)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - t0
+
+
+def merge_timings(timings: dict, more: dict) -> dict:
+    for stage, seconds in (more or {}).items():
+        timings[stage] = timings.get(stage, 0.0) + seconds
+    return timings
+
+
+def pool_timings(wall: float, worker: dict) -> dict:
+    """
+    Worker-reported stage times plus "pool_wait": the part of the parent's wall time the
+    work itself does not explain (queueing for a free worker, pickling, IPC). For tasks run
+    in parallel, pass the critical path (the slowest task) as the worker time.
+    """
+    out = dict(worker or {})
+    out["pool_wait"] = out.get("pool_wait", 0.0) + max(0.0, wall - sum(out.values()))
+    return out
+
+
+def server_timing(timings: dict) -> str:
+    """Server-Timing header value, durations in ms."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for values, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = 'le="%s"' % _num(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Counter; with `fn` the values are read at scrape time ({labelvalues_tuple: value})."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), fn=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        if self.fn is not None:
+            try:
+                items = sorted(self.fn().items())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        lines.extend(f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items)
+        return lines
+
+
+class Gauge:
+    """
+    Settable gauge, or a callback gauge when `fn` is given (read at scrape time).
+    With labelnames, fn returns {labelvalues_tuple: value}.
+    """
+
+    def __init__(self, name: str, help: str, fn=None, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def get(self) -> float:
+        if self.fn is None:
+            return self.value
+        try:
+            return float(self.fn())
+        except Exception:
+            return 0.0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if not self.labelnames:
+            return lines + [f"{self.name} {self.get()}"]
+        try:
+            items = sorted(self.fn().items())
+        except Exception:
+            items = []
+        lines.extend(f"{self.name}{_labels(self.labelnames, k)} {float(v)}" for k, v in items)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for m in self.metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "cv_stage_seconds", "Time spent per pipeline stage (upload, pool_wait, pdf, ocr, llm, rules, normalize)",
+    ("stage",),
+))
+WORKER_BUSY_SECONDS = REGISTRY.register(Counter(
+    "cv_pool_busy_seconds_total", "Worker-reported time spent on pool tasks (rate() / workers = utilization)",
+))
+INFLIGHT_JOBS = REGISTRY.register(Gauge("cv_inflight_jobs", "Documents currently being parsed"))
+
+# các stage chạy trong worker của pool (tính vào thời gian bận của pool)
+WORKER_STAGES = ("pdf", "ocr")
+
+
+def observe_timings(timings: dict):
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage)
+        if stage in WORKER_STAGES:
+            WORKER_BUSY_SECONDS.inc(seconds)
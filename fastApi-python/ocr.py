@@ -0,0 +1,131 @@
+# ocr.py
+# OCR backend cho extract_text_from_img và trang PDF scan.
+# pytesseract gọi process `tesseract` mới + nạp lại traineddata + ghi file tạm cho MỖI ảnh;
+# engine "tesserocr" giữ PyTessBaseAPI (C API) sống trong từng worker, cache theo ngôn ngữ.
+import os
+import threading
+
+from lazy import lazy_import
+
+# import trễ (xem lazy.py): pytesseract kéo theo numpy/pandas nếu có, tesserocr nạp libtesseract
+pytesseract = lazy_import("pytesseract")
+tesserocr = lazy_import("tesserocr")
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+try:
+    import config
+except Exception:
+    config = None
+
+
+def _config_value(name: str, default):
+    if config is not None:
+        return getattr(config, name, default)
+    return os.environ.get(name, default)
+
+
+OCR_ENGINE = _config_value("OCR_ENGINE", "auto")
+OCR_LANG = _config_value("OCR_LANG", "eng")
+# ảnh chụp điện thoại 12MP+ được thu nhỏ về cạnh dài này trước khi nhận dạng
+OCR_MAX_SIDE = int(_config_value("OCR_MAX_SIDE", 2400))
+TESSDATA_PREFIX = _config_value("TESSDATA_PREFIX", "") or None
+
+
+def prepare_image(img, max_side: int = None):
+    """Apply EXIF rotation, convert to grayscale and downscale oversized photos."""
+    max_side = OCR_MAX_SIDE if max_side is None else max_side
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "L":
+        img = img.convert("L")
+    if max_side and max(img.size) > max_side:
+        # draft/reduce trước rồi resize: nhanh hơn nhiều so với resize thẳng từ ảnh gốc
+        img.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=2.0)
+    return img
+
+
+class PytesseractEngine:
+    """One `tesseract` subprocess per call (the original behaviour)."""
+
+    name = "pytesseract"
+
+    def __init__(self, lang: str = None):
+        self.lang = lang or OCR_LANG
+
+    def recognize(self, img) -> str:
+        return pytesseract.image_to_string(img, lang=self.lang)
+
+    def warm(self):
+        pytesseract.get_tesseract_version()
+
+
+class TesserocrEngine:
+    """
+    Warm tesseract C API instances, one per (thread, lang): the language model
+    (e.g. vie+eng traineddata) is loaded once per worker and reused for every image.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, lang: str = None, path: str = None):
+        self.lang = lang or OCR_LANG
+        self.path = path or TESSDATA_PREFIX
+        self._local = threading.local()
+
+    def _api(self):
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        api = apis.get(self.lang)
+        if api is None:
+            kwargs = {"lang": self.lang}
+            if self.path:
+                kwargs["path"] = self.path
+            api = apis[self.lang] = tesserocr.PyTessBaseAPI(**kwargs)
+        return api
+
+    def recognize(self, img) -> str:
+        api = self._api()
+        try:
+            api.SetImage(img)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def warm(self):
+        self._api()
+
+    def close(self):
+        for api in (getattr(self._local, "apis", None) or {}).values():
+            api.End()
+        self._local.apis = {}
+
+
+ENGINES = {"pytesseract": PytesseractEngine, "tesserocr": TesserocrEngine}
+_engine = None
+
+
+def engine_available() -> bool:
+    return Image is not None and (pytesseract is not None or tesserocr is not None)
+
+
+def get_engine():
+    """Process-wide engine chosen by OCR_ENGINE ("auto" prefers tesserocr when installed)."""
+    global _engine
+    if _engine is not None:
+        return _engine
+    name = OCR_ENGINE
+    if name == "auto":
+        name = "tesserocr" if tesserocr is not None else "pytesseract"
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR_ENGINE: {name}")
+    if (name == "tesserocr" and tesserocr is None) or (name == "pytesseract" and pytesseract is None):
+        raise RuntimeError(f"OCR engine '{name}' not installed. pip install {name}")
+    _engine = ENGINES[name]()
+    return _engine
+
+
+def recognize(img, prepare: bool = True) -> str:
+    if prepare:
+        img = prepare_image(img)
+    return get_engine().recognize(img)
@@ -1,83 +1,215 @@
 # resume_to_cv.py
+import asyncio
+import io
 import os
 import json
+import logging
 import re
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
 
-# optional imports for PDF/ocr/llm; import errors will be raised later when used
-try:
-    import fitz  # pymupdf
-except Exception:
-    fitz = None
+from deadline import DeadlineExceeded, check_deadline
+from handoff import open_shared
+from jsonstream import ObjectStreamParser
+from lazy import lazy_import, load
+from metrics import timed
+import llm
+import ocr
+import rules
+from skills import fill_skills
 
-try:
-    import pytesseract
-except Exception:
-    pytesseract = None
+logger = logging.getLogger(__name__)
+
+# optional imports for PDF/ocr/llm; import errors will be raised later when used.
+# Lazy: nạp ở lần dùng đầu tiên / warm_up(), process API không tốn thời gian import lúc khởi động
+fitz = lazy_import("fitz")  # pymupdf
+Image = lazy_import("PIL.Image")
 
 try:
-    from PIL import Image
+    import config
 except Exception:
-    Image = None
+    config = None
 
-# gemini client will be imported/configured lazily
-_gemini_client = None
-_gemini_configured = False
 
-# load GEMINI_API_KEY safely (config.py or env)
-GEMINI_API_KEY = ""
-try:
-    import config
+def _config_value(name: str, default):
+    if config is not None:
+        return getattr(config, name, default)
+    return os.environ.get(name, default)
 
-    GEMINI_API_KEY = getattr(config, "GEMINI_API_KEY", "") or ""
-except Exception:
-    GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+
+# PDF extraction budgets: a huge portfolio PDF must not tie up a worker for minutes
+PDF_MAX_PAGES = int(_config_value("PDF_MAX_PAGES", 50))
+PDF_MAX_CHARS = int(_config_value("PDF_MAX_CHARS", 200000))
+PDF_MAX_SECONDS = float(_config_value("PDF_MAX_SECONDS", 30))
+
+# OCR for scanned PDF pages / images (engine + language: see ocr.py)
+OCR_DPI = int(_config_value("OCR_DPI", 200))
+# trang có ít hơn số ký tự này ở text layer mà chứa ảnh được coi là trang scan
+OCR_MIN_CHARS = int(_config_value("OCR_MIN_CHARS", 20))
+
+# "fast": rules.py only, "hybrid": rules + LLM for the remaining fields, "full": LLM for everything
+MODES = ("fast", "hybrid", "full")
+# fields the rule extractor owns in hybrid mode (contact block + summary); the LLM is not asked for them
+HYBRID_RULE_FIELDS = ("fullname", "headline", "email", "phone", "location", "targetRole", "portfolio", "summary")
 
 # allow mocking Gemini for tests: export MOCK_GEMINI=1
+# (or point GEMINI_BASE_URL at llm_stub.py to exercise the real HTTP client)
 MOCK_GEMINI = os.environ.get("MOCK_GEMINI", "") == "1"
+# độ trễ giả cho mock (ms), để benchmark end-to-end gần với thời gian gọi Gemini thật
+MOCK_GEMINI_LATENCY_MS = float(os.environ.get("MOCK_GEMINI_LATENCY_MS", "0"))
+
+
+# ---------- STEP 1: Extract text ----------
+def _open_pdf(path: str = None, stream=None):
+    if fitz is None:
+        raise RuntimeError("pymupdf (fitz) not installed. pip install pymupdf")
+    return fitz.open(path) if stream is None else fitz.open(stream=stream, filetype="pdf")
+
+
+def pdf_page_count(path: str = None, stream=None) -> int:
+    doc = _open_pdf(path, stream)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def join_page_texts(parts: list, max_chars: int) -> tuple:
+    """Join page texts in one pass (not text += ..., quadratic); returns (text, cut_by_budget)."""
+    text = "\n".join(parts) + "\n" if parts else ""
+    if max_chars and len(text) > max_chars:
+        return text[:max_chars], True
+    return text, False
+
+
+def ocr_available() -> bool:
+    return ocr.engine_available()
+
+
+def _needs_ocr(page, page_text: str) -> bool:
+    return len(page_text.strip()) < OCR_MIN_CHARS and bool(page.get_images(full=False))
 
 
-def ensure_gemini_configured():
+def _ocr_page(page, dpi: int = None) -> str:
+    # render grayscale pixmap: đủ cho tesseract, nhẹ hơn RGB 3 lần
+    pix = page.get_pixmap(dpi=dpi or OCR_DPI, colorspace=fitz.csGRAY)
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    try:
+        # đã là ảnh xám đúng DPI, không cần prepare lại
+        return ocr.recognize(img, prepare=False)
+    finally:
+        img.close()
+
+
+def ocr_pdf_page(index: int, path: str = None, stream=None, dpi: int = None) -> dict:
+    """OCR one page; errors are reported in the result instead of failing the document."""
+    doc = _open_pdf(path, stream)
+    t0 = time.perf_counter()
+    try:
+        text = _ocr_page(doc.load_page(index), dpi)
+        error = ""
+    except Exception as e:
+        text, error = "", str(e)
+    finally:
+        doc.close()
+    return {"index": index, "text": text, "ms": round((time.perf_counter() - t0) * 1000, 2), "error": error}
+
+
+def extract_pdf(path: str = None, stream=None, start: int = 0, stop: int = None,
+                max_pages: int = None, max_chars: int = None, max_seconds: float = None,
+                ocr: str = "inline", keep_texts: bool = False, deadline: float = None) -> dict:
     """
-    Lazy import and configure the google.generativeai client.
-    Returns the gemini module if configured, else None.
+    Extract the text layer of pages [start, stop) within the page/char/time budgets.
+    Returns {"text", "page_count", "pages": [{"page", "ms", "chars"}], "truncated"}.
+    Scanned pages (no usable text layer) are OCR'd when ocr="inline"; with ocr="defer"
+    they are listed in "ocr_pages" and the per-page "texts" are returned so the caller
+    can OCR them elsewhere (see extraction.ocr_pages_parallel). ocr="off" skips them.
+    `deadline` (time.monotonic(), see deadline.py) is checked before every page: DeadlineExceeded.
     """
-    global _gemini_client, _gemini_configured, GEMINI_API_KEY
-    if _gemini_configured and _gemini_client is not None:
-        return _gemini_client
-    if MOCK_GEMINI:
-        _gemini_configured = True
-        _gemini_client = None
-        return None
-    if not GEMINI_API_KEY:
-        # not configured
-        return None
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    max_chars = PDF_MAX_CHARS if max_chars is None else max_chars
+    max_seconds = PDF_MAX_SECONDS if max_seconds is None else max_seconds
+    if not ocr_available():
+        ocr = "off"
+
+    doc = _open_pdf(path, stream)
+    parts = []
+    pages = []
+    ocr_pages = []
+    total = 0
+    truncated = False
     try:
-        import google.generativeai as gemini
-    except Exception:
-        return None
-    gemini.configure(api_key=GEMINI_API_KEY)
-    _gemini_client = gemini
-    _gemini_configured = True
-    return _gemini_client
+        page_count = doc.page_count
+        limit = min(page_count, max_pages) if max_pages else page_count
+        stop = limit if stop is None else min(stop, limit)
+        truncated = limit < page_count and stop == limit
+        began = time.perf_counter()
+        for i in range(start, stop):
+            check_deadline(deadline, "pdf")
+            t0 = time.perf_counter()
+            page = doc.load_page(i)
+            page_text = page.get_text("text")
+            info = {"page": i + 1}
+            if ocr != "off" and _needs_ocr(page, page_text):
+                if ocr == "inline":
+                    try:
+                        page_text = _ocr_page(page)
+                    except Exception as e:
+                        info["ocr_error"] = str(e)
+                    info["ocr"] = True
+                else:
+                    ocr_pages.append(i)
+            parts.append(page_text)
+            total += len(page_text) + 1
+            info["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            info["chars"] = len(page_text)
+            pages.append(info)
+            if (max_chars and total >= max_chars) or (max_seconds and time.perf_counter() - began > max_seconds):
+                truncated = truncated or i + 1 < stop
+                break
+    finally:
+        # stream có thể là view của shared memory: phải đóng doc trước khi trả view
+        doc.close()
 
+    text, cut = join_page_texts(parts, max_chars)
+    report = {"text": text, "page_count": page_count, "pages": pages, "truncated": truncated or cut}
+    if ocr_pages:
+        report["ocr_pages"] = ocr_pages
+    if ocr_pages or keep_texts:
+        report["texts"] = parts
+    return report
 
-# ---------- STEP 1: Extract text ----------
-def extract_text_from_pdf(path: str) -> str:
-    if fitz is None:
-        raise RuntimeError("pymupdf (fitz) not installed. pip install pymupdf")
-    doc = fitz.open(path)
-    text = ""
-    for page in doc:
-        text += page.get_text("text") + "\n"
-    return text
 
+def extract_text_from_pdf(path: str = None, stream=None) -> str:
+    """Extract the text layer from a PDF given by path or by in-memory bytes (`stream`)."""
+    return extract_pdf(path, stream)["text"]
 
-def extract_text_from_img(path: str) -> str:
-    if Image is None or pytesseract is None:
-        raise RuntimeError("Pillow and pytesseract required for image OCR. pip install pillow pytesseract")
-    img = Image.open(path)
-    return pytesseract.image_to_string(img)
+
+def extract_text_from_img(path: str = None, stream=None) -> str:
+    if not ocr.engine_available():
+        raise RuntimeError("Pillow and pytesseract (or tesserocr) required for image OCR. pip install pillow pytesseract")
+    img = Image.open(path if stream is None else io.BytesIO(stream))
+    try:
+        # xoay theo EXIF, chuyển xám, thu nhỏ ảnh chụp điện thoại quá lớn rồi mới nhận dạng
+        return ocr.recognize(img)
+    finally:
+        img.close()
+
+
+def extract_text(ext: str, path: str = None, stream=None) -> str:
+    return extract_document(ext, path, stream)["text"]
+
+
+def extract_document(ext: str, path: str = None, stream=None, ocr: str = "inline", deadline: float = None) -> dict:
+    """Like extract_text, but returns the extraction report (page timings, truncation) for PDFs."""
+    if ext == ".pdf":
+        return extract_pdf(path, stream=stream, ocr=ocr, deadline=deadline)
+    elif ext in [".png", ".jpg", ".jpeg"]:
+        check_deadline(deadline, "ocr")
+        return {"text": extract_text_from_img(path, stream=stream)}
+    raise ValueError(f"Unsupported file format: {ext}")
 
 
 # ---------- STEP 2: LLM prompt (STRICT mapping to Cv schema) ----------
@@ -172,82 +304,364 @@ Resume text:
 '''
 
 
-def extract_with_gemini(text: str) -> dict:
+MOCK_CV = {
+  "avatarUrl": "", "fullname": "Mock User", "preferredName": "",
+  "email": "", "phone": "", "location": {"city": "", "state": "", "country": ""}, "headline": "",
+  "summary": "Mocked resume", "targetRole": "", "employmentType": [], "salaryExpectation": "",
+  "availability": "", "skills": [], "experiences": [], "education": [], "projects": [],
+  "certifications": [], "languages": [], "portfolio": [], "references": [],
+  "status": "draft", "tags": [], "version": 0
+}
+
+
+def build_prompt(text: str) -> str:
+    # inject resume text safely (.replace instead of .format: the template is full of braces)
+    return CV_STRICT_PROMPT_TEMPLATE.replace("{resume_text}", text)
+
+
+def build_hybrid_prompt(text: str, known: dict) -> str:
+    """
+    Smaller prompt for hybrid mode: only the schema keys the rules did not fill, and only the
+    resume sections they are drawn from (the contact block and summary are dropped).
+    """
+    schema = {k: v for k, v in DEFAULT_SCHEMA.items() if k not in known}
+    # phần đầu CV chỉ bỏ đi khi rule đã lấy đủ thông tin liên hệ
+    header_fields = ("fullname", "headline", "email", "phone", "location")
+    dropped = {"header", "info"} if all(k in known for k in header_fields) else set()
+    if "summary" in known:
+        dropped.add("summary")
+    sections = [
+        "\n".join(([heading] if heading else []) + lines)
+        for key, heading, lines in rules.split_sections(text) if key not in dropped
+    ]
+    return build_partial_prompt(schema, "\n".join(sections))
+
+
+def build_partial_prompt(schema: dict, resume_text: str) -> str:
+    """The strict prompt restricted to `schema` (a subset of DEFAULT_SCHEMA) over `resume_text`."""
+    template = CV_STRICT_PROMPT_TEMPLATE
+    intro = template[:template.index("Cv schema (output EXACTLY")]
+    clarifications = template[template.index("Extraction rules and clarifications:"):template.index("Now parse")]
+    return (
+        intro
+        + "Cv schema (output EXACTLY these keys; the other Cv fields were already extracted):\n\n"
+        + json.dumps(schema, indent=2, ensure_ascii=False)
+        + "\n\n" + clarifications
+        + "Now parse the following resume text. Remember: ONLY extract values that appear explicitly in this text. "
+        + "Do not infer anything.\n\nResume text:\n"
+        + resume_text + "\n"
+    )
+
+
+def rule_fields(text: str) -> dict:
+    """Fields the rule extractor owns in hybrid mode."""
+    found = rules.extract_rules(text)
+    return {k: found[k] for k in HYBRID_RULE_FIELDS if k in found}
+
+
+class LLMOutputError(llm.LLMError):
+    """The model's reply is not the JSON object the prompt asked for."""
+
+
+def parse_llm_output(raw_output: str) -> dict:
+    """Strip markdown fences from the model output and parse it as a JSON object (LLMOutputError otherwise)."""
+    raw_output = (raw_output or "").strip()
+    if raw_output.startswith("```"):
+        raw_output = raw_output.strip("`")
+        raw_output = raw_output.replace("json", "", 1).strip()
+
+    try:
+        data = json.loads(raw_output)
+    except ValueError as e:
+        logger.warning("LLM output is not valid JSON (%s); first 1000 chars: %s", e, raw_output[:1000])
+        # không trả {}: CV rỗng sẽ bị normalize rồi lưu vào cache theo hash file, mọi lần upload lại đều nhận nó
+        raise LLMOutputError(f"LLM output is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        logger.warning("LLM output is JSON %s, not an object; first 1000 chars: %s",
+                       type(data).__name__, raw_output[:1000])
+        raise LLMOutputError(f"LLM output is a JSON {type(data).__name__}, not an object")
+    return data
+
+
+def _stream_remainder(stream: ObjectStreamParser, raw_output: str) -> list:
+    """
+    Members the incremental parser could not emit (truncated / odd output), from a full re-parse.
+    A malformed member means the whole reply is bad: the re-parse raises LLMOutputError.
+    """
+    if stream.done and not stream.errors:
+        return []
+    if stream.errors:
+        logger.warning("LLM stream has malformed members: %s", "; ".join(stream.errors))
+    data = parse_llm_output(raw_output)
+    return [(k, v) for k, v in data.items() if k not in stream.value]
+
+
+def extract_with_gemini(text: str, deadline: float = None, prompt: str = None, on_field=None) -> dict:
     """
     Call Gemini (or mock) and return parsed JSON (as dict).
-    Uses .replace(...) for injecting resume_text to avoid .format KeyError.
+    Blocking: for worker processes / Celery; the API process uses extract_with_gemini_async.
+    With on_field, the response is streamed and on_field(key, value) is called for each
+    top-level field as soon as its JSON is complete.
     """
     # Mock path (for dev without API key)
     if MOCK_GEMINI:
-        # return minimal valid schema for testing
-        return {
-          "avatarUrl": "", "fullname": "Mock User", "preferredName": "",
-          "email": "", "phone": "", "location": {"city": "", "state": "", "country": ""}, "headline": "",
-          "summary": "Mocked resume", "targetRole": "", "employmentType": [], "salaryExpectation": "",
-          "availability": "", "skills": [], "experiences": [], "education": [], "projects": [],
-          "certifications": [], "languages": [], "portfolio": [], "references": [],
-          "status": "draft", "tags": [], "version": 0
-        }
+        if MOCK_GEMINI_LATENCY_MS > 0:
+            time.sleep(MOCK_GEMINI_LATENCY_MS / 1000)
+        data = json.loads(json.dumps(MOCK_CV))
+        if on_field is not None:
+            for k, v in data.items():
+                on_field(k, v)
+        return data
+    prompt = prompt or build_prompt(text)
+    if on_field is None:
+        return parse_llm_output(llm.generate_sync(prompt, deadline))
+
+    stream = ObjectStreamParser()
+
+    def on_chunk(chunk: str):
+        for k, v in stream.feed(chunk):
+            on_field(k, v)
+
+    raw_output = llm.stream_sync(prompt, on_chunk, deadline)
+    data = dict(stream.value)
+    for k, v in _stream_remainder(stream, raw_output):
+        data[k] = v
+        on_field(k, v)
+    return data
 
-    # ensure gemini configured
-    gemini_client = ensure_gemini_configured()
-    if gemini_client is None:
-        raise RuntimeError(
-            "Google Gemini client not configured. Set GEMINI_API_KEY in config.py or environment variable "
-            "and install google-generativeai package."
-        )
 
-    # inject resume text safely
-    prompt = CV_STRICT_PROMPT_TEMPLATE.replace("{resume_text}", text)
+async def mock_latency(deadline: float = None):
+    # giống client thật: chờ tối đa tới deadline rồi dừng
+    if MOCK_GEMINI_LATENCY_MS > 0:
+        wait = MOCK_GEMINI_LATENCY_MS / 1000
+        if deadline is not None:
+            wait = min(wait, max(0.0, deadline - time.monotonic()))
+        await asyncio.sleep(wait)
+    check_deadline(deadline, "llm")
 
-    # Use the same client API style you preferred
-    model = gemini_client.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
 
-    raw_output = ""
+async def extract_with_gemini_async(text: str, deadline: float = None, prompt: str = None) -> dict:
+    """Async variant on the shared, rate-limited client (see llm.py)."""
+    if MOCK_GEMINI:
+        await mock_latency(deadline)
+        return json.loads(json.dumps(MOCK_CV))
     try:
-        raw_output = response.candidates[0].content.parts[0].text
-    except Exception:
-        raw_output = response.text if hasattr(response, "text") else ""
+        return parse_llm_output(await llm.get_client().generate(prompt or build_prompt(text), deadline))
+    except llm.LLMTimeout as e:
+        # deadline của request thay LLM_DEADLINE_SECONDS: hết giờ ở đây là hết giờ của request
+        if deadline is not None:
+            raise DeadlineExceeded("llm") from e
+        raise
 
-    raw_output = raw_output.strip()
-    if raw_output.startswith("```"):
-        raw_output = raw_output.strip("`")
-        raw_output = raw_output.replace("json", "", 1).strip()
 
+async def stream_with_gemini_async(text: str, deadline: float = None, prompt: str = None):
+    """Async generator of (key, raw_value) per top-level field, as the streamed JSON closes each one."""
+    if MOCK_GEMINI:
+        await mock_latency(deadline)
+        for item in json.loads(json.dumps(MOCK_CV)).items():
+            yield item
+        return
+    stream = ObjectStreamParser()
+    chunks = []
     try:
-        return json.loads(raw_output)
-    except Exception as e:
-        print("JSON parse error:", e)
-        print("Raw output (first 1000 chars):")
-        print(raw_output[:1000])
-        return {}
+        async for chunk in llm.get_client().stream(prompt or build_prompt(text), deadline):
+            chunks.append(chunk)
+            for item in stream.feed(chunk):
+                yield item
+    except llm.LLMTimeout as e:
+        if deadline is not None:
+            raise DeadlineExceeded("llm") from e
+        raise
+    for item in _stream_remainder(stream, "".join(chunks)):
+        yield item
+
+
+def extract_fields(text: str, mode: str = "full", deadline: float = None) -> dict:
+    """Raw (not yet normalized) Cv fields for `text` in the given mode (see MODES)."""
+    if mode == "fast":
+        return rules.extract_rules(text)
+    if mode == "hybrid":
+        known = rule_fields(text)
+        data = {}
+        if not MOCK_GEMINI:
+            data = extract_with_gemini(text, deadline, prompt=build_hybrid_prompt(text, known))
+        return dict(data, **known)
+    return extract_with_gemini(text, deadline)
+
+
+async def extract_fields_async(text: str, mode: str = "full", deadline: float = None) -> dict:
+    if mode == "fast":
+        return rules.extract_rules(text)
+    if mode == "hybrid":
+        known = rule_fields(text)
+        data = {}
+        if not MOCK_GEMINI:
+            data = await extract_with_gemini_async(text, deadline, prompt=build_hybrid_prompt(text, known))
+        return dict(data, **known)
+    return await extract_with_gemini_async(text, deadline)
+
+
+async def stream_fields_async(text: str, mode: str = "full", deadline: float = None):
+    """
+    Async generator of (key, normalized_value) for Cv fields as soon as each is known:
+    rule fields first (fast / hybrid), then LLM sections as they finish streaming.
+    """
+    if mode == "fast":
+        for k, v in rules.extract_rules(text).items():
+            yield k, normalize_field(k, v)
+        return
+    known = {}
+    prompt = None
+    if mode == "hybrid":
+        known = rule_fields(text)
+        for k, v in known.items():
+            yield k, normalize_field(k, v)
+        if MOCK_GEMINI:
+            return
+        prompt = build_hybrid_prompt(text, known)
+    async for k, v in stream_with_gemini_async(text, deadline, prompt):
+        if k in FIELD_NORMALIZERS and k not in known:
+            yield k, normalize_field(k, v)
+
+
+# ---------- incremental re-parse (/upload?previous=cv_id) ----------
+# mục CV -> các trường Cv lấy từ mục đó. Mục không có trong bảng (giải thưởng, hoạt động, sở thích)
+# có thể rơi vào bất kỳ trường nào nên thay đổi ở đó thì parse lại toàn bộ.
+CONTACT_FIELDS = ("avatarUrl", "fullname", "preferredName", "email", "phone", "location", "headline",
+                  "targetRole", "employmentType", "salaryExpectation", "availability", "portfolio")
+SECTION_FIELDS = {
+    "header": CONTACT_FIELDS,
+    "info": CONTACT_FIELDS,
+    "summary": ("summary",),
+    "experiences": ("experiences",),
+    "education": ("education",),
+    "projects": ("projects",),
+    "certifications": ("certifications",),
+    "skills": ("skills",),
+    "languages": ("languages",),
+    "references": ("references",),
+}
+# phần văn bản phải gửi lại vượt tỉ lệ này thì parse toàn bộ (prompt gần như đầy đủ, kết quả nhất quán hơn)
+INCREMENTAL_MAX_RATIO = float(_config_value("INCREMENTAL_MAX_RATIO", 0.6))
+
+
+def section_texts(text: str) -> dict:
+    """{section key: text} (heading included); repeated headings of the same key are joined in order."""
+    out = {}
+    for key, heading, lines in rules.split_sections(text):
+        block = "\n".join(([heading] if heading else []) + lines)
+        if block:
+            out[key] = f"{out[key]}\n{block}" if key in out else block
+    return out
+
+
+def plan_incremental(old: dict, new: dict, mode: str = "full") -> dict:
+    """
+    Which Cv fields to re-extract after an edit: {"changed": [section keys], "fields": [...],
+    "sections": [keys sent to the LLM]}; "fields" is None when a full parse is needed.
+    """
+    changed = sorted(k for k in set(old) | set(new) if old.get(k) != new.get(k))
+    plan = {"changed": changed, "fields": [], "sections": []}
+    if not changed:
+        return plan
+    if mode == "fast" or any(k not in SECTION_FIELDS for k in changed):
+        plan["fields"] = None
+        return plan
+    fields = {f for k in changed for f in SECTION_FIELDS[k]}
+    # gửi mọi mục (cả mục không đổi) chứa các trường đó, vd. sửa "header" thì gửi kèm "info"
+    sent = [k for k in new if fields.intersection(SECTION_FIELDS.get(k, ()))]
+    total = sum(len(v) for v in new.values())
+    if total and sum(len(new[k]) for k in sent) > INCREMENTAL_MAX_RATIO * total:
+        plan["fields"] = None
+        return plan
+    plan["fields"] = [f for f in DEFAULT_SCHEMA if f in fields]
+    plan["sections"] = sent
+    return plan
+
+
+def plan_previous(previous: dict, sections: dict, mode: str = "full") -> dict:
+    """plan_incremental against a jobs.read_previous() record; a full parse when its section texts are gone."""
+    if previous["sections"] is None:
+        # văn bản lần trước không còn (đã dọn / RESULT_STORE=files): parse toàn bộ
+        return {"changed": sorted(sections), "fields": None, "sections": []}
+    return plan_incremental(previous["sections"], sections, mode)
+
+
+def _incremental_request(text: str, sections: dict, plan: dict, mode: str) -> tuple:
+    """(rule fields, fields asked from the LLM, partial prompt or None when the LLM is not needed)."""
+    known = rule_fields(text) if mode == "hybrid" else {}
+    wanted = [f for f in plan["fields"] if f not in known]
+    if not (wanted and plan["sections"]):
+        return known, wanted, None
+    schema = {f: DEFAULT_SCHEMA[f] for f in wanted}
+    resume_text = "\n".join(sections[k] for k in plan["sections"])
+    return known, wanted, build_partial_prompt(schema, resume_text)
+
+
+def _incremental_fields(plan: dict, known: dict, wanted: list, data: dict) -> dict:
+    out = {f: data.get(f) for f in wanted}
+    out.update((f, known[f]) for f in plan["fields"] if f in known)
+    return out
+
+
+async def extract_incremental_async(text: str, sections: dict, plan: dict, mode: str = "full",
+                                    deadline: float = None) -> dict:
+    """Raw values for plan["fields"] only; fields whose sections were removed come back as None."""
+    known, wanted, prompt = _incremental_request(text, sections, plan, mode)
+    data = await extract_with_gemini_async(text, deadline, prompt=prompt) if prompt else {}
+    return _incremental_fields(plan, known, wanted, data)
+
+
+def extract_incremental(text: str, sections: dict, plan: dict, mode: str = "full", deadline: float = None) -> dict:
+    """Blocking extract_incremental_async, for worker processes / Celery."""
+    known, wanted, prompt = _incremental_request(text, sections, plan, mode)
+    data = extract_with_gemini(text, deadline, prompt=prompt) if prompt else {}
+    return _incremental_fields(plan, known, wanted, data)
+
+
+def merge_incremental(previous: dict, partial: dict, text: str = None) -> dict:
+    """Previous normalized Cv with the re-extracted fields replaced (normalized here)."""
+    merged = dict(validate_and_normalize(previous))
+    for key, value in partial.items():
+        merged[key] = normalize_field(key, value)
+    if text:
+        fill_skills(merged, text)
+    return merged
+
+
+def bump_version(result: dict, previous: dict, plan: dict) -> dict:
+    """Carry "version" over from the previous result, +1 when any section changed."""
+    version = normalize_field("version", previous.get("version"))
+    result["version"] = version + 1 if plan["changed"] else version
+    return result
 
 
 # ---------- Helpers: cleaning, date parsing, dedupe ----------
+_PRESENT_WORDS = {"present", "now", "current", "hiện tại"}
+_YEAR_MONTH_RE = re.compile(r"(\d{4})(-(\d{2}))?")
+
+
 def parse_to_iso(d: str) -> str:
     if not d:
         return ""
-    ds = str(d).strip()
+    return _parse_date(str(d).strip())
+
+
+@lru_cache(maxsize=8192)
+def _parse_date(ds: str) -> str:
+    # memoized: a corpus repeats the same handful of dates ("2021", "Present", ...)
     if not ds:
         return ""
-    low = ds.lower()
-    if low in ["present", "now", "current", "hiện tại"]:
+    if ds.lower() in _PRESENT_WORDS:
         return "Present"
     # Try common formats
     for fmt in ("%Y-%m-%d", "%Y-%m", "%Y"):
         try:
-            dt = datetime.strptime(ds, fmt)
-            if fmt == "%Y":
-                return dt.strftime("%Y")
-            elif fmt == "%Y-%m":
-                return dt.strftime("%Y-%m")
-            else:
-                return dt.strftime("%Y-%m-%d")
+            return datetime.strptime(ds, fmt).strftime(fmt)
         except Exception:
             continue
     # last attempt: try to extract YYYY or YYYY-MM
-    m = re.search(r"(\d{4})(-(\d{2}))?", ds)
+    m = _YEAR_MONTH_RE.search(ds)
     if m:
         if m.group(3):
             return f"{m.group(1)}-{m.group(3)}"
@@ -259,7 +673,7 @@ def unique_list(seq):
     seen = set()
     out = []
     for s in seq:
-        key = str(s).strip()
+        key = s.strip() if type(s) is str else str(s).strip()
         if key and key not in seen:
             seen.add(key)
             out.append(key)
@@ -310,234 +724,314 @@ DEFAULT_SCHEMA = {
 }
 
 
-def validate_and_normalize(data: dict) -> dict:
-    if not isinstance(data, dict):
-        return DEFAULT_SCHEMA.copy()
+# How each schema field is coerced is derived from its default value in DEFAULT_SCHEMA
+# ("" -> string, 0 -> number, False -> bool, [] -> string list, [{...}] -> list of objects);
+# these tables cover what the default alone cannot say.
+DATE_FIELDS = {"from", "to", "issueDate", "expiryDate"}
+# string given instead of an array: split on this separator (default ",")
+LIST_SEPARATORS = {"responsibilities": "\n", "achievements": "\n"}
+# items whose `name` is empty are dropped
+REQUIRED_NAME_LISTS = {"skills", "languages"}
+# (list field, item key) -> fallback item key the LLM sometimes uses instead
+FIELD_ALIASES = {("certifications", "issueDate"): "year"}
+_LANGUAGE_SPLIT_RE = re.compile(r"[-–—]|,")
 
-    clean = {}
-
-    # top-level simple fields
-    for k in [
-        "avatarUrl", "fullname", "preferredName", "email", "phone",
-        "headline", "summary", "targetRole", "salaryExpectation", "availability", "status"
-    ]:
-        clean[k] = str(data.get(k, "") or "")
-
-    # location
-    loc = data.get("location", {}) or {}
-    clean["location"] = {
-        "city": str(loc.get("city", "") or ""),
-        "state": str(loc.get("state", "") or ""),
-        "country": str(loc.get("country", "") or "")
-    }
 
-    # employmentType - array of strings
-    et = data.get("employmentType", []) or []
-    if isinstance(et, str):
-        et = [s.strip() for s in et.split(",") if s.strip()]
-    clean["employmentType"] = unique_list(et)
-
-    # tags
-    tags = data.get("tags", []) or []
-    if isinstance(tags, str):
-        tags = [s.strip() for s in tags.split(",") if s.strip()]
-    clean["tags"] = unique_list(tags)
-
-    # skills
-    skills_in = data.get("skills", []) or []
-    skills_out = []
-    if isinstance(skills_in, dict):
-        skills_in = [skills_in]
-    for s in skills_in:
-        if not isinstance(s, dict):
-            continue
-        name = str(s.get("name", "") or "")
-        level = str(s.get("level", "") or "")
-        category = str(s.get("category", "") or "")
-        years = s.get("years", 0) or 0
-        try:
-            years = int(float(years))
-        except Exception:
-            years = 0
-        if name:
-            skills_out.append({"name": name, "level": level, "category": category, "years": years})
-    clean["skills"] = skills_out if skills_out else []
-
-    # experiences
-    ex_in = data.get("experiences", []) or []
-    ex_out = []
-    if isinstance(ex_in, dict):
-        ex_in = [ex_in]
-    for e in ex_in:
-        if not isinstance(e, dict):
-            continue
-        title = str(e.get("title", "") or "")
-        company = str(e.get("company", "") or "")
-        companyWebsite = str(e.get("companyWebsite", "") or "")
-        location = str(e.get("location", "") or "")
-        from_date = parse_to_iso(str(e.get("from", "") or ""))
-        to_date = parse_to_iso(str(e.get("to", "") or ""))
-        isCurrent = bool(e.get("isCurrent", False))
-        employmentType = str(e.get("employmentType", "") or "")
-        try:
-            teamSize = int(float(e.get("teamSize", 0) or 0))
-        except Exception:
-            teamSize = 0
-        responsibilities = e.get("responsibilities", []) or []
-        achievements = e.get("achievements", []) or []
-        tags_e = e.get("tags", []) or []
-        if isinstance(responsibilities, str):
-            responsibilities = [r.strip() for r in responsibilities.split("\n") if r.strip()]
-        if isinstance(achievements, str):
-            achievements = [r.strip() for r in achievements.split("\n") if r.strip()]
-        ex_out.append({
-            "id": str(e.get("id", "") or ""),
-            "title": title,
-            "company": company,
-            "companyWebsite": companyWebsite,
-            "location": location,
-            "from": from_date,
-            "to": to_date,
-            "isCurrent": isCurrent,
-            "employmentType": employmentType,
-            "teamSize": teamSize,
-            "responsibilities": unique_list(responsibilities),
-            "achievements": unique_list(achievements),
-            "tags": unique_list(tags_e)
-        })
-    clean["experiences"] = ex_out if ex_out else []
-
-    # education
-    edu_in = data.get("education", []) or []
-    edu_out = []
-    if isinstance(edu_in, dict):
-        edu_in = [edu_in]
-    for ed in edu_in:
-        if not isinstance(ed, dict):
-            continue
-        degree = str(ed.get("degree", "") or "")
-        major = str(ed.get("major", "") or "")
-        school = str(ed.get("school", "") or "")
-        from_date = parse_to_iso(str(ed.get("from", "") or ""))
-        to_date = parse_to_iso(str(ed.get("to", "") or ""))
-        gpa = str(ed.get("gpa", "") or "")
-        edu_out.append({"degree": degree, "major": major, "school": school, "from": from_date, "to": to_date, "gpa": gpa})
-    clean["education"] = edu_out if edu_out else []
-
-    # projects
-    proj_in = data.get("projects", []) or []
-    proj_out = []
-    if isinstance(proj_in, dict):
-        proj_in = [proj_in]
-    for p in proj_in:
-        if not isinstance(p, dict):
-            continue
-        name = str(p.get("name", "") or "")
-        desc = str(p.get("description", "") or "")
-        role = str(p.get("role", "") or "")
-        from_date = parse_to_iso(str(p.get("from", "") or ""))
-        to_date = parse_to_iso(str(p.get("to", "") or ""))
-        techStack = p.get("techStack", []) or []
-        if isinstance(techStack, str):
-            techStack = [s.strip() for s in techStack.split(",") if s.strip()]
-        url = str(p.get("url", "") or "")
-        metrics = p.get("metrics", []) or []
-        proj_out.append({"name": name, "description": desc, "role": role, "from": from_date, "to": to_date, "techStack": unique_list(techStack), "url": url, "metrics": unique_list(metrics)})
-    clean["projects"] = proj_out if proj_out else []
-
-    # certifications
-    cert_in = data.get("certifications", []) or []
-    cert_out = []
-    if isinstance(cert_in, dict):
-        cert_in = [cert_in]
-    for c in cert_in:
-        if not isinstance(c, dict):
-            continue
-        name = str(c.get("name", "") or "")
-        issuer = str(c.get("issuer", "") or "")
-        issueDate = parse_to_iso(str(c.get("issueDate", "") or c.get("year", "") or ""))
-        expiryDate = parse_to_iso(str(c.get("expiryDate", "") or ""))
-        credentialUrl = str(c.get("credentialUrl", "") or "")
-        cert_out.append({"name": name, "issuer": issuer, "issueDate": issueDate, "expiryDate": expiryDate, "credentialUrl": credentialUrl})
-    clean["certifications"] = cert_out if cert_out else []
-
-    # languages
-    lang_in = data.get("languages", []) or []
-    lang_out = []
-    if isinstance(lang_in, dict):
-        lang_in = [lang_in]
-    for l in lang_in:
-        if not isinstance(l, dict):
-            parts = [p.strip() for p in re.split(r'[-–—]|,', str(l)) if p.strip()]
-            name = parts[0] if parts else str(l)
-            level = parts[1] if len(parts) > 1 else ""
-        else:
-            name = str(l.get("name", "") or "")
-            level = str(l.get("level", "") or "")
-        if name:
-            lang_out.append({"name": name, "level": level})
-    clean["languages"] = lang_out if lang_out else []
-
-    # portfolio
-    port_in = data.get("portfolio", []) or []
-    port_out = []
-    if isinstance(port_in, dict):
-        port_in = [port_in]
-    for p in port_in:
-        if not isinstance(p, dict):
-            continue
-        mediaType = str(p.get("mediaType", "") or "")
-        url = str(p.get("url", "") or "")
-        desc = str(p.get("description", "") or "")
-        port_out.append({"mediaType": mediaType, "url": url, "description": desc})
-    clean["portfolio"] = port_out if port_out else []
-
-    # references
-    ref_in = data.get("references", []) or []
-    ref_out = []
-    if isinstance(ref_in, dict):
-        ref_in = [ref_in]
-    for r in ref_in:
-        if not isinstance(r, dict):
-            continue
-        name = str(r.get("name", "") or "")
-        relation = str(r.get("relation", "") or "")
-        contact = str(r.get("contact", "") or "")
-        note = str(r.get("note", "") or "")
-        ref_out.append({"name": name, "relation": relation, "contact": contact, "note": note})
-    clean["references"] = ref_out if ref_out else []
-
-    # final numeric/version defaults
+def _coerce_text(value) -> str:
+    if type(value) is str:
+        return value
+    return str(value or "")
+
+
+def _coerce_number(value) -> int:
+    if type(value) is int:
+        return value
     try:
-        version = int(float(data.get("version", 0) or 0))
+        return int(float(value or 0))
     except Exception:
-        version = 0
-    clean["version"] = version
+        return 0
+
+
+def _coerce_bool(value) -> bool:
+    return bool(value)
+
+
+def _coerce_date(value) -> str:
+    return parse_to_iso(str(value or ""))
+
+
+def _string_list(sep: str):
+    def coerce(value) -> list:
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = [s.strip() for s in value.split(sep) if s.strip()]
+        return unique_list(value)
+    return coerce
+
+
+# scalar coercers inlined into generated code (same result as calling them, minus the call)
+_INLINE = {
+    _coerce_text: "(v if type(v := {arg}) is str else str(v or ''))",
+    _coerce_number: "(v if type(v := {arg}) is int else _number(v))",
+    _coerce_date: "(((_parse_date(v.strip()) if type(v) is str else _date(v)) if (v := {arg}) else ''))",
+}
+
+
+def _object(fields: tuple, aliases: dict = None):
+    """
+    Generate (exec) a coercer with one dict literal entry per field, e.g.
+    {"title": (v if type(v := get("title")) is str else ...), "skills": f12(get("skills")), ...}:
+    no per-field loop or call for scalar fields at runtime.
+    """
+    aliases = aliases or {}
+    namespace = {"_number": _coerce_number, "_date": _coerce_date, "_parse_date": _parse_date}
+    entries = []
+    for n, (key, coercer) in enumerate(fields):
+        arg = f"get({key!r})"
+        if key in aliases:
+            arg = f"({arg} or get({aliases[key]!r}))"
+        if coercer in _INLINE:
+            entries.append(f"{key!r}: " + _INLINE[coercer].format(arg=arg))
+        else:
+            namespace[f"f{n}"] = coercer
+            entries.append(f"{key!r}: f{n}({arg})")
+    source = (
+        "def coerce(value):\n"
+        "    if not isinstance(value, dict):\n"
+        "        value = {}\n"
+        "    get = value.get\n"
+        f"    return {{{', '.join(entries)}}}\n"
+    )
+    exec(source, namespace)
+    return namespace["coerce"]
+
 
-    # ensure status present
-    clean["status"] = str(data.get("status", "") or clean.get("status", ""))
+def _language_item(value) -> dict:
+    # "English - C1" -> {"name": "English", "level": "C1"}
+    parts = [p.strip() for p in _LANGUAGE_SPLIT_RE.split(str(value)) if p.strip()]
+    return {"name": parts[0] if parts else str(value), "level": parts[1] if len(parts) > 1 else ""}
 
-    # Ensure all keys in DEFAULT_SCHEMA are present in clean
-    final = {}
-    for k, v in DEFAULT_SCHEMA.items():
-        final[k] = clean.get(k, v)
 
-    return final
+def _object_list(item, required: bool = False, from_other=None):
+    def coerce(value) -> list:
+        if not value:
+            return []
+        if isinstance(value, dict):
+            value = [value]
+        out = []
+        for v in value:
+            if not isinstance(v, dict):
+                if from_other is None:
+                    continue
+                v = from_other(v)
+            v = item(v)
+            if required and not v["name"]:
+                continue
+            out.append(v)
+        return out
+    return coerce
+
+
+def compile_coercer(default, path: tuple = ()):
+    """Build the coercer function for one schema node from its default value."""
+    key = path[-1] if path else None
+    if key in DATE_FIELDS:
+        return _coerce_date
+    if isinstance(default, bool):
+        return _coerce_bool
+    if isinstance(default, (int, float)):
+        return _coerce_number
+    if isinstance(default, str):
+        return _coerce_text
+    if isinstance(default, dict):
+        fields = tuple((k, compile_coercer(v, path + (k,))) for k, v in default.items())
+        aliases = {k: a for (field, k), a in FIELD_ALIASES.items() if field == key}
+        return _object(fields, aliases)
+    if default and isinstance(default[0], dict):
+        return _object_list(compile_coercer(default[0], path), required=key in REQUIRED_NAME_LISTS,
+                            from_other=_language_item if key == "languages" else None)
+    return _string_list(LIST_SEPARATORS.get(key, ","))
+
+
+# one coercer per top-level Cv field, so a streamed section can be normalized on its own
+FIELD_NORMALIZERS = {k: compile_coercer(v, (k,)) for k, v in DEFAULT_SCHEMA.items()}
+_normalize_cv = compile_coercer(DEFAULT_SCHEMA)
+
+
+def normalize_field(key: str, value):
+    """Normalize one top-level Cv field (the matching part of validate_and_normalize)."""
+    return FIELD_NORMALIZERS[key](value)
+
+
+def validate_and_normalize(data: dict, text: str = None) -> dict:
+    """Pass the resume `text` to also fill / dedupe skills and techStack from the taxonomy (skills.py)."""
+    if not isinstance(data, dict):
+        return DEFAULT_SCHEMA.copy()
+
+    # Ensure all keys in DEFAULT_SCHEMA are present, in schema order
+    result = _normalize_cv(data)
+    if text:
+        fill_skills(result, text)
+    return result
+
+
+def normalize_many(docs) -> list:
+    """Batch entry point: normalize many LLM outputs / stored results in one call."""
+    normalize = _normalize_cv
+    schema_copy = DEFAULT_SCHEMA.copy
+    return [normalize(data) if isinstance(data, dict) else schema_copy() for data in docs]
 
 
 # ---------- Wrapper: parse_resume returns document ready to insert into DB ----------
-def parse_resume(file_path: str) -> dict:
+def parse_resume(file_path: str, mode: str = "full", timings: dict = None, deadline: float = None) -> dict:
+    """
+    Pass a dict as `timings` to get the seconds spent per stage (see metrics.py), and a time.monotonic()
+    `deadline` to stop with DeadlineExceeded between stages once it passed.
+    """
+    return parse_document(file_path, mode, timings, deadline)["result"]
+
+
+def parse_document(file_path: str, mode: str = "full", timings: dict = None, deadline: float = None,
+                   previous: dict = None) -> dict:
+    """
+    parse_resume returning {"result", "sections"} (section texts, for a later incremental re-parse).
+    With `previous` (jobs.read_previous), only the fields of the changed sections go to the LLM, as in
+    app.run_incremental_parse, and the plan comes back under "incremental".
+    """
+    timings = {} if timings is None else timings
     ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".pdf":
-        raw_text = extract_text_from_pdf(file_path)
-    elif ext in [".png", ".jpg", ".jpeg"]:
-        raw_text = extract_text_from_img(file_path)
+    with timed(timings, extract_stage(ext)):
+        raw_text = extract_document(ext, path=file_path, deadline=deadline)["text"]
+    sections = section_texts(raw_text)
+
+    check_deadline(deadline, llm_stage(mode))
+    plan = plan_previous(previous, sections, mode) if previous is not None else None
+    if plan is None or plan["fields"] is None:
+        with timed(timings, llm_stage(mode)):
+            llm_data = extract_fields(raw_text, mode, deadline)
+        with timed(timings, "normalize"):
+            result = validate_and_normalize(llm_data, raw_text)
     else:
-        raise ValueError(f"Unsupported file format: {ext}")
+        fields = {}
+        if plan["fields"]:
+            with timed(timings, llm_stage(mode)):
+                fields = extract_incremental(raw_text, sections, plan, mode, deadline)
+        with timed(timings, "normalize"):
+            result = merge_incremental(previous["result"], fields, raw_text)
+    if plan is None:
+        return {"result": result, "sections": sections}
+    return {"result": bump_version(result, previous["result"], plan), "sections": sections, "incremental": plan}
+
+
+def extract_stage(ext: str) -> str:
+    # ảnh đi thẳng vào OCR; PDF là text layer (trang scan OCR inline vẫn tính vào "pdf")
+    return "pdf" if ext == ".pdf" else "ocr"
+
+
+def llm_stage(mode: str) -> str:
+    return "rules" if mode == "fast" else "llm"
 
-    llm_data = extract_with_gemini(raw_text)
-    normalized = validate_and_normalize(llm_data)
-    return normalized
+
+@contextmanager
+def source_input(source: dict):
+    """Yield extract_* keyword args for a handoff source (see handoff.py): path=... or stream=..."""
+    if "shm" not in source:
+        yield {"path": source["path"]}
+        return
+    with open_shared(source["shm"], source["size"]) as buf:
+        yield {"stream": buf}
+
+
+def source_ext(source: dict) -> str:
+    return source.get("ext") or os.path.splitext(source.get("path", ""))[1].lower()
+
+
+def source_page_count(source: dict) -> int:
+    with source_input(source) as kw:
+        return pdf_page_count(**kw)
+
+
+def extract_source_pages(source: dict, start: int, stop: int, deadline: float = None) -> dict:
+    """Worker task: extract one page range of a PDF source; scanned pages are deferred for pool OCR."""
+    timings = {}
+    with timed(timings, "pdf"), source_input(source) as kw:
+        report = extract_pdf(start=start, stop=stop, ocr="defer", keep_texts=True, deadline=deadline, **kw)
+    report["timings"] = timings
+    return report
+
+
+def ocr_source_page(source: dict, index: int, deadline: float = None) -> dict:
+    """Worker task: OCR one page of a PDF source (DeadlineExceeded when `deadline` passed while it was queued)."""
+    check_deadline(deadline, "ocr")
+    with source_input(source) as kw:
+        return ocr_pdf_page(index, **kw)
+
+
+def parse_text(raw_text: str, mode: str = "full", timings: dict = None, deadline: float = None) -> dict:
+    timings = {} if timings is None else timings
+    with timed(timings, llm_stage(mode)):
+        llm_data = extract_fields(raw_text, mode, deadline)
+    with timed(timings, "normalize"):
+        return validate_and_normalize(llm_data, raw_text)
+
+
+def extraction_summary(report: dict) -> dict:
+    return {k: v for k, v in report.items() if k not in ("text", "texts", "ocr_pages", "timings")}
+
+
+def parse_source(source: dict, call_llm: bool = True, mode: str = "full", deadline: float = None) -> dict:
+    """
+    Worker entry point for a handoff source (see handoff.py):
+    a file path, or a shared memory segment read in place without touching disk.
+    Returns {"result": normalized_cv, "extraction": page timings / truncation info, "timings"}.
+    If the PDF has scanned pages, or call_llm=False (the caller makes the LLM call itself),
+    returns {"report": extraction_report} without calling the LLM; the stage times measured
+    here are then in report["timings"].
+    `deadline` (time.monotonic(); the pool shares the host's monotonic clock) is checked between
+    pages and before the LLM call: a task that waited past it stops with DeadlineExceeded.
+    """
+    timings = {}
+    ext = source_ext(source)
+    with timed(timings, extract_stage(ext)), source_input(source) as kw:
+        report = extract_document(ext, ocr="defer", deadline=deadline, **kw)
+    if not call_llm or report.get("ocr_pages"):
+        report["timings"] = timings
+        return {"report": report}
+    check_deadline(deadline, llm_stage(mode))
+    result = parse_text(report["text"], mode, timings, deadline)
+    return {"result": result, "extraction": extraction_summary(report), "timings": timings}
+
+
+def warm_up() -> dict:
+    """
+    Pool / Celery worker initializer: import the lazily loaded extraction stack (PyMuPDF,
+    Pillow, OCR engine with its language model) and run one tiny PDF extraction, so the first
+    real document does not pay for it. Failures are reported, not raised: a worker without
+    OCR still serves text PDFs.
+    """
+    t0 = time.perf_counter()
+    report = {}
+    try:
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "warm up")
+        pdf = doc.tobytes()
+        doc.close()
+        extract_pdf(stream=pdf, ocr="off")
+        report["pdf"] = "ok"
+    except Exception as e:
+        report["pdf"] = f"error: {e}"
+    if not ocr.engine_available():
+        report["ocr"] = "unavailable"
+    else:
+        try:
+            load(Image)
+            ocr.get_engine().warm()
+            report["ocr"] = "ok"
+        except Exception as e:
+            report["ocr"] = f"error: {e}"
+    report["seconds"] = round(time.perf_counter() - t0, 3)
+    return report
 
 
 # ---------- Run example ----------
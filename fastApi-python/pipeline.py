@@ -0,0 +1,85 @@
+# pipeline.py
+# Pipeline theo stage trong process API: extraction/OCR (CPU) trên process pool, gọi LLM (I/O)
+# bằng client async trên event loop, normalize (vài chục µs) chạy ngay trên loop.
+# Mỗi stage có giới hạn song song riêng, nên hàng chục lời gọi Gemini có thể cùng chờ mạng
+# trong khi các worker CPU vẫn bận trích xuất file khác, thay vì mỗi worker ngồi chờ một lời gọi.
+# Khi quá tải, request có deadline (deadline.py) rời hàng chờ lúc hết hạn, và không nhận slot nếu thời gian
+# còn lại ít hơn thời gian giữ slot trung bình của stage: slot dành cho request còn kịp xong.
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+# trọng số của mẫu mới trong trung bình trượt thời gian giữ slot
+HOLD_EWMA_ALPHA = 0.2
+
+
+class Stage:
+    """
+    Concurrency limit for one pipeline stage; time spent queued for a slot goes to `<name>_wait`.
+    `expected` is a moving average of how long a slot is held (seconds).
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.active = 0
+        self.waiting = 0
+        self.expected = 0.0
+        # tạo trong event loop đang chạy (startup), không ở import time
+        self._sem = asyncio.Semaphore(self.limit)
+
+    def _needed(self) -> float:
+        # chỉ nhường slot khi stage đang đầy / có request khác chờ; stage rảnh thì cứ thử (và nhờ đó
+        # `expected` vẫn được cập nhật khi nó lớn hơn mọi deadline)
+        return self.expected if self.waiting or self.active >= self.limit else 0.0
+
+    @asynccontextmanager
+    async def slot(self, timings: dict = None, deadline=None):
+        """
+        Hold one slot for the block. With a deadline.Deadline, raises DeadlineExceeded when it passes
+        while queued, or when less than `expected` seconds are left while the stage is contended.
+        """
+        if deadline is not None:
+            deadline.check(self.name, self._needed())
+        t0 = time.perf_counter()
+        self.waiting += 1
+        try:
+            if deadline is None:
+                await self._sem.acquire()
+            else:
+                await deadline.run(self._sem.acquire(), self.name)
+        finally:
+            self.waiting -= 1
+        if timings is not None:
+            key = f"{self.name}_wait"
+            timings[key] = timings.get(key, 0.0) + time.perf_counter() - t0
+        if deadline is not None:
+            try:
+                deadline.check(self.name, self._needed())
+            except BaseException:
+                self._sem.release()
+                raise
+        self.active += 1
+        held = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+            self.expected += HOLD_EWMA_ALPHA * (time.perf_counter() - held - self.expected)
+
+
+class Pipeline:
+    """
+    Per-stage limits: `extract` bounds documents in extraction/OCR on the pool (keep it a bit
+    above the pool size so workers never idle between tasks), `llm` bounds concurrent LLM calls.
+    Normalization has no stage: it runs inline on the loop, cheaper than any hand-off.
+    """
+
+    def __init__(self, extract_concurrency: int, llm_concurrency: int):
+        self.extract = Stage("extract", extract_concurrency)
+        self.llm = Stage("llm", llm_concurrency)
+        self.stages = (self.extract, self.llm)
+
+    def stats(self, field: str) -> dict:
+        return {(s.name,): getattr(s, field) for s in self.stages}
@@ -0,0 +1,406 @@
+# pool.py
+# Process pool tự quản lý, dùng chung cho cả process API (thay ProcessPoolExecutor cố định):
+# - co giãn số worker trong [min_workers, max_workers] theo số task đang chờ, không mở thêm
+#   worker khi RAM trống của máy dưới min_free_mb;
+# - thay worker sau max_tasks task hoặc khi RSS vượt max_rss_mb (PyMuPDF / OCR phình bộ nhớ dần);
+# - worker chết (segfault trong MuPDF, OOM kill) chỉ làm hỏng task nó đang chạy, worker khác và
+#   task khác không bị ảnh hưởng (ProcessPoolExecutor thì hỏng cả pool: BrokenProcessPool).
+# Mỗi worker có một Pipe riêng; một thread quản lý trong process cha giao task, nhận kết quả,
+# theo dõi sentinel của process và co giãn pool.
+import collections
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.connection import wait as wait_objects
+
+# worker chết ngay khi khởi động: chờ trước khi spawn lại để không lặp spawn/crash liên tục
+RESPAWN_BACKOFF_SECONDS = 1.0
+# lỗi trong thread quản lý (vd. OSError khi spawn lúc thiếu fd / RAM): chờ tăng dần tới mức trần
+MANAGER_BACKOFF_MAX_SECONDS = 30.0
+# sau chừng này lỗi liên tiếp mà không còn worker nào: task đang chờ nhận lỗi thay vì treo
+MANAGER_MAX_ERRORS = 3
+
+
+class WorkerCrashed(BrokenProcessPool):
+    """The worker running this task exited unexpectedly; the rest of the pool is unaffected."""
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (0 when unknown)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        # peak RSS (KB trên Linux): ước lượng trên khi không có /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+def available_memory() -> int:
+    """MemAvailable of the host in bytes, or None when it cannot be read."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _worker_main(conn, initializer, initargs):
+    warm = None
+    if initializer is not None:
+        try:
+            warm = initializer(*initargs)
+        except Exception:
+            traceback.print_exc()
+    conn.send(("ready", warm, current_rss()))
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+        fn, args, kwargs = msg
+        try:
+            reply = ("done", True, fn(*args, **kwargs))
+        except BaseException as e:
+            reply = ("done", False, e)
+        try:
+            conn.send(reply + (current_rss(),))
+        except Exception as e:
+            # kết quả / exception không pickle được
+            conn.send(("done", False, RuntimeError(f"Unpicklable task result: {e!r}"), current_rss()))
+
+
+class _Worker:
+    __slots__ = ("process", "conn", "state", "future", "tasks", "rss", "warm", "idle_since", "started")
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.state = "starting"  # starting -> idle <-> busy -> retiring; "dead" khi pipe đã hỏng
+        self.future = None
+        self.tasks = 0
+        self.rss = 0
+        self.warm = None
+        self.started = time.monotonic()
+        self.idle_since = self.started
+
+
+class WorkerPool(Executor):
+    """
+    concurrent.futures Executor over spawned worker processes (works with loop.run_in_executor).
+    max_tasks / max_rss_mb: recycle a worker after that many tasks / above that RSS (0 = never).
+    idle_seconds: stop workers above min_workers after being idle that long.
+    """
+
+    def __init__(self, min_workers: int = 1, max_workers: int = None, max_tasks: int = 0,
+                 max_rss_mb: float = 0, idle_seconds: float = 60, min_free_mb: float = 0,
+                 initializer=None, initargs: tuple = (), mp_context=None):
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.min_workers = max(0, min(min_workers, self.max_workers))
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.idle_seconds = idle_seconds
+        self.min_free = min_free_mb * 1024 * 1024
+        self.initializer = initializer
+        self.initargs = initargs
+        self.ctx = mp_context or multiprocessing.get_context("spawn")
+        # started / recycled / crashed / scaled_down / failed_tasks / manager_errors
+        self.stats = collections.Counter()
+        self.last_error = None  # lỗi gần nhất của thread quản lý (repr), None khi đã hồi phục
+        self._errors = 0  # lỗi liên tiếp, về 0 khi spawn được worker
+        self._workers = []
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._wake_r, self._wake_w = os.pipe()
+        self._shutdown = False
+        self._spawn_after = 0.0
+        self._ids = itertools.count()
+        self._thread = threading.Thread(target=self._run, name="worker-pool", daemon=True)
+        self._thread.start()
+
+    # ---------- Executor API ----------
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._pending.append((future, fn, args, kwargs))
+        self._wake()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                while self._pending:
+                    self._pending.popleft()[0].cancel()
+        self._wake()
+        if wait:
+            self._thread.join()
+
+    # ---------- stats (read from other threads, approximate) ----------
+    def live_workers(self) -> int:
+        return sum(1 for w in self._workers if w.state != "retiring")
+
+    def busy(self) -> int:
+        return sum(1 for w in self._workers if w.state == "busy")
+
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def utilization(self) -> float:
+        """Busy workers / live workers."""
+        return self.busy() / max(self.live_workers(), 1)
+
+    def workers_info(self) -> list:
+        return [{"pid": w.process.pid, "state": w.state, "tasks": w.tasks, "rss_mb": round(w.rss / 2 ** 20, 1),
+                 "warm": w.warm} for w in list(self._workers)]
+
+    def broken(self) -> bool:
+        """The manager keeps failing with no live worker: tasks fail instead of waiting."""
+        return self._errors >= MANAGER_MAX_ERRORS and not self._workers
+
+    def wait_ready(self, count: int = None, timeout: float = None) -> bool:
+        """
+        Block until `count` (default min_workers) workers finished their initializer; False after
+        `timeout` seconds, or as soon as the pool is broken (see last_error).
+        """
+        count = self.min_workers if count is None else count
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ready:
+            while sum(1 for w in self._workers if w.state in ("idle", "busy")) < count:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if (remaining is not None and remaining <= 0) or self.broken():
+                    return False
+                self._ready.wait(min(remaining, 1.0) if remaining is not None else 1.0)
+        return True
+
+    # ---------- manager thread ----------
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"x")
+        except OSError:
+            pass
+
+    def _spawn(self):
+        parent, child = self.ctx.Pipe()
+        process = self.ctx.Process(target=_worker_main, args=(child, self.initializer, self.initargs),
+                                   name=f"cv-worker-{next(self._ids)}", daemon=True)
+        try:
+            process.start()
+        except BaseException:
+            parent.close()
+            child.close()
+            raise
+        child.close()
+        with self._lock:
+            self._workers.append(_Worker(process, parent))
+        self.stats["started"] += 1
+        self._errors = 0
+        self.last_error = None
+
+    def _retire(self, w: _Worker, reason: str):
+        w.state = "retiring"
+        self.stats[reason] += 1
+        try:
+            w.conn.send(None)
+        except (OSError, ValueError):
+            pass
+
+    def _memory_ok(self) -> bool:
+        if not self.min_free:
+            return True
+        free = available_memory()
+        return free is None or free >= self.min_free
+
+    def _scale(self):
+        now = time.monotonic()
+        live = [w for w in self._workers if w.state != "retiring"]
+        idle = [w for w in live if w.state == "idle"]
+        starting = sum(1 for w in live if w.state == "starting")
+        # thêm worker: còn task chờ mà không có worker rảnh / đang khởi động nhận
+        # (khi shutdown chỉ để chạy nốt task đã nhận)
+        wanted = len(self._pending) - len(idle) - starting
+        if not self._shutdown:
+            wanted = max(wanted, self.min_workers - len(live))
+        while wanted > 0 and len(live) < self.max_workers and now >= self._spawn_after:
+            if len(live) >= self.min_workers and not self._memory_ok():
+                break
+            self._spawn()
+            live.append(self._workers[-1])
+            wanted -= 1
+        # bớt worker rảnh quá lâu, giữ tối thiểu min_workers
+        if self.idle_seconds and not self._pending:
+            for w in idle:
+                if len(live) <= self.min_workers:
+                    break
+                if now - w.idle_since >= self.idle_seconds:
+                    self._retire(w, "scaled_down")
+                    live.remove(w)
+
+    def _dispatch(self):
+        for w in self._workers:
+            if w.state != "idle":
+                continue
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        return
+                    future, fn, args, kwargs = self._pending.popleft()
+                if future.cancelled():
+                    continue  # đã bị huỷ khi còn trong hàng đợi
+                try:
+                    w.conn.send((fn, args, kwargs))
+                except (OSError, EOFError):
+                    # worker vừa chết: trả task về đầu hàng đợi, sentinel sẽ báo crash
+                    with self._lock:
+                        self._pending.appendleft((future, fn, args, kwargs))
+                    w.state = "dead"
+                    break
+                except Exception as e:
+                    future.set_exception(e)  # args không pickle được
+                    continue
+                # huỷ đúng lúc vừa gửi: worker vẫn chạy, kết quả bị bỏ qua
+                future.set_running_or_notify_cancel()
+                w.state = "busy"
+                w.future = future
+                break
+
+    def _on_message(self, w: _Worker):
+        try:
+            msg = w.conn.recv()
+        except (EOFError, OSError):
+            return False
+        kind = msg[0]
+        if kind == "ready":
+            _, w.warm, w.rss = msg
+            if w.state == "starting":
+                w.state = "idle"
+                w.idle_since = time.monotonic()
+            with self._ready:
+                self._ready.notify_all()
+            return True
+        _, ok, value, w.rss = msg
+        future, w.future = w.future, None
+        w.tasks += 1
+        if w.state == "busy":
+            w.state = "idle"
+            w.idle_since = time.monotonic()
+        if future is not None and not future.done():
+            if ok:
+                future.set_result(value)
+            else:
+                self.stats["failed_tasks"] += 1
+                future.set_exception(value)
+        if w.state == "idle":
+            if self.max_tasks and w.tasks >= self.max_tasks:
+                self._retire(w, "recycled")
+            elif self.max_rss and w.rss > self.max_rss:
+                self._retire(w, "recycled")
+        return True
+
+    def _on_exit(self, w: _Worker):
+        # đọc nốt kết quả worker gửi trước khi thoát
+        while w.future is not None and w.conn.poll():
+            if not self._on_message(w):
+                break
+        w.process.join(timeout=0)
+        if w.state != "retiring":
+            self.stats["crashed"] += 1
+            if w.state == "starting":
+                self._spawn_after = time.monotonic() + RESPAWN_BACKOFF_SECONDS
+            if w.future is not None and not w.future.done():
+                w.future.set_exception(WorkerCrashed(
+                    f"worker pid {w.process.pid} exited with code {w.process.exitcode}"
+                ))
+                w.future = None
+        w.conn.close()
+        with self._lock:
+            self._workers.remove(w)
+
+    def _on_error(self, error: Exception):
+        """Manager step failed: back off spawning; with no worker left, fail the waiting tasks."""
+        traceback.print_exc()
+        self.stats["manager_errors"] += 1
+        self._errors += 1
+        self.last_error = repr(error)
+        delay = min(RESPAWN_BACKOFF_SECONDS * 2 ** (self._errors - 1), MANAGER_BACKOFF_MAX_SECONDS)
+        self._spawn_after = time.monotonic() + delay
+        self._fail_pending_if_broken()
+
+    def _fail_pending_if_broken(self):
+        if not self.broken():
+            return
+        with self._lock:
+            pending, self._pending = self._pending, collections.deque()
+        for future, *_ in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(BrokenProcessPool(f"Worker pool cannot start workers: {self.last_error}"))
+        with self._ready:
+            self._ready.notify_all()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                done = self._shutdown and not self._pending
+            if done and not any(w.state == "busy" for w in self._workers):
+                break
+            try:
+                self._step()
+            except Exception as e:
+                # thread quản lý không được chết: mọi submit sau đó sẽ treo mãi
+                self._on_error(e)
+                time.sleep(max(0.0, min(self._spawn_after - time.monotonic(), 1.0)))
+        self._stop_workers()
+
+    def _step(self):
+        """One manager iteration: scale, hand out tasks, then wait for a message / exit / wake-up."""
+        self._scale()
+        self._dispatch()
+        # lỗi liên tiếp và đang chờ backoff: task mới gửi vào cũng nhận lỗi ngay
+        self._fail_pending_if_broken()
+        workers = list(self._workers)
+        objects = {self._wake_r: None}
+        for w in workers:
+            objects[w.conn] = ("msg", w)
+            objects[w.process.sentinel] = ("exit", w)
+        for obj in wait_objects(list(objects), timeout=1.0):
+            if obj == self._wake_r:
+                os.read(self._wake_r, 4096)
+                continue
+            kind, w = objects[obj]
+            if w not in self._workers:
+                continue
+            if kind == "exit" or not self._on_message(w):
+                # EOF trên pipe: process đang thoát
+                w.process.join(timeout=1)
+                self._on_exit(w)
+
+    def _stop_workers(self):
+        for w in list(self._workers):
+            if w.state != "retiring":
+                self._retire(w, "stopped")
+        for w in list(self._workers):
+            w.process.join(timeout=5)
+            if w.process.is_alive():
+                w.process.terminate()
+            w.conn.close()
+        self._workers.clear()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
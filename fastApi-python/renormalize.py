@@ -0,0 +1,47 @@
+# renormalize.py
+# Chạy lại bước normalize cho toàn bộ kết quả đã lưu trong result store (sau khi sửa DEFAULT_SCHEMA /
+# normalizer / taxonomy skill), không gọi lại Gemini. Kết quả còn văn bản từng mục trong store (bảng
+# sections) được quét lại skill / techStack bằng skills.py:
+#   python renormalize.py            -> ghi lại các kết quả có thay đổi
+#   python renormalize.py --dry-run  -> chỉ đếm
+import sys
+import time
+
+from jobs import get_store
+from parser import normalize_many
+from skills import fill_skills
+
+BATCH_SIZE = 500
+
+
+def stored_text(store, cv_id: str) -> str:
+    """Resume text rebuilt from the stored section texts ("" when the store does not keep them)."""
+    content_hash = store.content_hash(cv_id)
+    sections = store.get_sections(content_hash) if content_hash else None
+    return "\n".join(sections.values()) if sections else ""
+
+
+def renormalize_results(dry_run: bool = False) -> dict:
+    store = get_store()
+    stats = {"done": 0, "changed": 0}
+    t0 = time.perf_counter()
+    for payloads in store.iter_payloads(status="done", batch=BATCH_SIZE):
+        payloads = [(cv_id, p) for cv_id, p in payloads if isinstance(p.get("result"), dict)]
+        stats["done"] += len(payloads)
+        normalized = normalize_many([p["result"] for _, p in payloads])
+        for (cv_id, _), result in zip(payloads, normalized):
+            text = stored_text(store, cv_id)
+            if text:
+                fill_skills(result, text)
+        changed = [(cv_id, dict(payload, result=result))
+                   for (cv_id, payload), result in zip(payloads, normalized) if result != payload["result"]]
+        stats["changed"] += len(changed)
+        if changed and not dry_run:
+            # một transaction cho cả lô
+            store.put_many(changed)
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    print(renormalize_results(dry_run="--dry-run" in sys.argv[1:]))
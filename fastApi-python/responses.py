@@ -0,0 +1,170 @@
+# responses.py
+# Mã hóa response: orjson (nhanh hơn json chuẩn nhiều lần với kết quả CV lồng nhau, tiếng Việt giữ
+# nguyên UTF-8), nén gzip / brotli theo Accept-Encoding cho body lớn, và ETag cho kết quả lấy theo id.
+# orjson / brotli là tùy chọn: thiếu orjson thì dùng json chuẩn, thiếu brotli thì chỉ gzip.
+import gzip
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# body nhỏ hơn mức này không nén (header + CPU tốn hơn số byte tiết kiệm được)
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "application/x-ndjson")
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (falls back to the standard encoder)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(JSONResponse):
+    """Body that is already encoded JSON (e.g. straight from the result store): sent as is."""
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == bare:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Best supported content coding for an Accept-Encoding header: "br", "gzip" or None."""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name] = q
+    star = weights.get("*", 0.0)
+    supported = (("br", "gzip") if brotli is not None else ("gzip",))
+    best, best_q = None, 0.0
+    for name in supported:
+        q = weights.get(name, star)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def weaken_etag(value: bytes) -> bytes:
+    # ETag mạnh chỉ đúng cho đúng một chuỗi byte: bản gzip / br / gốc dùng chung thì phải là ETag yếu
+    return value if value.startswith(b"W/") else b"W/" + value
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete (single-message) response bodies of at least
+    `min_size` bytes. Streamed bodies (SSE, NDJSON of /upload/batch) pass through untouched so
+    every event still reaches the client as soon as it is sent. A strong ETag on a compressed
+    body is weakened (W/"..."); etag_matches compares weakly, so revalidation still gives 304.
+    """
+
+    def __init__(self, app, min_size: int = COMPRESS_MIN_BYTES, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        revalidating_weak = False
+        for key, value in scope.get("headers", ()):
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+            elif key == b"if-none-match":
+                revalidating_weak = b"W/" in value
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            body = message.get("body", b"")
+            if pending["status"] == 304 and revalidating_weak:
+                # client đang giữ bản nén (ETag yếu): 304 trả lại đúng validator đó
+                pending = dict(pending, headers=[(k, weaken_etag(v) if k == b"etag" else v)
+                                                 for k, v in pending["headers"]])
+            if message.get("more_body", False) or not self._eligible(pending, body):
+                await send(pending)
+                await send(message)
+                return
+            body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            vary = [v for k, v in pending["headers"] if k == b"vary"] + [b"Accept-Encoding"]
+            headers = [(k, weaken_etag(v) if k == b"etag" else v) for k, v in pending["headers"]
+                       if k not in (b"content-length", b"vary")]
+            headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(body)).encode()),
+                        (b"vary", b", ".join(vary))]
+            await send(dict(pending, headers=headers))
+            await send(dict(message, body=body))
+
+        await self.app(scope, receive, send_compressed)
+
+    def _eligible(self, start: dict, body: bytes) -> bool:
+        if len(body) < self.min_size or start["status"] < 200 or start["status"] in (204, 206, 304):
+            return False
+        content_type = b""
+        for key, value in start["headers"]:
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value
+        return content_type.split(b";")[0].strip().decode("latin-1") in COMPRESSIBLE_TYPES
@@ -0,0 +1,410 @@
+# rules.py
+# Trích xuất nhanh bằng regex / heuristic (không gọi LLM), chạy trong vài mili-giây:
+# email, số điện thoại (định dạng VN), URL, khoảng thời gian, tiêu đề mục (tiếng Việt + tiếng Anh).
+# Dùng cho mode "fast" (chỉ rule) và "hybrid" (rule điền trước, LLM làm phần còn lại) — xem parser.py.
+import re
+
+# tiêu đề mục -> khóa section; so khớp cả dòng sau khi casefold, bỏ dấu ":" cuối
+SECTION_HEADINGS = {
+    "summary": [
+        "mục tiêu nghề nghiệp", "mục tiêu", "giới thiệu", "giới thiệu bản thân", "tóm tắt", "tổng quan",
+        "objective", "career objective", "summary", "professional summary", "profile", "about me",
+    ],
+    "experiences": [
+        "kinh nghiệm làm việc", "kinh nghiệm", "quá trình làm việc", "quá trình công tác",
+        "experience", "work experience", "working experience", "employment history", "professional experience",
+    ],
+    "education": ["học vấn", "trình độ học vấn", "quá trình học tập", "education", "academic background"],
+    "projects": ["dự án", "dự án tham gia", "dự án cá nhân", "projects", "personal projects"],
+    "certifications": ["chứng chỉ", "bằng cấp", "bằng cấp - chứng chỉ", "certifications", "certificates", "licenses & certifications"],
+    "awards": ["danh hiệu và giải thưởng", "giải thưởng", "thành tích", "awards", "honors & awards", "honors and awards"],
+    "skills": ["kỹ năng", "kĩ năng", "kỹ năng chuyên môn", "kỹ năng mềm", "skills", "technical skills", "soft skills"],
+    "languages": ["ngoại ngữ", "ngôn ngữ", "languages"],
+    "activities": ["hoạt động", "hoạt động ngoại khóa", "activities", "volunteer"],
+    "references": ["người giới thiệu", "người tham chiếu", "tham khảo", "references"],
+    "interests": ["sở thích", "interests", "hobbies"],
+    "info": ["thông tin cá nhân", "thông tin liên hệ", "liên hệ", "personal information", "contact", "contact information"],
+}
+_HEADING_KEYS = {h: key for key, names in SECTION_HEADINGS.items() for h in names}
+
+# nhãn trên dòng "Nhãn: giá trị" ở phần đầu CV
+FIELD_LABELS = {
+    "fullname": ["họ và tên", "họ tên", "full name", "name"],
+    "phone": ["số điện thoại", "điện thoại", "sđt", "sdt", "đt", "di động", "phone", "mobile", "tel"],
+    "email": ["email", "e-mail", "mail", "thư điện tử"],
+    "address": ["địa chỉ", "nơi ở", "address", "location"],
+    "targetRole": ["vị trí ứng tuyển", "vị trí mong muốn", "position", "desired position"],
+    "url": ["website", "web", "portfolio", "github", "linkedin", "facebook", "blog"],
+}
+_LABEL_KEYS = {label: key for key, labels in FIELD_LABELS.items() for label in labels}
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# 0912 345 678, 0912.345.678, +84 912 345 678, (+84) 912-345-678, 024 3856 1234 (cố định)
+# sau đầu số 0 / 84: 9 chữ số (di động) hoặc 10 (cố định: mã vùng 2-3 số + 7-8 số), nhóm tùy ý
+PHONE_RE = re.compile(r"(?<![\w+])(?:\(\+?84\)|\+?84|0)[\s.\-]?\d(?:[\s.\-]?\d){8,9}(?![\w@])")
+URL_RE = re.compile(
+    r"(?:https?://|www\.)[^\s<>\"']+"
+    r"|(?<![@\w.])(?:[a-z0-9-]+\.)+(?:com|vn|net|org|io|dev|me|info|co|app)(?:\.vn)?/[^\s<>\"']*",
+    re.IGNORECASE,
+)
+LABEL_RE = re.compile(r"^\s*([^\W\d][\w .&/-]{0,30}?)\s*[:：]\s*(.*)$")
+BULLET_RE = re.compile(r"^\s*[•●▪◦○■□➢➤►✓✔*+\-–—]\s*")
+
+_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+_DATE = (
+    r"(?:(?:tháng|th\.?|t)\s*)?(?:\d{1,2}\s*[/.\-]\s*){0,2}\d{4}"
+    r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{4}"
+)
+_PRESENT = r"nay|hiện tại|hiện nay|đến nay|present|now|current|today"
+DATE_RANGE_RE = re.compile(
+    rf"(?P<from>{_DATE})\s*(?:-|–|—|~|to|đến)\s*(?P<to>{_DATE}|{_PRESENT})",
+    re.IGNORECASE,
+)
+SINGLE_DATE_RE = re.compile(rf"^\s*(?P<from>{_DATE})\s*$", re.IGNORECASE)
+_PRESENT_RE = re.compile(rf"^(?:{_PRESENT})$", re.IGNORECASE)
+
+COMPANY_MARKERS = re.compile(
+    r"\b(?:công ty|cty|tập đoàn|ngân hàng|tnhh|cổ phần|company|corp|corporation|co\.|ltd|jsc|inc|llc|group"
+    r"|bank|software|technology|technologies|solutions|studio|agency)\b",
+    re.IGNORECASE,
+)
+TITLE_MARKERS = re.compile(
+    r"\b(?:nhân viên|chuyên viên|trưởng|phó|giám đốc|thực tập sinh|kỹ sư|lập trình viên|kế toán|trợ lý"
+    r"|engineer|developer|manager|intern|lead|analyst|designer|consultant|specialist|executive|director"
+    r"|assistant|officer|architect|tester)\b",
+    re.IGNORECASE,
+)
+SCHOOL_MARKERS = re.compile(
+    r"\b(?:đại học|trường|học viện|cao đẳng|university|college|institute|academy|school)\b",
+    re.IGNORECASE,
+)
+ACHIEVEMENT_PREFIX = re.compile(r"^(?:thành tựu|thành tích|achievements?)\s*[:：]\s*", re.IGNORECASE)
+MAJOR_PREFIX = re.compile(r"^(?:chuyên ngành|ngành|major)\s*[:：]?\s*", re.IGNORECASE)
+GPA_RE = re.compile(r"(?:gpa|điểm trung bình|điểm tb|xếp loại)\s*[:：]?\s*(.+)$", re.IGNORECASE)
+ROLE_PREFIX = re.compile(r"^(?:vai trò|vị trí|role|position)\s*[:：]\s*", re.IGNORECASE)
+TECH_PREFIX = re.compile(r"^(?:công nghệ|công nghệ sử dụng|tech stack|technologies|technology)\s*[:：]\s*", re.IGNORECASE)
+DESC_PREFIX = re.compile(r"^(?:mô tả|mô tả dự án|description)\s*[:：]\s*", re.IGNORECASE)
+# tách danh sách kỹ năng theo dấu phẩy / chấm phẩy nhưng không tách bên trong ngoặc
+LIST_SPLIT_RE = re.compile(r"[,;|·](?![^()]*\))")
+HEAD_SPLIT_RE = re.compile(r"\s+[|•·]\s+")
+LEVEL_SPLIT_RE = re.compile(r"\s*(?:[:：]|\s[-–—]\s)\s*")
+
+
+def heading_key(line: str) -> str:
+    """Section key for a heading line ("KINH NGHIỆM LÀM VIỆC" -> "experiences"), else None."""
+    key = line.strip().rstrip(":：").strip().casefold()
+    return _HEADING_KEYS.get(key)
+
+
+def split_sections(text: str) -> list:
+    """[(key, heading, lines)]: the block before the first heading has key "header"."""
+    sections = [("header", "", [])]
+    for raw in (text or "").splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        key = heading_key(line)
+        if key is not None:
+            sections.append((key, line, []))
+        else:
+            sections[-1][2].append(line)
+    return sections
+
+
+def date_to_iso(value: str) -> str:
+    """"12/2020" -> "2020-12", "01.03.2020" -> "2020-03-01", "Mar 2020" -> "2020-03", "Nay" -> "Present"."""
+    value = value.strip()
+    if _PRESENT_RE.match(value):
+        return "Present"
+    low = value.casefold()
+    month = _MONTHS.get(low[:3])
+    year = re.search(r"\d{4}", value)
+    if year is None:
+        return ""
+    if month:
+        return f"{year.group()}-{month:02d}"
+    nums = [int(n) for n in re.findall(r"\d{1,2}(?!\d)", value[:year.start()])]
+    if len(nums) >= 2 and 1 <= nums[-1] <= 12 and 1 <= nums[-2] <= 31:
+        return f"{year.group()}-{nums[-1]:02d}-{nums[-2]:02d}"
+    if nums and 1 <= nums[-1] <= 12:
+        return f"{year.group()}-{nums[-1]:02d}"
+    return year.group()
+
+
+def match_dates(line: str):
+    """(from, to, rest_of_line) if the line starts or ends with a date / date range, else None."""
+    m = DATE_RANGE_RE.search(line)
+    if m is not None and (m.start() == 0 or m.end() == len(line)):
+        rest = (line[:m.start()] + " " + line[m.end():]).strip(" |,-–—()")
+        return date_to_iso(m.group("from")), date_to_iso(m.group("to")), rest
+    m = SINGLE_DATE_RE.match(line)
+    if m is not None:
+        return date_to_iso(m.group("from")), "", ""
+    return None
+
+
+def normalize_phone(value: str) -> str:
+    return re.sub(r"[\s.\-()]", "", value)
+
+
+def find_phones(text: str) -> list:
+    return [normalize_phone(m.group()) for m in PHONE_RE.finditer(text or "")]
+
+
+def find_emails(text: str) -> list:
+    return EMAIL_RE.findall(text or "")
+
+
+def find_urls(text: str) -> list:
+    urls = []
+    for m in URL_RE.finditer(text or ""):
+        url = m.group().rstrip(".,;:)]}")
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def _split_entries(lines: list) -> list:
+    """
+    Group section lines into entries around date lines:
+    [{"from", "to", "head": [non-bullet lines], "bullets": [...]}]. Wrapped lines are rejoined.
+    Non-bullet lines right before a date line ("Software Engineer" / "2019 - 2021") belong to it.
+    """
+    entries = []
+    pending = []
+
+    def flush():
+        if not entries:
+            return
+        entry = entries[-1]
+        for line in pending:
+            if entry["bullets"]:
+                entry["bullets"][-1] += " " + line
+            else:
+                entry["head"].append(line)
+        pending.clear()
+
+    for line in lines:
+        dates = match_dates(line)
+        if dates is not None:
+            entry = {"from": dates[0], "to": dates[1], "head": list(pending), "bullets": []}
+            pending.clear()
+            if dates[2]:
+                entry["head"].extend(p for p in HEAD_SPLIT_RE.split(dates[2]) if p)
+            entries.append(entry)
+            continue
+        if BULLET_RE.match(line):
+            flush()
+            item = BULLET_RE.sub("", line).strip()
+            if item and entries:
+                entries[-1]["bullets"].append(item)
+        elif entries and entries[-1]["bullets"] and not line[0].isupper():
+            # dòng bị ngắt giữa chừng khi trích PDF: nối vào bullet trước
+            entries[-1]["bullets"][-1] += " " + line
+        elif entries and not entries[-1]["bullets"]:
+            entries[-1]["head"].append(line)
+        else:
+            pending.append(line)
+    flush()
+    return entries
+
+
+def _pick(lines: list, pattern, exclude=None) -> tuple:
+    """Split lines into (first line matching pattern and not exclude, other lines)."""
+    for i, line in enumerate(lines):
+        if pattern.search(line) and not (exclude is not None and exclude.search(line)):
+            return line, lines[:i] + lines[i + 1:]
+    return None, list(lines)
+
+
+def _experiences(lines: list) -> list:
+    out = []
+    for e in _split_entries(lines):
+        # "FPT Software" là công ty, "Software Engineer" là chức danh
+        company, rest = _pick(e["head"], COMPANY_MARKERS, exclude=TITLE_MARKERS)
+        if company is None:
+            company, rest = _pick(e["head"], COMPANY_MARKERS)
+        if company is None and rest:
+            # bố cục TopCV: thời gian, công ty, chức danh
+            company, rest = rest[0], rest[1:]
+        title = rest[0] if rest else ""
+        responsibilities, achievements = [], []
+        for b in e["bullets"]:
+            if ACHIEVEMENT_PREFIX.match(b):
+                achievements.append(ACHIEVEMENT_PREFIX.sub("", b))
+            else:
+                responsibilities.append(b)
+        out.append({
+            "title": title, "company": company or "", "from": e["from"], "to": e["to"],
+            "isCurrent": e["to"] == "Present",
+            "responsibilities": responsibilities, "achievements": achievements,
+        })
+    return out
+
+
+def _education(lines: list) -> list:
+    out = []
+    for e in _split_entries(lines):
+        school, rest = _pick(e["head"], SCHOOL_MARKERS)
+        if school is None and rest:
+            school, rest = rest[0], rest[1:]
+        degree, major, gpa = "", "", ""
+        for line in rest + e["bullets"]:
+            g = GPA_RE.search(line)
+            if g is not None:
+                gpa = g.group(1).strip()
+            elif MAJOR_PREFIX.match(line) and not major:
+                major = MAJOR_PREFIX.sub("", line)
+            elif not degree:
+                degree = line
+        out.append({"degree": degree, "major": major, "school": school or "",
+                    "from": e["from"], "to": e["to"], "gpa": gpa})
+    return out
+
+
+def _certifications(lines: list) -> list:
+    out = []
+    for e in _split_entries(lines):
+        texts = e["head"] + e["bullets"]
+        urls = find_urls(" ".join(texts))
+        names = [t for t in (URL_RE.sub("", t).strip() for t in texts) if t]
+        out.append({"name": names[0] if names else "", "issueDate": e["from"],
+                    "credentialUrl": urls[0] if urls else ""})
+    return [c for c in out if c["name"]]
+
+
+def _projects(lines: list) -> list:
+    out = []
+    for e in _split_entries(lines):
+        project = {"name": "", "description": "", "role": "", "from": e["from"], "to": e["to"],
+                   "techStack": [], "url": ""}
+        other = []
+        for line in e["head"] + e["bullets"]:
+            if URL_RE.fullmatch(line):
+                continue
+            if ROLE_PREFIX.match(line):
+                project["role"] = ROLE_PREFIX.sub("", line)
+            elif TECH_PREFIX.match(line):
+                project["techStack"] = split_list(TECH_PREFIX.sub("", line))
+            elif DESC_PREFIX.match(line):
+                project["description"] = DESC_PREFIX.sub("", line)
+            elif not project["name"]:
+                project["name"] = line
+            else:
+                other.append(line)
+        urls = find_urls(" ".join(e["head"] + e["bullets"]))
+        project["url"] = urls[0] if urls else ""
+        if not project["description"] and other:
+            project["description"] = " ".join(other)
+        out.append(project)
+    return [p for p in out if p["name"]]
+
+
+def split_list(value: str) -> list:
+    return [s.strip() for s in LIST_SPLIT_RE.split(value) if s.strip()]
+
+
+def _named_levels(lines: list) -> list:
+    """Skill / language lines: "Python, SQL" or "Tiếng Anh - IELTS 6.5" -> [{"name", "level"}]."""
+    out = []
+    for line in lines:
+        line = BULLET_RE.sub("", line).strip()
+        if not line:
+            continue
+        parts = LEVEL_SPLIT_RE.split(line, maxsplit=1)
+        if len(parts) == 2 and parts[1] and len(parts[1]) <= 25 and "," not in parts[1]:
+            out.append({"name": parts[0], "level": parts[1]})
+            continue
+        out.extend({"name": item, "level": ""} for item in split_list(line))
+    return out
+
+
+def _location(address: str) -> dict:
+    parts = [p.strip() for p in address.split(",") if p.strip()]
+    loc = {"city": "", "state": "", "country": ""}
+    if parts and parts[-1].casefold() in ("việt nam", "vietnam", "viet nam"):
+        loc["country"] = parts.pop()
+    if parts:
+        loc["city"] = parts[-1]
+    return loc
+
+
+def _header(lines: list, out: dict, urls: list):
+    plain = []
+    for line in lines:
+        m = LABEL_RE.match(line)
+        key = _LABEL_KEYS.get(m.group(1).strip().casefold()) if m else None
+        if m is None:
+            plain.append(line)
+            continue
+        value = m.group(2).strip()
+        if not value or key is None:
+            continue
+        if key == "phone":
+            phones = find_phones(value)
+            out.setdefault("phone", phones[0] if phones else value)
+        elif key == "email":
+            emails = find_emails(value)
+            if emails:
+                out.setdefault("email", emails[0])
+        elif key == "address":
+            out.setdefault("location", _location(value))
+        elif key == "url":
+            urls.extend(u for u in (find_urls(value) or [value]) if u not in urls)
+        else:
+            out.setdefault(key, value)
+    # dòng không nhãn đầu tiên là họ tên, dòng tiếp theo là chức danh
+    plain = [l for l in plain if not EMAIL_RE.search(l) and not PHONE_RE.search(l) and not URL_RE.search(l)]
+    if plain and "fullname" not in out and not re.search(r"\d", plain[0]) and len(plain[0].split()) <= 6:
+        out["fullname"] = plain.pop(0)
+    if plain and "fullname" in out and len(plain[0]) <= 80:
+        out["headline"] = plain[0]
+
+
+def extract_rules(text: str) -> dict:
+    """
+    Deterministic extraction: returns a partial Cv dict holding only the fields found
+    (feed it to parser.validate_and_normalize for the full schema).
+    """
+    sections = split_sections(text)
+    out = {}
+    urls = []
+    credential_urls = set()
+    for key, _, lines in sections:
+        if key in ("header", "info"):
+            _header(lines, out, urls)
+        elif key == "summary" and lines and "summary" not in out:
+            out["summary"] = " ".join(lines)
+        elif key == "experiences":
+            out.setdefault("experiences", []).extend(_experiences(lines))
+        elif key == "education":
+            out.setdefault("education", []).extend(_education(lines))
+        elif key == "certifications":
+            certs = _certifications(lines)
+            credential_urls.update(c["credentialUrl"] for c in certs)
+            out.setdefault("certifications", []).extend(certs)
+        elif key == "projects":
+            out.setdefault("projects", []).extend(_projects(lines))
+        elif key == "skills":
+            out.setdefault("skills", []).extend(_named_levels(lines))
+        elif key == "languages":
+            out.setdefault("languages", []).extend(_named_levels(lines))
+
+    # email / phone không có nhãn: lấy lần xuất hiện đầu tiên trong cả văn bản
+    if "email" not in out:
+        emails = find_emails(text)
+        if emails:
+            out["email"] = emails[0]
+    if "phone" not in out:
+        phones = find_phones(text)
+        if phones:
+            out["phone"] = phones[0]
+    project_urls = {p["url"] for p in out.get("projects", [])}
+    for url in find_urls(text):
+        if url not in urls and url not in credential_urls and url not in project_urls:
+            urls.append(url)
+    urls = [u for u in urls if u not in credential_urls and u not in project_urls]
+    if urls:
+        out["portfolio"] = [{"mediaType": "", "url": u, "description": ""} for u in urls]
+    return {k: v for k, v in out.items() if v}
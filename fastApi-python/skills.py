@@ -0,0 +1,303 @@
+# skills.py
+# Quét skill theo từ điển, không gọi LLM: automaton Aho-Corasick dựng một lần (mỗi process) từ taxonomy
+# (data/skills.json hoặc CSV: tên chuẩn, nhóm, alias, biến thể tiếng Việt) rồi chạy một lượt qua văn bản
+# của extract_text_from_pdf. Văn bản và mẫu cùng được "gấp" từng ký tự (chữ thường, bỏ dấu tiếng Việt,
+# đ -> d, khoảng trắng liên tiếp coi là một) nên "Quản lý dự án", "quan ly du an", "QUẢN LÝ  DỰ ÁN" đều khớp,
+# và vị trí trả về là vị trí trong văn bản gốc.
+import csv
+import json
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from typing import NamedTuple
+
+try:
+    import config
+except Exception:
+    config = None
+
+
+def _config_value(name: str, default):
+    if config is not None:
+        return getattr(config, name, default)
+    return os.environ.get(name, default)
+
+
+SKILL_TAXONOMY = _config_value("SKILL_TAXONOMY", "data/skills.json")
+# ký tự nối hai từ: "R&D", "C&B" không phải skill "R" / "C"
+_JOINERS = "&_"
+_SPACE_RE = re.compile(r"\s+")
+_RADIX = 0x110000  # số mã Unicode: khóa cạnh = state * _RADIX + ord(ký tự)
+
+
+class SkillHit(NamedTuple):
+    name: str
+    category: str
+    start: int
+    end: int
+
+
+class _FoldTable(dict):
+    """str.translate table folding one char to exactly one char, so positions are preserved."""
+
+    def __missing__(self, code: int):
+        ch = chr(code)
+        if ch.isspace():
+            folded = " "
+        else:
+            lower = ch.lower()
+            folded = unicodedata.normalize("NFD", lower if len(lower) == 1 else ch)[0]
+            if folded == "đ":
+                folded = "d"
+        self[code] = folded
+        return folded
+
+
+_FOLD = _FoldTable()
+
+
+def fold(text: str) -> str:
+    """Case / diacritics-insensitive form of `text`, same length (one char per char)."""
+    return text.translate(_FOLD)
+
+
+def fold_key(value: str) -> str:
+    """Folded form of a whole skill string: whitespace runs collapsed, trimmed."""
+    return _SPACE_RE.sub(" ", fold(value)).strip()
+
+
+def _boundary(ch: str) -> bool:
+    return not (ch.isalnum() or ch in _JOINERS)
+
+
+class SkillScanner:
+    """
+    Aho-Corasick automaton over folded skill names / aliases. `entries`: dicts with "name",
+    "category", optional "aliases" (matched ignoring case and diacritics) and "exact" (forms matched
+    only with this exact spelling, e.g. "Go", "AI", "PR" that are also ordinary words).
+    """
+
+    def __init__(self, entries):
+        self.entries = []  # id -> (name, category)
+        self._lookup = {}  # folded form -> id (canonical() của cả chuỗi)
+        # một dict phẳng cho mọi cạnh (state * _RADIX + mã ký tự -> state) thay vì một dict mỗi state:
+        # taxonomy vài chục nghìn mục là vài trăm nghìn state, dict riêng từng state tốn gấp mấy lần RAM
+        self._next = {}
+        self._fail = array("l", [0])
+        self._out = {}  # state -> ((length, id, exact form or None), ...)
+        patterns = {}
+        for entry in entries:
+            name = str(entry.get("name") or "").strip()
+            if not name:
+                continue
+            entry_id = len(self.entries)
+            self.entries.append((name, str(entry.get("category") or "")))
+            exact = [str(e).strip() for e in entry.get("exact") or () if str(e).strip()]
+            forms = [name] + [str(a) for a in entry.get("aliases") or ()]
+            for form, exact_form in [(f, None) for f in forms if f not in exact] + [(e, e) for e in exact]:
+                key = fold_key(form)
+                if not key:
+                    continue
+                self._lookup.setdefault(key, entry_id)
+                # alias trùng nhau giữa hai skill: skill khai báo trước thắng
+                patterns.setdefault((key, exact_form and _SPACE_RE.sub(" ", exact_form)), entry_id)
+        # cạnh tới mỗi state (state cha, mã ký tự) và độ sâu: mảng gọn, chỉ dùng lúc dựng
+        parent, codes, depth = array("l", [0]), array("l", [0]), array("l", [0])
+        for (key, exact_form), entry_id in patterns.items():
+            state = 0
+            for ch in key:
+                edge = state * _RADIX + ord(ch)
+                nxt = self._next.get(edge)
+                if nxt is None:
+                    nxt = len(parent)
+                    self._next[edge] = nxt
+                    parent.append(state)
+                    codes.append(ord(ch))
+                    depth.append(depth[state] + 1)
+                state = nxt
+            self._out[state] = self._out.get(state, ()) + ((len(key), entry_id, exact_form),)
+        self._build(parent, codes, depth)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _build(self, parent: array, codes: array, depth: array):
+        edges, out = self._next, self._out
+        fail = self._fail = array("l", bytes(len(parent) * array("l").itemsize))
+        # duyệt theo độ sâu tăng dần (BFS): fail của state cha luôn có trước
+        for state in sorted(range(1, len(parent)), key=depth.__getitem__):
+            f, code = parent[state], codes[state]
+            if not f:
+                continue
+            f = fail[f]
+            while f and f * _RADIX + code not in edges:
+                f = fail[f]
+            fail[state] = edges.get(f * _RADIX + code, 0)
+            # output của hậu tố dài nhất cũng kết thúc ở đây ("spring boot" chứa "boot")
+            if fail[state] in out:
+                out[state] = out.get(state, ()) + out[fail[state]]
+
+    def canonical(self, value: str):
+        """(name, category) of the skill a whole string names (any alias / case / accents), or None."""
+        entry_id = self._lookup.get(fold_key(value)) if isinstance(value, str) else None
+        return None if entry_id is None else self.entries[entry_id]
+
+    def scan(self, text: str) -> list:
+        """Non-overlapping skill mentions in `text`, leftmost-longest, in text order."""
+        if not text:
+            return []
+        folded = fold(text)
+        edges, fail, out = self._next, self._fail, self._out
+        consumed = []  # vị trí (trong văn bản gốc) của từng ký tự đã đưa vào automaton
+        candidates = []
+        state = 0
+        previous = ""
+        for i, ch in enumerate(folded):
+            if ch == " " and previous == " ":
+                continue
+            previous = ch
+            consumed.append(i)
+            code = ord(ch)
+            nxt = edges.get(state * _RADIX + code)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = edges.get(state * _RADIX + code)
+            state = nxt or 0
+            if state not in out:
+                continue
+            end = i + 1
+            if end < len(folded) and not _boundary(folded[end]):
+                continue
+            for length, entry_id, exact in out[state]:
+                start = consumed[len(consumed) - length]
+                if start and not _boundary(folded[start - 1]):
+                    continue
+                if exact is not None and _SPACE_RE.sub(" ", text[start:end]) != exact:
+                    continue
+                candidates.append((start, -end, entry_id))
+        hits = []
+        last_end = 0
+        for start, neg_end, entry_id in sorted(candidates):
+            if start >= last_end:
+                name, category = self.entries[entry_id]
+                hits.append(SkillHit(name, category, start, -neg_end))
+                last_end = -neg_end
+        return hits
+
+    def names(self, text: str) -> list:
+        """Distinct canonical names mentioned in `text`, in order of first mention."""
+        return list(dict.fromkeys(hit.name for hit in self.scan(text)))
+
+
+def load_taxonomy(path: str) -> list:
+    """
+    Taxonomy entries from JSON ({"skills": [{"name", "category", "aliases", "exact"}]} or a bare list)
+    or CSV / TSV with columns name, category, aliases, exact (lists separated by "|").
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8", newline="") as f:
+        if ext == ".json":
+            data = json.load(f)
+            return data.get("skills", []) if isinstance(data, dict) else data
+        reader = csv.DictReader(f, delimiter="\t" if ext == ".tsv" else ",")
+        return [
+            {"name": row.get("name"), "category": row.get("category"),
+             "aliases": [a for a in (row.get("aliases") or "").split("|") if a.strip()],
+             "exact": [e for e in (row.get("exact") or "").split("|") if e.strip()]}
+            for row in reader
+        ]
+
+
+_scanner = None
+_scanner_lock = threading.Lock()
+
+
+def get_scanner():
+    """Process-wide scanner built from SKILL_TAXONOMY on first use; None when it is unset / missing."""
+    global _scanner
+    if _scanner is None:
+        with _scanner_lock:
+            if _scanner is None:
+                entries = []
+                if SKILL_TAXONOMY and os.path.exists(SKILL_TAXONOMY):
+                    entries = load_taxonomy(SKILL_TAXONOMY)
+                _scanner = SkillScanner(entries)
+    return _scanner if len(_scanner) else None
+
+
+def find_skills(text: str) -> list:
+    """[SkillHit(name, category, start, end)] for `text` (empty without a taxonomy)."""
+    scanner = get_scanner()
+    return scanner.scan(text) if scanner is not None else []
+
+
+def canonical_name(value: str) -> str:
+    """Canonical skill name for `value`, or `value` unchanged when the taxonomy does not know it."""
+    scanner = get_scanner()
+    known = scanner.canonical(value) if scanner is not None else None
+    return known[0] if known else value
+
+
+def _merge_names(values: list, scanner: SkillScanner, found: list) -> list:
+    out, seen = [], set()
+    for value in list(values) + found:
+        known = scanner.canonical(value)
+        name = known[0] if known else value
+        if name.casefold() not in seen:
+            seen.add(name.casefold())
+            out.append(name)
+    return out
+
+
+def fill_skills(cv: dict, text: str, hits: list = None) -> dict:
+    """
+    Canonicalize and dedupe cv["skills"] / projects[].techStack in place, then add the skills found
+    in `text` (and each project's name / description / role) that the LLM left out.
+    """
+    scanner = get_scanner()
+    if scanner is None:
+        return cv
+    hits = scanner.scan(text) if hits is None else hits
+    skills, index = [], {}
+    for item in cv.get("skills") or ():
+        known = scanner.canonical(item.get("name"))
+        if known:
+            item = dict(item, name=known[0], category=item.get("category") or known[1])
+        key = item["name"].casefold()
+        if key in index:
+            # skill lặp lại (vd. "JS" và "JavaScript"): giữ mục đầu, bổ sung level / năm còn trống
+            kept = index[key]
+            for field in ("level", "category", "years"):
+                if not kept.get(field) and item.get(field):
+                    kept[field] = item[field]
+            continue
+        index[key] = item
+        skills.append(item)
+    for hit in hits:
+        if hit.name.casefold() not in index:
+            item = {"name": hit.name, "level": "", "category": hit.category, "years": 0}
+            index[hit.name.casefold()] = item
+            skills.append(item)
+    cv["skills"] = skills
+    for project in cv.get("projects") or ():
+        mentioned = " \n ".join(str(project.get(k) or "") for k in ("name", "description", "role"))
+        project["techStack"] = _merge_names(project.get("techStack") or [], scanner, scanner.names(mentioned))
+    return cv
+
+
+if __name__ == "__main__":
+    # python skills.py file.pdf|file.txt ... : in skill tìm được kèm vị trí (kiểm tra taxonomy)
+    import sys
+
+    for path in sys.argv[1:]:
+        if path.lower().endswith(".txt"):
+            with open(path, encoding="utf-8") as f:
+                content = f.read()
+        else:
+            from parser import extract_text
+            content = extract_text(os.path.splitext(path)[1].lower(), path=path)
+        print(f"== {path}")
+        for hit in find_skills(content):
+            print(f"{hit.start:>6}-{hit.end:<6} {hit.name:<28} {hit.category:<12} {content[hit.start:hit.end]!r}")
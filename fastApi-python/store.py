@@ -0,0 +1,488 @@
+# store.py
+# Lưu trạng thái job + kết quả parse. Mặc định SQLite (WAL: đọc không chặn ghi) thay cho mỗi
+# cv_id một file JSON pretty-print trong data/results:
+#   - index theo cv_id (khóa chính) và content_hash (sha256 của file upload), updated_at cho GC;
+#   - phần metadata (status, error, timings, ...) là JSON gọn, riêng `result` nén zlib:
+#     /status chỉ đọc metadata, không giải nén kết quả;
+#   - get_many / put_many đọc ghi hàng loạt trong một câu lệnh / một transaction;
+#   - bảng sections: văn bản từng mục CV theo content_hash, để lần upload sau (bản sửa của cùng CV)
+#     chỉ gửi các mục thay đổi cho LLM (xem parser.plan_incremental).
+# RESULT_STORE=files giữ cách cũ (file JSON) cho worker Celery chạy ở máy khác: SQLite WAL
+# chỉ dùng được khi mọi process cùng một máy.
+# Dọn dẹp định kỳ (retention): xóa kết quả quá hạn và file upload mồ côi, xem collect_garbage().
+# Chuyển dữ liệu cũ một lần:  python store.py import [--remove]   |   dọn ngay:  python store.py gc
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+try:
+    import config
+except Exception:
+    config = None
+
+
+def _config_value(name: str, default):
+    if config is not None:
+        return getattr(config, name, default)
+    return os.environ.get(name, default)
+
+
+RESULT_STORE = _config_value("RESULT_STORE", "sqlite")
+RESULT_DB = _config_value("RESULT_DB", "data/results.db")
+RESULT_DIR = _config_value("RESULT_DIR", "data/results")
+# giới hạn số tham số của một câu lệnh SQLite (SQLITE_MAX_VARIABLE_NUMBER)
+BULK_CHUNK = 500
+# job chưa xong: không bị xóa khi quá hạn
+ACTIVE_STATUSES = ("pending", "processing")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    cv_id        TEXT PRIMARY KEY,
+    status       TEXT NOT NULL,
+    content_hash TEXT,
+    file_path    TEXT,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL,
+    meta         TEXT NOT NULL,
+    result       BLOB,
+    etag         TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_content_hash ON results (content_hash);
+CREATE INDEX IF NOT EXISTS results_updated_at ON results (updated_at);
+CREATE INDEX IF NOT EXISTS results_status ON results (status);
+CREATE INDEX IF NOT EXISTS results_file_path ON results (file_path);
+CREATE TABLE IF NOT EXISTS sections (
+    content_hash TEXT PRIMARY KEY,
+    updated_at   REAL NOT NULL,
+    body         BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_result(result) -> bytes:
+    return None if result is None else zlib.compress(_dumps(result).encode("utf-8"), 6)
+
+
+def decode_result(blob: bytes):
+    return None if blob is None else json.loads(zlib.decompress(blob))
+
+
+def content_etag(meta: str, blob: bytes) -> str:
+    """Strong ETag of a stored row, computed once at write time."""
+    digest = hashlib.blake2b(meta.encode("utf-8"), digest_size=16)
+    if blob is not None:
+        digest.update(blob)
+    return f'"{digest.hexdigest()}"'
+
+
+def raw_payload(meta: str, blob: bytes, with_result: bool) -> bytes:
+    """The payload as JSON bytes, spliced from the stored JSON without decoding it."""
+    if not with_result or blob is None:
+        return meta.encode("utf-8")
+    return meta.encode("utf-8")[:-1] + b',"result":' + zlib.decompress(blob) + b"}"
+
+
+class SqliteStore:
+    """Status + result rows keyed by cv_id; one connection per thread (and per process after fork)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        # file tạo trước khi có cột etag
+        if "etag" not in {row[1] for row in conn.execute("PRAGMA table_info(results)")}:
+            conn.execute("ALTER TABLE results ADD COLUMN etag TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # connection không dùng được qua fork (worker Celery prefork)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _row(cv_id: str, payload: dict, content_hash: str, now: float) -> tuple:
+        meta = _dumps({k: v for k, v in payload.items() if k != "result"})
+        blob = encode_result(payload.get("result"))
+        return (cv_id, payload.get("status", "unknown"), content_hash, payload.get("file_path") or None,
+                now, now, meta, blob, content_etag(meta, blob))
+
+    _UPSERT = """
+        INSERT INTO results (cv_id, status, content_hash, file_path, created_at, updated_at, meta, result, etag)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (cv_id) DO UPDATE SET
+            status = excluded.status,
+            content_hash = COALESCE(excluded.content_hash, results.content_hash),
+            file_path = excluded.file_path,
+            updated_at = excluded.updated_at,
+            meta = excluded.meta,
+            result = excluded.result,
+            etag = excluded.etag
+    """
+
+    def put(self, cv_id: str, payload: dict, content_hash: str = None):
+        self._conn().execute(self._UPSERT, self._row(cv_id, payload, content_hash, time.time()))
+
+    def put_many(self, items):
+        """items: iterable of (cv_id, payload) or (cv_id, payload, content_hash); one transaction."""
+        now = time.time()
+        rows = [self._row(it[0], it[1], it[2] if len(it) > 2 else None, now) for it in items]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(self._UPSERT, rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _payload(meta: str, blob: bytes, with_result: bool) -> dict:
+        payload = json.loads(meta)
+        if with_result and blob is not None:
+            payload["result"] = decode_result(blob)
+        return payload
+
+    def get(self, cv_id: str, with_result: bool = True):
+        column = "result" if with_result else "NULL"
+        row = self._conn().execute(f"SELECT meta, {column} FROM results WHERE cv_id = ?", (cv_id,)).fetchone()
+        return None if row is None else self._payload(row[0], row[1], with_result)
+
+    def get_many(self, cv_ids, with_result: bool = True) -> dict:
+        """{cv_id: payload} for the ids that exist."""
+        cv_ids = list(dict.fromkeys(cv_ids))
+        column = "result" if with_result else "NULL"
+        out = {}
+        conn = self._conn()
+        for i in range(0, len(cv_ids), BULK_CHUNK):
+            chunk = cv_ids[i:i + BULK_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for cv_id, meta, blob in conn.execute(
+                    f"SELECT cv_id, meta, {column} FROM results WHERE cv_id IN ({marks})", chunk):
+                out[cv_id] = self._payload(meta, blob, with_result)
+        return out
+
+    def etag(self, cv_id: str):
+        row = self._conn().execute("SELECT etag FROM results WHERE cv_id = ?", (cv_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def get_raw(self, cv_id: str, with_result: bool = True):
+        """(status, payload JSON bytes, etag) without decoding the stored JSON, or None."""
+        column = "result" if with_result else "NULL"
+        row = self._conn().execute(
+            f"SELECT status, meta, {column}, etag FROM results WHERE cv_id = ?", (cv_id,)).fetchone()
+        if row is None:
+            return None
+        status, meta, blob, etag = row
+        return status, raw_payload(meta, blob, with_result), etag or content_etag(meta, blob)
+
+    def get_many_raw(self, cv_ids, with_result: bool = True) -> dict:
+        """{cv_id: (status, payload JSON bytes, etag)}; the result is only included for done rows."""
+        cv_ids = list(dict.fromkeys(cv_ids))
+        column = "CASE WHEN status = 'done' THEN result END" if with_result else "NULL"
+        out = {}
+        conn = self._conn()
+        for i in range(0, len(cv_ids), BULK_CHUNK):
+            chunk = cv_ids[i:i + BULK_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for cv_id, status, meta, blob, etag in conn.execute(
+                    f"SELECT cv_id, status, meta, {column}, etag FROM results WHERE cv_id IN ({marks})", chunk):
+                out[cv_id] = (status, raw_payload(meta, blob, with_result), etag or content_etag(meta, blob))
+        return out
+
+    def etags(self, cv_ids) -> dict:
+        cv_ids = list(dict.fromkeys(cv_ids))
+        out = {}
+        conn = self._conn()
+        for i in range(0, len(cv_ids), BULK_CHUNK):
+            chunk = cv_ids[i:i + BULK_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            out.update(conn.execute(f"SELECT cv_id, etag FROM results WHERE cv_id IN ({marks})", chunk))
+        return out
+
+    def find_by_hash(self, content_hash: str, status: str = "done"):
+        """Most recent payload for an uploaded file's sha256, or None."""
+        row = self._conn().execute(
+            "SELECT meta, result FROM results WHERE content_hash = ? AND status = ? "
+            "ORDER BY updated_at DESC LIMIT 1", (content_hash, status)).fetchone()
+        return None if row is None else self._payload(row[0], row[1], True)
+
+    def iter_payloads(self, status: str = None, batch: int = BULK_CHUNK):
+        """Yield lists of (cv_id, payload) in cv_id order, `batch` rows at a time."""
+        last = ""
+        conn = self._conn()
+        where = "cv_id > ?" + (" AND status = ?" if status else "")
+        while True:
+            params = (last, status, batch) if status else (last, batch)
+            rows = conn.execute(f"SELECT cv_id, meta, result FROM results WHERE {where} "
+                                f"ORDER BY cv_id LIMIT ?", params).fetchall()
+            if not rows:
+                return
+            yield [(cv_id, self._payload(meta, blob, True)) for cv_id, meta, blob in rows]
+            last = rows[-1][0]
+
+    def content_hash(self, cv_id: str):
+        row = self._conn().execute("SELECT content_hash FROM results WHERE cv_id = ?", (cv_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def put_sections(self, content_hash: str, sections: dict):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sections (content_hash, updated_at, body) VALUES (?, ?, ?)",
+            (content_hash, time.time(), encode_result(sections)))
+
+    def get_sections(self, content_hash: str):
+        row = self._conn().execute("SELECT body FROM sections WHERE content_hash = ?", (content_hash,)).fetchone()
+        return None if row is None else decode_result(row[0])
+
+    def delete_expired(self, ttl_seconds: float) -> int:
+        """Delete finished rows not updated for ttl_seconds; jobs still pending/processing are kept."""
+        marks = ",".join("?" * len(ACTIVE_STATUSES))
+        conn = self._conn()
+        cur = conn.execute(
+            f"DELETE FROM results WHERE updated_at < ? AND status NOT IN ({marks})",
+            (time.time() - ttl_seconds, *ACTIVE_STATUSES))
+        # văn bản các mục không còn kết quả nào dùng
+        conn.execute("DELETE FROM sections WHERE content_hash NOT IN "
+                     "(SELECT content_hash FROM results WHERE content_hash IS NOT NULL)")
+        return cur.rowcount
+
+    def referenced(self, paths) -> set:
+        """The subset of `paths` that some stored row still points to (file_path, compared verbatim)."""
+        paths = list(paths)
+        out = set()
+        conn = self._conn()
+        for i in range(0, len(paths), BULK_CHUNK):
+            chunk = paths[i:i + BULK_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            out.update(r[0] for r in conn.execute(
+                f"SELECT DISTINCT file_path FROM results WHERE file_path IN ({marks})", chunk))
+        return out
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class FileStore:
+    """The original layout: one pretty-printed JSON file per cv_id in `directory`."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, cv_id: str) -> str:
+        return os.path.join(self.directory, f"{cv_id}.json")
+
+    def put(self, cv_id: str, payload: dict, content_hash: str = None):
+        path = self._path(cv_id)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        # ghi atomic để /status không đọc phải file đang ghi dở
+        os.replace(tmp, path)
+
+    def put_many(self, items):
+        for it in items:
+            self.put(it[0], it[1])
+
+    def get(self, cv_id: str, with_result: bool = True):
+        path = self._path(cv_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        if not with_result:
+            payload.pop("result", None)
+        return payload
+
+    def get_many(self, cv_ids, with_result: bool = True) -> dict:
+        out = {}
+        for cv_id in dict.fromkeys(cv_ids):
+            payload = self.get(cv_id, with_result)
+            if payload is not None:
+                out[cv_id] = payload
+        return out
+
+    def etag(self, cv_id: str):
+        try:
+            st = os.stat(self._path(cv_id))
+        except OSError:
+            return None
+        return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+    def get_raw(self, cv_id: str, with_result: bool = True):
+        etag = self.etag(cv_id)
+        payload = self.get(cv_id, with_result)
+        if payload is None:
+            return None
+        return payload.get("status", "unknown"), _dumps(payload).encode("utf-8"), etag
+
+    def get_many_raw(self, cv_ids, with_result: bool = True) -> dict:
+        out = {}
+        for cv_id in dict.fromkeys(cv_ids):
+            raw = self.get_raw(cv_id, with_result)
+            if raw is not None:
+                if raw[0] != "done" and with_result:
+                    raw = self.get_raw(cv_id, False)
+                out[cv_id] = raw
+        return out
+
+    def etags(self, cv_ids) -> dict:
+        return {cv_id: tag for cv_id in dict.fromkeys(cv_ids) if (tag := self.etag(cv_id)) is not None}
+
+    def find_by_hash(self, content_hash: str, status: str = "done"):
+        return None  # không có index: cache.py vẫn phục vụ theo hash
+
+    def _ids(self) -> list:
+        return sorted(f[:-5] for f in os.listdir(self.directory) if f.endswith(".json"))
+
+    def iter_payloads(self, status: str = None, batch: int = BULK_CHUNK):
+        ids = self._ids()
+        for i in range(0, len(ids), batch):
+            rows = [(cv_id, self.get(cv_id)) for cv_id in ids[i:i + batch]]
+            yield [(cv_id, p) for cv_id, p in rows if p is not None and (not status or p.get("status") == status)]
+
+    def delete_expired(self, ttl_seconds: float) -> int:
+        cutoff = time.time() - ttl_seconds
+        removed = 0
+        for cv_id in self._ids():
+            path = self._path(cv_id)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                payload = self.get(cv_id, with_result=False) or {}
+                if payload.get("status") in ACTIVE_STATUSES:
+                    continue
+                os.remove(path)
+                removed += 1
+            except (OSError, ValueError):
+                continue
+        return removed
+
+    # không lưu content_hash: /upload?previous=... luôn parse lại toàn bộ
+    def content_hash(self, cv_id: str):
+        return None
+
+    def put_sections(self, content_hash: str, sections: dict):
+        pass
+
+    def get_sections(self, content_hash: str):
+        return None
+
+    def referenced(self, paths) -> set:
+        paths = set(paths)
+        out = set()
+        for batch in self.iter_payloads():
+            out.update(p["file_path"] for _, p in batch if p.get("file_path") in paths)
+        return out
+
+    def count(self) -> int:
+        return len(self._ids())
+
+
+def make_store(backend: str = None):
+    backend = backend or RESULT_STORE
+    if backend == "sqlite":
+        return SqliteStore(RESULT_DB)
+    if backend == "files":
+        return FileStore(RESULT_DIR)
+    raise ValueError(f"Unknown RESULT_STORE: {backend}")
+
+
+def import_json_results(store, directory: str = RESULT_DIR, remove: bool = False, batch: int = BULK_CHUNK) -> dict:
+    """One-time migration of data/results/*.json into `store`; existing cv_ids are overwritten."""
+    names = sorted(f for f in os.listdir(directory) if f.endswith(".json")) if os.path.isdir(directory) else []
+    stats = {"files": len(names), "imported": 0, "skipped": 0}
+    for i in range(0, len(names), batch):
+        items, paths = [], []
+        for name in names[i:i + batch]:
+            path = os.path.join(directory, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                stats["skipped"] += 1
+                continue
+            # file rất cũ không có cv_id (chỉ job_id): /results cần cv_id để client ghép kết quả
+            payload.setdefault("cv_id", name[:-5])
+            items.append((payload["cv_id"], payload))
+            paths.append(path)
+        store.put_many(items)
+        stats["imported"] += len(items)
+        if remove:
+            for path in paths:
+                os.remove(path)
+    return stats
+
+
+def remove_orphan_uploads(store, upload_dir: str, min_age_seconds: float) -> int:
+    """
+    Delete files in upload_dir older than min_age_seconds that no stored result points to
+    (a sync upload that crashed before its cleanup, an interrupted batch, the upload of an
+    expired result, ...).
+    """
+    if not os.path.isdir(upload_dir):
+        return 0
+    cutoff = time.time() - min_age_seconds
+    candidates = []
+    with os.scandir(upload_dir) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    candidates.append(entry.path)
+            except OSError:
+                continue
+    # file_path lưu đúng chuỗi mà API đã ghi (os.path.join(UPLOAD_DIR, ...)), có thể tương đối hoặc tuyệt đối
+    keys = {path: (path, os.path.abspath(path)) for path in candidates}
+    keep = store.referenced({k for pair in keys.values() for k in pair})
+    removed = 0
+    for path, pair in keys.items():
+        if keep.intersection(pair):
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def collect_garbage(store, upload_dir: str, result_ttl_seconds: float, upload_min_age_seconds: float) -> dict:
+    """Retention pass: expired results (ttl <= 0 keeps them forever) and orphaned uploads."""
+    t0 = time.perf_counter()
+    stats = {"results": 0, "uploads": 0}
+    if result_ttl_seconds and result_ttl_seconds > 0:
+        stats["results"] = store.delete_expired(result_ttl_seconds)
+    if upload_min_age_seconds and upload_min_age_seconds > 0:
+        stats["uploads"] = remove_orphan_uploads(store, upload_dir, upload_min_age_seconds)
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "import":
+        print(import_json_results(make_store(), remove="--remove" in sys.argv[2:]))
+    elif command == "gc":
+        print(collect_garbage(make_store(), _config_value("UPLOAD_DIR", "data/uploads"),
+                              float(_config_value("RESULT_TTL_SECONDS", 0)),
+                              float(_config_value("UPLOAD_ORPHAN_SECONDS", 0))))
+    else:
+        print("usage: python store.py import [--remove] | gc")
+        sys.exit(2)
@@ -0,0 +1,72 @@
+# tasks.py
+# Celery worker cho JOB_BACKEND=celery. Chạy tách khỏi API:
+#   celery -A tasks worker --concurrency=4 --loglevel=info
+import os
+import time
+
+from celery import Celery
+from celery.signals import worker_process_init
+
+import config
+from parser import parse_document, warm_up
+from skills import get_scanner
+from cache import ResultCache
+from jobs import error_payload, read_previous, save_sections, write_status
+
+celery_app = Celery("jobconnect_parser", broker=config.REDIS_URL)
+# mỗi worker chỉ giữ 1 job chưa ack: job parse dài, không nên prefetch nhiều
+celery_app.conf.worker_prefetch_multiplier = 1
+celery_app.conf.task_acks_late = True
+
+result_cache = ResultCache(
+    config.CACHE_DIR,
+    max_items=config.CACHE_MEMORY_ITEMS,
+    disk_max_bytes=config.CACHE_DISK_MAX_BYTES,
+    ttl_seconds=config.CACHE_TTL_SECONDS,
+)
+
+
+@worker_process_init.connect
+def warm_worker(**_):
+    # nạp PyMuPDF / Pillow / model OCR và automaton skill khi process worker khởi động, không đợi job đầu tiên
+    warm_up()
+    get_scanner()
+
+
+@celery_app.task(name="parser.parse_cv")
+def parse_cv(cv_id: str, file_path: str, cache_key: str, mode: str = "full", deadline_at: float = None,
+             content_hash: str = None, previous: str = None):
+    """
+    Background parse of an upload (jobs.CeleryJobQueue.submit). `previous` is the cv_id of the
+    earlier version of this resume: an incremental re-parse, like app.run_incremental_parse.
+    """
+    write_status(cv_id, {"cv_id": cv_id, "status": "processing", "file_path": file_path}, content_hash)
+    try:
+        timings = {}
+        previous_data = None
+        if previous is not None:
+            previous_data = read_previous(previous)
+            if previous_data is None:
+                raise LookupError(f"Previous result not found: {previous}")
+        # bản sửa: kết quả phụ thuộc bản trước nên không dùng cache theo hash file
+        parsed = result_cache.get(cache_key) if previous_data is None else None
+        if parsed is None:
+            # deadline_at là time.time(): quy về monotonic của process này; job đã hết hạn trong hàng đợi
+            # dừng ngay ở bước đầu tiên với status "timeout"
+            deadline = None if deadline_at is None else time.monotonic() + deadline_at - time.time()
+            outcome = parse_document(file_path, mode, timings, deadline, previous_data)
+            parsed = outcome["result"]
+            if previous_data is None:
+                result_cache.set(cache_key, parsed)
+            if content_hash:
+                # văn bản từng mục: cv_id này làm được `previous` cho lần upload sau
+                save_sections(content_hash, outcome["sections"])
+        write_status(cv_id, {"cv_id": cv_id, "status": "done", "file_path": file_path, "result": parsed,
+                             "timings": timings}, content_hash)
+    except Exception as e:
+        write_status(cv_id, error_payload(cv_id, e))
+    finally:
+        try:
+            os.remove(file_path)
+        except Exception:
+            pass
@@ -0,0 +1,36 @@
+# conftest.py
+# Môi trường test: store / cache / index / upload trong thư mục tạm, Gemini mock.
+# Đặt biến môi trường trước khi import config (đọc lúc import), rồi chuyển cwd sang thư mục tạm để các
+# đường dẫn tương đối ("data/uploads", "data/results") không chạm vào dữ liệu thật của service.
+import os
+import tempfile
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix="cv-parser-tests-")
+
+os.environ.update(
+    MOCK_GEMINI="1",
+    RESULT_DB=os.path.join(TMP_DIR, "results.db"),
+    RESULT_DIR=os.path.join(TMP_DIR, "results"),
+    CACHE_DIR=os.path.join(TMP_DIR, "cache"),
+    MATCH_INDEX_DIR=os.path.join(TMP_DIR, "match"),
+    SKILL_TAXONOMY=os.path.join(SERVICE_DIR, "data", "skills.json"),
+    UPLOAD_ORPHAN_SECONDS="0",
+)
+os.chdir(TMP_DIR)
+
+# PDF nhỏ nhất qua được kiểm tra magic bytes của ingest.py (handler của test không parse nó)
+TINY_PDF = b"%PDF-1.4\n1 0 obj <<>> endobj\ntrailer <<>>\n%%EOF\n"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Fresh SQLite result store behind jobs.get_store()."""
+    import jobs
+    import store as result_store
+
+    db = result_store.SqliteStore(str(tmp_path / "results.db"))
+    monkeypatch.setattr(jobs, "_store", db)
+    return db
@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import admission as admission_module
+from admission import AdmissionController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission_module.time, "monotonic", clock)
+    return clock
+
+
+def rejected(controller, nbytes, jobs=1) -> HTTPException:
+    with pytest.raises(HTTPException) as e:
+        controller.admit(nbytes, jobs)
+    assert e.value.status_code == 429
+    return e.value
+
+
+def test_admits_oversized_request_when_idle():
+    controller = AdmissionController(max_bytes=100, max_jobs=1)
+    ticket = controller.admit(500)
+    # một upload lớn hơn cả ngân sách vẫn chạy được khi không có gì khác đang giữ
+    assert (controller.bytes, controller.jobs) == (500, 1)
+    ticket.release()
+    assert (controller.bytes, controller.jobs) == (0, 0)
+
+
+def test_bytes_rejection():
+    controller = AdmissionController(max_bytes=100, max_jobs=10)
+    controller.admit(60)
+    e = rejected(controller, 50)
+    assert e.detail == "Too many uploads in flight"
+    assert controller.rejected == {"bytes": 1}
+    assert (controller.bytes, controller.jobs) == (60, 1)
+
+
+def test_jobs_rejection():
+    controller = AdmissionController(max_bytes=0, max_jobs=2)
+    controller.admit(10)
+    controller.admit(10)
+    e = rejected(controller, 10)
+    assert e.detail == "Too many jobs queued"
+    assert controller.rejected == {"jobs": 1}
+
+
+def test_release_is_idempotent_and_resize_after_release_is_noop():
+    controller = AdmissionController(max_bytes=100, max_jobs=10)
+    ticket = controller.admit(40)
+    other = controller.admit(10)
+    ticket.release()
+    ticket.release()
+    assert (controller.bytes, controller.jobs) == (10, 1)
+    # batch: vé được chỉnh sau khi đọc xong body; vé đã trả thì không được đụng tới bộ đếm
+    ticket.resize(nbytes=90, jobs=5)
+    assert (controller.bytes, controller.jobs) == (10, 1)
+    other.resize(nbytes=30, jobs=3)
+    assert (controller.bytes, controller.jobs) == (30, 3)
+    other.release()
+    assert (controller.bytes, controller.jobs) == (0, 0)
+    assert len(controller._drained) == 2
+
+
+def test_retry_after_from_drain_rate(clock):
+    controller = AdmissionController(max_bytes=100, max_jobs=10, window_seconds=60)
+    done = controller.admit(100)
+    clock.now += 10
+    done.release()
+    clock.now += 10
+    controller.admit(80)
+    # 100 byte giải phóng trong 10s gần nhất = 10 B/s; vượt 80 + 100 - 100 = 80 byte -> 8s
+    assert controller.drain_rate() == (10.0, 0.1)
+    assert rejected(controller, 100).headers["Retry-After"] == "8"
+
+
+def test_retry_after_clamped(clock):
+    controller = AdmissionController(max_bytes=100, max_jobs=10, window_seconds=60,
+                                     min_retry_after=2, max_retry_after=30)
+    held = controller.admit(100)
+    # chưa có gì được giải phóng: không đo được tốc độ, trả mức tối đa
+    assert rejected(controller, 1).headers["Retry-After"] == "30"
+    clock.now += 1
+    held.release()
+    controller.admit(100)
+    # 100 B/s, vượt 1 byte -> 0.01s, kẹp lên min_retry_after
+    assert rejected(controller, 1).headers["Retry-After"] == "2"
+    # tốc độ cũ hơn cửa sổ bị bỏ: lại về mức tối đa
+    clock.now += 61
+    assert rejected(controller, 1).headers["Retry-After"] == "30"
+
+
+def test_upload_rejected_before_body_is_read(monkeypatch):
+    import app
+
+    controller = AdmissionController(max_bytes=1000, max_jobs=10)
+    monkeypatch.setattr(app, "admission", controller)
+    controller.admit(10)
+    sent = []
+
+    async def body():
+        sent.append(True)
+        yield b"x" * 5000
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as c:
+            return await c.post("/upload", content=body(), headers={
+                "Content-Length": "5000", "Content-Type": "multipart/form-data; boundary=x"})
+
+    r = asyncio.run(main())
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) >= 1
+    assert controller.rejected == {"bytes": 1}
+    assert not sent
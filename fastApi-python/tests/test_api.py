@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+import parser
+from handoff import release_source
+
+from jobs import InProcessJobQueue
+from tests.conftest import TINY_PDF
+from tests.test_jobs import wait_status
+
+
+@pytest.fixture
+def app_module(store, tmp_path, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "UPLOAD_DIR", str(tmp_path))
+    return app
+
+
+@asynccontextmanager
+async def client(app, handler, maxsize=4, concurrency=1):
+    """ASGI client with an InProcessJobQueue running `handler` as app.state.jobs (no pool, no warm-up)."""
+    async def run(job):
+        try:
+            return await handler(job)
+        finally:
+            job["admission"].release()
+
+    queue = InProcessJobQueue(run, maxsize=maxsize, concurrency=concurrency)
+    await queue.start()
+    app.app.state.jobs = queue
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as c:
+            yield c
+    finally:
+        await queue.stop()
+        # job chưa chạy (test hàng đợi đầy): trả vé admission
+        while not queue._queue.empty():
+            queue._queue.get_nowait()["admission"].release()
+        app.app.state.jobs = None
+
+
+def upload(c, n=0, **headers):
+    # mỗi file một nội dung khác nhau: không trúng cache kết quả theo hash
+    body = TINY_PDF + f"% {n}\n".encode()
+    return c.post("/upload?wait=false", files={"file": ("cv.pdf", body, "application/pdf")}, headers=headers)
+
+
+def test_background_upload_status_and_result(app_module):
+    async def main():
+        async def handler(job):
+            return {"fullname": "Nguyen Van A", "mode": job["mode"]}
+
+        async with client(app_module, handler) as c:
+            r = await upload(c, 1)
+            assert r.status_code == 200 and r.json()["status"] == "pending"
+            cv_id = r.json()["cv_id"]
+            await wait_status(cv_id, {"done"})
+            status = (await c.get(f"/status/{cv_id}")).json()
+            assert status["status"] == "done" and "result" not in status
+            r = await c.get(f"/result/{cv_id}")
+            assert r.status_code == 200
+            assert r.json()["result"] == {"fullname": "Nguyen Van A", "mode": "full"}
+            etag = r.headers["etag"]
+            r = await c.get(f"/result/{cv_id}", headers={"If-None-Match": etag})
+            assert r.status_code == 304
+
+    asyncio.run(main())
+
+
+def test_pending_result_and_queue_full(app_module):
+    async def main():
+        async with client(app_module, None, maxsize=1, concurrency=0) as c:
+            r = await upload(c, 2)
+            cv_id = r.json()["cv_id"]
+            r = await c.get(f"/result/{cv_id}")
+            assert r.status_code == 200 and r.json() == {"cv_id": cv_id, "status": "pending"}
+            assert (await c.get(f"/status/{cv_id}")).json()["status"] == "pending"
+            # hàng đợi đầy: 429 + Retry-After thay vì chờ hoặc 503
+            r = await upload(c, 3)
+            assert r.status_code == 429
+            assert int(r.headers["retry-after"]) >= 1
+
+    asyncio.run(main())
+
+
+def test_failed_job_status(app_module):
+    async def main():
+        async def handler(job):
+            raise ValueError("broken pdf")
+
+        async with client(app_module, handler) as c:
+            cv_id = (await upload(c, 4)).json()["cv_id"]
+            await wait_status(cv_id, {"error"})
+            status = (await c.get(f"/status/{cv_id}")).json()
+            assert status["status"] == "error" and status["error"] == "broken pdf"
+            r = await c.get(f"/result/{cv_id}")
+            assert r.json() == {"cv_id": cv_id, "status": "error"}
+
+    asyncio.run(main())
+
+
+def test_unknown_cv_id(app_module):
+    async def main():
+        async with client(app_module, None, concurrency=0) as c:
+            r = await c.get("/status/missing")
+            assert r.status_code == 404 and r.json()["status"] == "not_found"
+            assert (await c.get("/result/missing")).status_code == 404
+
+    asyncio.run(main())
+
+
+def sse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def llm_stream(app_module, monkeypatch):
+    """/upload/stream with a fixed extraction report and the LLM stream replaced by `chunks`."""
+    from tests.test_parser import FakeStreamClient
+
+    async def report(source, timings, deadline):
+        release_source(source)
+        return {"text": "Nguyen Van A", "pages": [], "page_count": 1, "truncated": False}
+
+    def use(chunks):
+        monkeypatch.setattr(parser, "MOCK_GEMINI", False)
+        monkeypatch.setattr(parser.llm, "get_client", lambda: FakeStreamClient(chunks))
+
+    monkeypatch.setattr(app_module, "extract_stage_report", report)
+    return use
+
+
+def stream_upload(app, n):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as c:
+            body = TINY_PDF + f"% stream {n}\n".encode()
+            r = await c.post("/upload/stream", files={"file": ("cv.pdf", body, "application/pdf")})
+            events = sse_events(r.text)
+            cv_id = events[0][1]["cv_id"]
+            return events, await c.get(f"/result/{cv_id}"), hashlib.sha256(body).hexdigest()
+
+    return asyncio.run(main())
+
+
+def test_stream_upload_persists_result(app_module, llm_stream):
+    llm_stream(['{"fullname": "Nguyen Van A", ', '"email": "a@b.c"}'])
+    events, result, sha = stream_upload(app_module, 1)
+    assert events[-1][0] == "done"
+    # cv_id của stream dùng được cho /result (và `previous`) như /upload
+    assert result.status_code == 200
+    assert result.json()["result"]["fullname"] == "Nguyen Van A"
+    assert app_module.result_cache.get(app_module.result_cache_key(sha, "full")) is not None
+    # lần hai trúng cache: cũng phải lưu status
+    events, result, _ = stream_upload(app_module, 1)
+    assert events[-1][1]["cached"] is True
+    assert result.status_code == 200 and result.json()["result"]["email"] == "a@b.c"
+
+
+def test_stream_upload_malformed_member_not_cached(app_module, llm_stream):
+    llm_stream(['{"fullname": "A", "skills": [{"name": "Python",}], ', '"email": "a@b.c"}'])
+    events, result, sha = stream_upload(app_module, 2)
+    assert events[-1][0] == "error"
+    assert "not valid JSON" in events[-1][1]["error"]
+    # skills mặc định không được thành kết quả cache cho các lần upload sau
+    assert app_module.result_cache.get(app_module.result_cache_key(sha, "full")) is None
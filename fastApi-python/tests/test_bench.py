@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import parser
+from bench import __main__ as bench_main
+from bench.suite import compare, run_suite
+
+RESULTS = [{"fullname": "Nguyen Van A", "skills": [{"name": "Python"}]}]
+FIXTURES = {"pdfs": [], "images": [], "results": RESULTS, "texts": []}
+
+
+def run(only=("validate_and_normalize",)):
+    return run_suite(FIXTURES, repeat=1, min_sample_seconds=0, only=list(only))
+
+
+def broken(cv):
+    raise KeyError("skills")
+
+
+def test_stage_error_is_not_skipped(monkeypatch):
+    monkeypatch.setattr(parser, "validate_and_normalize", broken)
+    stage = run()["stages"]["validate_and_normalize"]
+    assert stage["status"] == "error" and "KeyError" in stage["reason"]
+
+
+def test_missing_dependency_is_skipped(monkeypatch):
+    def needs_module(cv):
+        raise ImportError("No module named 'pytesseract'")
+
+    monkeypatch.setattr(parser, "validate_and_normalize", needs_module)
+    assert run()["stages"]["validate_and_normalize"]["status"] == "skipped"
+
+
+def test_no_fixtures_is_skipped():
+    assert run(["extract_rules"])["stages"]["extract_rules"] == {
+        "status": "skipped", "reason": "no fixtures", "params": {}}
+
+
+@pytest.mark.parametrize("status", ["error", "skipped"])
+def test_compare_fails_stage_that_was_ok(status):
+    baseline = run()
+    current = {"stages": {"validate_and_normalize": {"status": status, "reason": "x", "params": {}}}}
+    assert compare(current, baseline)[0]["status"] == "failed"
+
+
+def test_compare_skipped_in_both_runs():
+    skipped = {"stages": {"extract_text_from_img": {"status": "skipped", "reason": "x", "params": {}}}}
+    assert compare(skipped, skipped)[0]["status"] == "skipped"
+
+
+def test_main_exits_nonzero_on_broken_stage(monkeypatch, tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(run()), encoding="utf-8")
+    monkeypatch.setattr(bench_main, "load_fixtures", lambda workdir: FIXTURES)
+    # ngưỡng lớn: chỉ kiểm tra bước lỗi, không phụ thuộc nhiễu thời gian
+    args = ["--baseline", str(baseline), "--stage", "validate_and_normalize", "--repeat", "1", "--threshold", "1000"]
+    assert bench_main.main(args) == 0
+    monkeypatch.setattr(parser, "validate_and_normalize", broken)
+    assert bench_main.main(args) == 1
+    # không có baseline: bước lỗi vẫn làm gate fail
+    assert bench_main.main(args[2:] + ["--baseline", str(tmp_path / "missing.json")]) == 1
@@ -0,0 +1,147 @@
+import asyncio
+import inspect
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded
+from jobs import CeleryJobQueue, InProcessJobQueue, QueueFull, celery_kwargs, read_status
+
+
+class FakeCelery:
+    """Records send_task calls instead of publishing to a broker."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_task(self, name, args=None, kwargs=None, queue=None, **options):
+        self.sent.append({"name": name, "args": args, "kwargs": kwargs or {}, "queue": queue, "options": options})
+
+
+def job(cv_id="cv-1", **extra):
+    return dict({"cv_id": cv_id, "file_path": f"data/uploads/{cv_id}.pdf", "cache_key": f"key-{cv_id}",
+                 "mode": "full", "sha256": f"hash-{cv_id}"}, **extra)
+
+
+async def wait_status(cv_id, statuses, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        data = await asyncio.to_thread(read_status, cv_id)
+        if data is not None and data["status"] in statuses:
+            return data
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{cv_id} never reached {statuses}: {data}")
+
+
+# ---------- InProcessJobQueue ----------
+def test_inprocess_submit_before_start():
+    queue = InProcessJobQueue(None)
+    with pytest.raises(RuntimeError):
+        asyncio.run(queue.submit(job()))
+
+
+def test_inprocess_queue_full():
+    async def main():
+        # không có consumer: job nằm nguyên trong hàng đợi
+        queue = InProcessJobQueue(None, maxsize=2, concurrency=0)
+        await queue.start()
+        await queue.submit(job("a"))
+        await queue.submit(job("b"))
+        with pytest.raises(QueueFull):
+            await queue.submit(job("c"))
+        assert queue.depth() == 2
+        await queue.stop()
+
+    asyncio.run(main())
+
+
+def test_inprocess_status_transitions(store):
+    async def main():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def handler(j):
+            started.set()
+            await release.wait()
+            return {"fullname": "Nguyen Van A"}
+
+        queue = InProcessJobQueue(handler, maxsize=4, concurrency=1)
+        await queue.start()
+        await queue.submit(job("a"))
+        await started.wait()
+        assert (await wait_status("a", {"processing"}))["file_path"] == "data/uploads/a.pdf"
+        release.set()
+        done = await wait_status("a", {"done"})
+        assert done["result"] == {"fullname": "Nguyen Van A"}
+        assert queue.depth() == 0
+        await queue.stop()
+
+    asyncio.run(main())
+
+
+def test_inprocess_error_and_timeout(store):
+    async def main():
+        async def handler(j):
+            if j["cv_id"] == "late":
+                raise DeadlineExceeded("llm")
+            raise ValueError("broken pdf")
+
+        queue = InProcessJobQueue(handler, maxsize=4, concurrency=2)
+        await queue.start()
+        await queue.submit(job("bad"))
+        await queue.submit(job("late"))
+        bad = await wait_status("bad", {"error"})
+        assert bad["error"] == "broken pdf" and "ValueError" in bad["traceback"]
+        late = await wait_status("late", {"timeout"})
+        assert late["stage"] == "llm"
+        # consumer vẫn chạy sau lỗi
+        assert all(not t.done() for t in queue._tasks)
+        await queue.stop()
+
+    asyncio.run(main())
+
+
+# ---------- CeleryJobQueue ----------
+def test_celery_queue_full():
+    fake = FakeCelery()
+    queue = CeleryJobQueue(celery_app=fake, maxsize=3, queue_name="cv", depth_fn=lambda: 3)
+    with pytest.raises(QueueFull):
+        asyncio.run(queue.submit(job()))
+    assert fake.sent == []
+
+
+def test_celery_depth_error_counts_as_empty():
+    def broken():
+        raise ConnectionError("redis down")
+
+    assert CeleryJobQueue(celery_app=FakeCelery(), depth_fn=broken).depth() == 0
+
+
+def test_celery_submit_contract():
+    fake = FakeCelery()
+    queue = CeleryJobQueue(celery_app=fake, maxsize=3, queue_name="cv", depth_fn=lambda: 0)
+    asyncio.run(queue.submit(job("a", mode="hybrid", previous_id="cv-0", deadline=Deadline.after(30))))
+    (sent,) = fake.sent
+    assert sent["name"] == "parser.parse_cv" and sent["queue"] == "cv"
+    assert sent["args"] == ["a", "data/uploads/a.pdf", "key-a", "hybrid"]
+    kwargs = sent["kwargs"]
+    assert kwargs["content_hash"] == "hash-a"
+    assert kwargs["previous"] == "cv-0"
+    # deadline đi qua broker theo giờ hệ thống
+    assert 25 < kwargs["deadline_at"] - time.time() <= 30
+
+
+def test_celery_kwargs_without_previous_or_deadline():
+    assert celery_kwargs(job("a", previous_id=None, deadline=Deadline())) == {"content_hash": "hash-a"}
+
+
+def test_celery_contract_matches_task_signature():
+    pytest.importorskip("celery")
+    import tasks
+
+    fake = FakeCelery()
+    queue = CeleryJobQueue(celery_app=fake, depth_fn=lambda: 0)
+    asyncio.run(queue.submit(job("a", previous_id="cv-0", deadline=Deadline.after(30))))
+    (sent,) = fake.sent
+    bound = inspect.signature(tasks.parse_cv.run).bind(*sent["args"], **sent["kwargs"])
+    assert bound.arguments["previous"] == "cv-0"
+    assert bound.arguments["content_hash"] == "hash-a"
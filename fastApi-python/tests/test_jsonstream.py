@@ -0,0 +1,41 @@
+import pytest
+
+from jsonstream import ObjectStreamParser
+
+
+def feed_all(chunks):
+    stream = ObjectStreamParser()
+    items = []
+    for chunk in chunks:
+        items.extend(stream.feed(chunk))
+    return stream, items
+
+
+def test_members_emitted_as_they_close():
+    stream = ObjectStreamParser()
+    assert stream.feed('```json\n{"fullname": "Nguyễn Văn A", "skil') == [("fullname", "Nguyễn Văn A")]
+    assert stream.feed('ls": [{"name": "Python"}]}\n```') == [("skills", [{"name": "Python"}])]
+    assert stream.done and not stream.errors
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_chunk_split_inside_string(size):
+    # dấu phẩy, ngoặc và \" nằm trong chuỗi, bị cắt ở mọi vị trí
+    text = '{"summary": "Dev, {Python} [5 năm] \\"senior\\"", "email": "a@b.c"}'
+    stream, items = feed_all(text[i:i + size] for i in range(0, len(text), size))
+    assert items == [("summary", 'Dev, {Python} [5 năm] "senior"'), ("email", "a@b.c")]
+    assert stream.done and not stream.errors
+
+
+def test_malformed_member_recorded():
+    stream, items = feed_all(['{"fullname": "A", "skills": [{"name": "Python",}], ', '"email": "a@b.c"}'])
+    assert items == [("fullname", "A"), ("email", "a@b.c")]
+    assert stream.done
+    # không bỏ qua lặng lẽ: người gọi biết kết quả thiếu mục
+    assert len(stream.errors) == 1 and '"skills"' in stream.errors[0]
+
+
+def test_truncated_object_not_done():
+    stream, items = feed_all(['{"fullname": "A", "skills": [{"name": "Py'])
+    assert items == [("fullname", "A")]
+    assert not stream.done
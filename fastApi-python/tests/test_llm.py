@@ -0,0 +1,160 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+import llm
+import llm_stub
+from llm import GeminiClient, LLMError, LLMTimeout
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    """llm_stub chạy thật bằng uvicorn trong thread nền (timeout httpx chỉ có hiệu lực qua socket thật)."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(llm_stub.app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    for _ in range(200):
+        if server.started:
+            break
+        time.sleep(0.05)
+    assert server.started
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    server.should_exit = True
+    thread.join(10)
+    sock.close()
+
+
+@pytest.fixture(autouse=True)
+def stub(monkeypatch):
+    """Stub không trễ, không lỗi; mỗi test tự bật lỗi cần thử và đọc lại bộ đếm."""
+    for name, value in {"STUB_LATENCY_DIST": "fixed", "STUB_LATENCY_MS": 0, "STUB_ERROR_RATE": 0,
+                        "STUB_429_RATE": 0, "STUB_RETRY_AFTER": "0", "STUB_429_BURST_EVERY": 0,
+                        "STUB_429_BURST_SECONDS": 0, "STUB_CHUNK_MS": 0}.items():
+        monkeypatch.setattr(llm_stub, name, value)
+    llm_stub.app.state.calls = 0
+    llm_stub.app.state.statuses.clear()
+    monkeypatch.setattr(llm, "LLM_BACKOFF_BASE", 0.01)
+    return llm_stub
+
+
+def call(url, deadline_after=None, calls=1, stream=False, **kwargs):
+    """Run `calls` sequential generate() (or stream()) on one client against the stub; returns the texts."""
+    kwargs.setdefault("rate", 0)
+    client = GeminiClient(api_key="", base_url=url, **kwargs)
+
+    async def one():
+        deadline = None if deadline_after is None else time.monotonic() + deadline_after
+        if stream:
+            return "".join([chunk async for chunk in client.stream("prompt", deadline)])
+        return await client.generate("prompt", deadline)
+
+    async def main():
+        try:
+            return [await one() for _ in range(calls)]
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def test_generate(stub_url, stub):
+    (text,) = call(stub_url)
+    assert json.loads(text)["summary"].startswith("Stub resume")
+    assert stub.app.state.calls == 1
+
+
+def test_stream(stub_url, stub):
+    (text,) = call(stub_url, stream=True)
+    assert json.loads(text)["summary"].startswith("Stub resume")
+
+
+def test_503_retried_then_raises(stub_url, stub):
+    stub.STUB_ERROR_RATE = 1.0
+    with pytest.raises(LLMError) as e:
+        call(stub_url, max_retries=2)
+    assert e.value.status == 503
+    assert stub.app.state.calls == 3
+
+
+def test_429_without_retry_after_uses_backoff_delay(stub_url, stub, monkeypatch):
+    stub.STUB_429_RATE = 1.0
+    stub.STUB_RETRY_AFTER = ""
+    attempts = []
+
+    def delay(attempt, base=None, cap=None):
+        attempts.append(attempt)
+        return 0.01
+
+    monkeypatch.setattr(llm, "backoff_delay", delay)
+    with pytest.raises(LLMError) as e:
+        call(stub_url, max_retries=3)
+    assert e.value.status == 429
+    assert attempts == [0, 1, 2]
+    assert stub.app.state.calls == 4
+
+
+def test_429_honours_retry_after(stub_url, stub):
+    stub.STUB_429_RATE = 1.0
+    stub.STUB_RETRY_AFTER = "0.2"
+    started = time.monotonic()
+    with pytest.raises(LLMError):
+        call(stub_url, max_retries=2)
+    assert time.monotonic() - started >= 0.4
+    assert stub.app.state.statuses[429] == 3
+
+
+def test_recovers_after_429_burst(stub_url, stub):
+    # đang ở cuối chu kỳ: còn ~0.25s 429 liên tục rồi stub trả 200 lại
+    stub.STUB_429_BURST_EVERY = 1.0
+    stub.STUB_429_BURST_SECONDS = 0.3
+    stub.STUB_RETRY_AFTER = "0.1"
+    stub.app.state.started = time.monotonic() - 0.75
+    (text,) = call(stub_url, max_retries=10, deadline_after=5)
+    assert text
+    assert stub.app.state.statuses[429] >= 1
+    assert stub.app.state.statuses[200] == 1
+
+
+def test_deadline_cuts_slow_request(stub_url, stub):
+    stub.STUB_LATENCY_MS = 2000
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        call(stub_url, deadline_after=0.3, timeout=60, max_retries=5)
+    assert time.monotonic() - started < 1.5
+    assert stub.app.state.calls == 1
+
+
+def test_retry_after_past_deadline_not_slept(stub_url, stub):
+    stub.STUB_429_RATE = 1.0
+    stub.STUB_RETRY_AFTER = "5"
+    started = time.monotonic()
+    with pytest.raises(LLMError) as e:
+        call(stub_url, deadline_after=1, max_retries=5)
+    # không ngủ 5s rồi mới báo lỗi: thử lại sẽ quá deadline nên trả lỗi 429 ngay
+    assert e.value.status == 429
+    assert time.monotonic() - started < 1
+    assert stub.app.state.calls == 1
+
+
+def test_token_bucket_paces_calls(stub_url, stub):
+    started = time.monotonic()
+    call(stub_url, calls=3, rate=5, burst=1)
+    # token đầu có sẵn, hai lần sau chờ 1/5s mỗi lần
+    assert time.monotonic() - started >= 0.35
+    assert stub.app.state.calls == 3
+
+
+def test_token_bucket_rejects_when_wait_exceeds_deadline(stub_url, stub):
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        call(stub_url, calls=2, deadline_after=0.3, rate=1, burst=1)
+    # lần thứ hai cần chờ 1s > deadline: báo lỗi ngay, không gửi request
+    assert time.monotonic() - started < 0.3
+    assert stub.app.state.calls == 1
@@ -0,0 +1,133 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from matching import JobIndex, cv_terms, job_terms, top_k, vectorize, vectorize_many
+
+JOBS = [
+    ("backend", {"skills": [{"name": "Python"}, {"name": "Django"}], "tags": ["REST"]}),
+    ("data", {"skills": [{"name": "Python"}, {"name": "SQL"}]}),
+    ("mobile", {"skills": [{"name": "Swift"}]}),
+]
+CV = {"skills": [{"name": "Python"}, {"name": "Django"}], "experiences": [{"tags": ["REST"]}]}
+
+
+def search(index, cv=CV, k=10):
+    terms = cv_terms(cv)
+    return index.search(vectorize(terms, index.dim)[None, :], [terms], k)[0]
+
+
+def test_top_k_order_and_tie_break():
+    scores = np.array([[0.5, 0.9, 0.5, 0.1, 0.0]], dtype=np.float32)
+    # điểm bằng nhau: cột nhỏ hơn đứng trước; điểm <= min_score bị bỏ
+    assert top_k(scores, 3) == [[(1, pytest.approx(0.9)), (0, 0.5), (2, 0.5)]]
+    assert top_k(scores, 10) == [[(1, pytest.approx(0.9)), (0, 0.5), (2, 0.5), (3, pytest.approx(0.1))]]
+    assert top_k(scores, 10, min_score=0.5) == [[(1, pytest.approx(0.9))]]
+    assert top_k(scores[0], 1) == [[(1, pytest.approx(0.9))]]
+    assert top_k(scores, 0) == [[]]
+
+
+def test_search_ranks_jobs():
+    index = JobIndex()
+    index.upsert(JOBS)
+    hits = search(index)
+    assert [h["job_id"] for h in hits] == ["backend", "data"]
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-3)
+    assert hits[0]["matched"] == ["django", "python", "rest"]
+    assert hits[1]["matched"] == ["python"]
+
+
+def test_equal_jobs_keep_insertion_order():
+    index = JobIndex()
+    job = {"skills": ["Python"]}
+    index.upsert([("b", job), ("a", job), ("c", job)])
+    assert [h["job_id"] for h in search(index, {"skills": ["Python"]}, k=2)] == ["b", "a"]
+
+
+def test_remove_middle_row_moves_last():
+    index = JobIndex()
+    index.upsert(JOBS)
+    mobile = index.get("mobile")[0]
+    assert index.remove(["data", "missing"]) == 1
+    # hàng cuối (mobile) thế chỗ hàng bị xoá: rows / ids / terms / matrix khớp nhau
+    assert index.ids == ["backend", "mobile"]
+    assert index.rows == {"backend": 0, "mobile": 1}
+    assert index.terms[1] == job_terms(JOBS[2][1])
+    np.testing.assert_array_equal(index.matrix[1], mobile)
+    assert [h["job_id"] for h in search(index, {"skills": ["Swift"]})] == ["mobile"]
+    assert index.remove(["mobile"]) == 1 and index.remove(["mobile"]) == 0
+    assert index.ids == ["backend"] and index.rows == {"backend": 0}
+
+
+def test_upsert_replaces_in_place():
+    index = JobIndex()
+    index.upsert(JOBS)
+    assert index.upsert([("data", {"skills": ["Swift"]}), ("new", {"skills": ["Go"]})]) == {"added": 1, "updated": 1}
+    assert index.rows["data"] == 1 and len(index) == 4
+    assert [h["job_id"] for h in search(index, {"skills": ["Swift"]})] == ["data", "mobile"]
+
+
+def test_save_load_round_trip(tmp_path):
+    index = JobIndex(directory=str(tmp_path))
+    index.upsert(JOBS)
+    assert index.save() is True
+    assert index.save() is False  # không đổi gì từ lần lưu trước
+    loaded = JobIndex.load(str(tmp_path))
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.ids == index.ids and loaded.rows == index.rows and loaded.terms == index.terms
+    assert not loaded.dirty
+    assert search(loaded) == search(index)
+    # copy-on-write: sửa index đã nạp không ghi ngược vào file cho tới khi save()
+    loaded.remove(["backend"])
+    assert JobIndex.load(str(tmp_path)).ids == ["backend", "data", "mobile"]
+    loaded.upsert([("new", {"skills": ["Go"]})])
+    assert loaded.save() is True
+    assert JobIndex.load(str(tmp_path)).ids == ["mobile", "data", "new"]
+
+
+def test_load_rehashes_after_dim_change(tmp_path):
+    index = JobIndex(dim=4096, directory=str(tmp_path))
+    index.upsert(JOBS)
+    index.save()
+    # MATCH_DIM đổi: file .npy không dùng được, băm lại từ term đã lưu và đánh dấu cần lưu lại
+    loaded = JobIndex.load(str(tmp_path), dim=512)
+    assert loaded.matrix.shape == (3, 512) and not isinstance(loaded.matrix, np.memmap)
+    np.testing.assert_allclose(loaded.matrix, vectorize_many(loaded.terms, 512))
+    assert loaded.dirty
+    assert [h["job_id"] for h in search(loaded)] == ["backend", "data"]
+    assert loaded.save() is True
+    assert JobIndex.load(str(tmp_path), dim=512).matrix.shape == (3, 512)
+
+
+def test_load_missing_index(tmp_path):
+    index = JobIndex.load(str(tmp_path / "none"))
+    assert len(index) == 0 and search(index) == []
+
+
+def test_match_endpoints(store, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app.app.state, "match_index", JobIndex(), raising=False)
+    store.put("cv-1", {"cv_id": "cv-1", "status": "done", "result": CV})
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as c:
+            jobs = [dict(job, id=job_id) for job_id, job in JOBS]
+            r = await c.put("/match/jobs", json={"jobs": jobs})
+            assert r.json() == {"added": 3, "updated": 0, "count": 3}
+            r = await c.post("/match?k=1", json={"cv": CV})
+            assert [m["job_id"] for m in r.json()["matches"]] == ["backend"]
+            r = await c.post("/match", json={"cv_ids": ["cv-1", "missing"]})
+            results = r.json()["results"]
+            assert [m["job_id"] for m in results[0]["matches"]] == ["backend", "data"]
+            assert results[1] == {"cv_id": "missing", "status": "not_found"}
+            r = await c.post("/match", json={"job_id": "data", "cv_ids": ["cv-1"]})
+            assert [m["cv_id"] for m in r.json()["matches"]] == ["cv-1"]
+            assert (await c.delete("/match/jobs/backend")).json() == {"removed": "backend", "count": 2}
+            assert (await c.delete("/match/jobs/backend")).status_code == 404
+            r = await c.post("/match", json={"cv_id": "cv-1"})
+            assert [m["job_id"] for m in r.json()["matches"]] == ["data"]
+
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+
+import pytest
+
+import parser
+from parser import LLMOutputError, parse_llm_output
+from pipeline import Pipeline
+
+
+def test_parse_llm_output_strips_fences():
+    assert parse_llm_output('```json\n{"fullname": "A"}\n```') == {"fullname": "A"}
+
+
+@pytest.mark.parametrize("raw", ['{"fullname": "A", ', "Sorry, I cannot help", "", '["not", "an", "object"]'])
+def test_parse_llm_output_rejects_malformed(raw, caplog):
+    with caplog.at_level(logging.WARNING, logger="parser"):
+        with pytest.raises(LLMOutputError):
+            parse_llm_output(raw)
+    assert caplog.records
+
+
+def test_malformed_llm_output_is_not_cached(monkeypatch):
+    import app
+
+    async def report(source, timings, deadline):
+        return {"text": "Nguyen Van A\nKỹ năng: Python", "pages": [], "page_count": 1, "truncated": False}
+
+    async def fields(text, mode, deadline=None):
+        return parser.parse_llm_output("{ truncated")
+
+    monkeypatch.setattr(app, "extract_stage_report", report)
+    monkeypatch.setattr(app, "extract_fields_async", fields)
+    app.app.state.pipeline = Pipeline(1, 1)
+    try:
+        with pytest.raises(LLMOutputError):
+            asyncio.run(app.run_parse_source({"path": "cv.pdf", "ext": ".pdf"}, "test-malformed", "full"))
+    finally:
+        app.app.state.pipeline = None
+    # một câu trả lời hỏng không được thành kết quả cache cho mọi lần upload lại cùng file
+    assert app.result_cache.get("test-malformed") is None
+
+
+class FakeStreamClient:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self, prompt, deadline=None):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def collect_stream(monkeypatch, chunks):
+    monkeypatch.setattr(parser, "MOCK_GEMINI", False)
+    monkeypatch.setattr(parser.llm, "get_client", lambda: FakeStreamClient(chunks))
+
+    async def main():
+        return [item async for item in parser.stream_with_gemini_async("cv text")]
+
+    return asyncio.run(main())
+
+
+def test_stream_with_malformed_member_raises(monkeypatch):
+    chunks = ['{"fullname": "A", "skills": [{"name": "Python",}], ', '"email": "a@b.c"}']
+    with pytest.raises(LLMOutputError):
+        collect_stream(monkeypatch, chunks)
+
+
+def test_stream_truncated_output_raises(monkeypatch):
+    with pytest.raises(LLMOutputError):
+        collect_stream(monkeypatch, ['{"fullname": "A", "skills": [{"name": "Py'])
+
+
+def test_stream_yields_all_members(monkeypatch):
+    items = collect_stream(monkeypatch, ['{"fullname": "A", "ema', 'il": "a@b.c"}'])
+    assert items == [("fullname", "A"), ("email", "a@b.c")]
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import pool
+from pool import WorkerCrashed, WorkerPool
+
+
+class FlakyContext:
+    """spawn context whose Process.start() raises OSError the first `failures` times (fd / memory pressure)."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.real = multiprocessing.get_context("spawn")
+
+    def Pipe(self):
+        return self.real.Pipe()
+
+    def Process(self, *args, **kwargs):
+        process = self.real.Process(*args, **kwargs)
+        if self.failures > 0:
+            self.failures -= 1
+
+            def start():
+                raise OSError(24, "Too many open files")
+
+            process.start = start
+        return process
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(pool, "RESPAWN_BACKOFF_SECONDS", 0.01)
+
+
+def test_spawn_failures_fail_pending_tasks():
+    executor = WorkerPool(min_workers=1, max_workers=1, mp_context=FlakyContext(failures=1000))
+    try:
+        future = executor.submit(pow, 2, 5)
+        # không treo: sau MANAGER_MAX_ERRORS lỗi liên tiếp task nhận lỗi, wait_ready trả False ngay
+        with pytest.raises(BrokenProcessPool):
+            future.result(timeout=10)
+        assert executor.wait_ready(timeout=10) is False
+        assert "Too many open files" in executor.last_error
+        assert executor.stats["manager_errors"] >= pool.MANAGER_MAX_ERRORS
+        assert executor._thread.is_alive()
+        with pytest.raises(BrokenProcessPool):
+            executor.submit(pow, 2, 6).result(timeout=10)
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_manager_recovers_after_spawn_errors():
+    executor = WorkerPool(min_workers=1, max_workers=1, mp_context=FlakyContext(failures=2))
+    try:
+        assert executor.wait_ready(timeout=60)
+        assert executor.submit(pow, 2, 5).result(timeout=60) == 32
+        assert executor.stats["manager_errors"] == 2
+        assert executor.last_error is None
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_worker_crash_fails_only_its_task():
+    executor = WorkerPool(min_workers=1, max_workers=1)
+    try:
+        with pytest.raises(WorkerCrashed):
+            executor.submit(os._exit, 3).result(timeout=60)
+        assert executor.submit(pow, 3, 2).result(timeout=60) == 9
+        assert executor.stats["crashed"] == 1
+    finally:
+        executor.shutdown(wait=True)
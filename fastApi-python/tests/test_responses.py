@@ -0,0 +1,64 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+
+import responses
+from responses import CompressionMiddleware, ORJSONResponse, choose_encoding, etag_matches
+
+ETAG = '"abc123"'
+BODY = {"skills": [{"name": f"Kỹ năng {i}", "level": "Advanced"} for i in range(100)]}
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, min_size=1024)
+
+    @app.get("/result")
+    async def result(request: Request):
+        if etag_matches(request.headers.get("if-none-match"), ETAG):
+            return Response(status_code=304, headers={"ETag": ETAG})
+        return ORJSONResponse(BODY, headers={"ETag": ETAG})
+
+    return app
+
+
+def get(headers):
+    async def main():
+        transport = httpx.ASGITransport(app=make_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await c.get("/result", headers=headers)
+
+    return asyncio.run(main())
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip;q=0.5, identity") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip;q=0") is None
+
+
+def test_identity_keeps_strong_etag():
+    r = get({"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["etag"] == ETAG
+
+
+def test_gzip_weakens_etag_and_revalidates():
+    r = get({"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["etag"] == f"W/{ETAG}"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.json() == BODY  # httpx giải nén
+    r = get({"Accept-Encoding": "gzip", "If-None-Match": f"W/{ETAG}"})
+    assert r.status_code == 304
+    assert r.headers["etag"] == f"W/{ETAG}"
+
+
+def test_brotli():
+    if responses.brotli is None:
+        pytest.skip("brotli not installed")
+    r = get({"Accept-Encoding": "br, gzip"})
+    assert r.headers["content-encoding"] == "br"
+    assert r.headers["etag"] == f"W/{ETAG}"
@@ -0,0 +1,60 @@
+import glob
+import json
+import os
+
+import pytest
+
+from rules import extract_rules, find_phones
+from tests.conftest import SERVICE_DIR
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Số điện thoại: 0379367667", ["0379367667"]),
+    ("SĐT: 0912 345 678", ["0912345678"]),
+    ("Phone: 0912.345.678", ["0912345678"]),
+    ("Mobile: 0912-345-678", ["0912345678"]),
+    ("+84 912 345 678", ["+84912345678"]),
+    ("(+84) 912-345-678", ["+84912345678"]),
+    ("024 3856 1234 (cố định)", ["02438561234"]),
+    ("Tel: 0236 3821 234", ["02363821234"]),
+    ("+84 24 3856 1234", ["+842438561234"]),
+    ("0912 345 678 - 0987.654.321", ["0912345678", "0987654321"]),
+])
+def test_find_phones(text, expected):
+    assert find_phones(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Email: xuanhoa0379367667@gmail.com",  # số trong email
+    "2017 - 2021",
+    "Doanh số 0912345 triệu",  # quá ngắn
+    "Mã hồ sơ 091234567890",  # quá dài
+    "Ngày sinh: 18/12/1997",
+])
+def test_find_phones_ignores_non_phones(text):
+    assert find_phones(text) == []
+
+
+def fixture_pairs():
+    """(PDF fixture, stored phone) for the results in data/results whose upload is a bench fixture."""
+    pairs = []
+    for path in sorted(glob.glob(os.path.join(SERVICE_DIR, "data", "results", "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        phone = (payload.get("result") or {}).get("phone")
+        pdf = os.path.join(SERVICE_DIR, "bench", "fixtures", "uploads", os.path.basename(payload.get("file_path", "")))
+        if phone and os.path.isfile(pdf):
+            pairs.append((pdf, phone))
+    return pairs
+
+
+def test_phone_from_fixture_resumes():
+    pytest.importorskip("fitz")
+    import parser
+
+    pairs = fixture_pairs()
+    assert pairs
+    for pdf, phone in pairs:
+        text = parser.extract_text_from_pdf(pdf)
+        assert phone in find_phones(text)
+        assert extract_rules(text)["phone"] == phone
@@ -0,0 +1,98 @@
+import pytest
+
+import skills
+from skills import SkillScanner, fill_skills, fold_key, load_taxonomy
+
+ENTRIES = [
+    {"name": "Project Management", "category": "management", "aliases": ["quản lý dự án"], "exact": ["PM"]},
+    {"name": "Spring", "category": "backend"},
+    {"name": "Spring Boot", "category": "backend", "aliases": ["springboot"]},
+    {"name": "Boot", "category": "test"},
+    {"name": "Go", "category": "programming", "aliases": ["golang"], "exact": ["Go"]},
+    {"name": "R", "category": "programming", "exact": ["R"]},
+    {"name": "JavaScript", "category": "programming", "aliases": ["js"]},
+    {"name": "Python", "category": "programming"},
+    {"name": "Docker", "category": "devops"},
+]
+
+
+@pytest.fixture
+def scanner(monkeypatch):
+    scanner = SkillScanner(ENTRIES)
+    # fill_skills / canonical_name dùng scanner này thay vì taxonomy thật
+    monkeypatch.setattr(skills, "_scanner", scanner)
+    return scanner
+
+
+def mentions(scanner, text):
+    return [(hit.name, text[hit.start:hit.end]) for hit in scanner.scan(text)]
+
+
+def test_fold_keeps_length():
+    assert fold_key("  QUẢN LÝ   Đội  ") == "quan ly doi"
+    assert len(skills.fold("QUẢN LÝ  DỰ ÁN")) == len("QUẢN LÝ  DỰ ÁN")
+
+
+@pytest.mark.parametrize("text", ["Quản lý dự án", "quan ly du an", "QUẢN LÝ  DỰ ÁN", "Project\nmanagement"])
+def test_diacritics_case_and_spaces_folded(scanner, text):
+    # vị trí trả về là vị trí trong văn bản gốc (kể cả khoảng trắng kép)
+    assert mentions(scanner, f"Kỹ năng: {text}.") == [("Project Management", text)]
+
+
+def test_leftmost_longest(scanner):
+    assert mentions(scanner, "Spring Boot, Docker") == [("Spring Boot", "Spring Boot"), ("Docker", "Docker")]
+    assert mentions(scanner, "Spring, Boot") == [("Spring", "Spring"), ("Boot", "Boot")]
+    assert mentions(scanner, "springboot") == [("Spring Boot", "springboot")]
+
+
+def test_exact_forms(scanner):
+    assert mentions(scanner, "Go, Python") == [("Go", "Go"), ("Python", "Python")]
+    # "go" / "GO" là từ thường: chỉ khớp đúng cách viết khai báo trong exact; alias thì không phân biệt
+    assert mentions(scanner, "Ready to go to market, GO!") == []
+    assert mentions(scanner, "GOLANG") == [("Go", "GOLANG")]
+    assert mentions(scanner, "PM 3 năm, pm") == [("Project Management", "PM")]
+
+
+def test_joiners_and_word_boundaries(scanner):
+    assert mentions(scanner, "Phòng R&D, C&B") == []
+    assert mentions(scanner, "R_lang, Rust, Pythonic") == []
+    assert mentions(scanner, "R, Python (Docker)") == [("R", "R"), ("Python", "Python"), ("Docker", "Docker")]
+
+
+def test_canonical(scanner):
+    assert scanner.canonical("JS") == ("JavaScript", "programming")
+    assert scanner.canonical("quan ly  du an") == ("Project Management", "management")
+    assert scanner.canonical("Rust") is None
+    assert skills.canonical_name("golang") == "Go"
+    assert skills.canonical_name("Rust") == "Rust"
+
+
+def test_fill_skills_merges_llm_skills(scanner):
+    cv = {
+        "skills": [
+            {"name": "JS", "level": "", "category": "", "years": 0},
+            {"name": "JavaScript", "level": "Advanced", "category": "", "years": 3},
+            {"name": "python", "level": "Intermediate", "category": "", "years": 0},
+        ],
+        "projects": [{"name": "Shop", "description": "Spring Boot + Docker", "techStack": ["js", "JavaScript"]}],
+    }
+    fill_skills(cv, "Python, JavaScript, Docker, Phòng R&D")
+    # "JS" và "JavaScript" gộp một mục: giữ mục đầu, lấy level / years còn trống từ mục sau
+    assert cv["skills"] == [
+        {"name": "JavaScript", "level": "Advanced", "category": "programming", "years": 3},
+        {"name": "Python", "level": "Intermediate", "category": "programming", "years": 0},
+        {"name": "Docker", "level": "", "category": "devops", "years": 0},
+    ]
+    assert cv["projects"][0]["techStack"] == ["JavaScript", "Spring Boot", "Docker"]
+
+
+def test_fill_skills_without_taxonomy(monkeypatch):
+    monkeypatch.setattr(skills, "_scanner", SkillScanner([]))
+    cv = {"skills": [{"name": "JS"}]}
+    assert fill_skills(cv, "Docker") == {"skills": [{"name": "JS"}]}
+
+
+def test_shipped_taxonomy():
+    scanner = SkillScanner(load_taxonomy(skills.SKILL_TAXONOMY))
+    assert scanner.names("Quản lý dự án, Spring Boot, Golang, R&D, go to market") == [
+        "Project Management", "Spring Boot", "Go"]
@@ -0,0 +1,35 @@
+import os
+import time
+
+from store import collect_garbage
+
+
+def touch(path, age_seconds=0):
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+    stamp = time.time() - age_seconds
+    os.utime(path, (stamp, stamp))
+    return str(path)
+
+
+def test_orphan_uploads_removed_referenced_kept(store, tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    orphan = touch(uploads / "orphan.pdf", age_seconds=7200)
+    kept = touch(uploads / "kept.pdf", age_seconds=7200)
+    fresh = touch(uploads / "fresh.pdf")
+    store.put("cv-1", {"cv_id": "cv-1", "status": "done", "file_path": kept, "result": {}})
+    stats = collect_garbage(store, str(uploads), 0, 3600)
+    assert stats["uploads"] == 1
+    assert not os.path.exists(orphan)
+    assert os.path.exists(kept) and os.path.exists(fresh)
+
+
+def test_benchmark_fixtures_outside_upload_dir():
+    import app
+    from bench.suite import FIXTURE_DIR
+
+    # retention dọn data/uploads; fixture benchmark không được nằm trong đó
+    upload_dir = os.path.abspath(app.UPLOAD_DIR)
+    assert os.path.commonpath([upload_dir, FIXTURE_DIR]) != upload_dir
+    assert any(name.endswith(".pdf") for name in os.listdir(FIXTURE_DIR))